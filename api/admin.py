@@ -9,6 +9,7 @@ from .models import (
     ProductVariantSize,
     SubCategory,
     Cart,
+    Job,
     User,
     Wishlist,
 )
@@ -114,6 +115,12 @@ class UserAdmin(admin.ModelAdmin):
     ordering = ("username",)
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_at", "updated_at")
+    list_filter = ("status", "name")  # Filtrer "dead" pour les tâches abandonnées
+    readonly_fields = ("created_at", "updated_at", "locked_at")
+
+
 # Register models in the Django admin
 admin.site.register(Product, ProductAdmin)
 admin.site.register(ProductVariant, ProductVariantAdmin)
@@ -125,3 +132,4 @@ admin.site.register(Rating, RatingAdmin)
 admin.site.register(Cart, CartAdmin)
 admin.site.register(Wishlist, WishlistAdmin)
 admin.site.register(User, UserAdmin)
+admin.site.register(Job, JobAdmin)
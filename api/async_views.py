@@ -0,0 +1,146 @@
+"""Versions asynchrones des endpoints de lecture du catalogue (pile ASGI).
+
+Mêmes URL, mêmes réponses (octet pour octet), mêmes ETag et même cache que les
+vues de ``api.views`` ; activées par ``CATALOG_ASYNC_VIEWS`` (voir ``api.urls``).
+Les requêtes indépendantes sont lancées ensemble (``asyncio.gather``) et
+l'attente de la base ou d'un client lent n'occupe pas de thread du worker.
+L'ORM asynchrone de Django exécute encore le SQL dans un thread dédié : le gain
+vient de la concurrence entre requêtes HTTP, pas d'un parallélisme SQL.
+
+Les réponses partielles (``?fields=`` / ``?expand=``) réutilisent les fonctions
+synchrones de ``api.views``.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from . import fast_serializers, views
+from .cache import cache_catalog_response
+from .conditional import conditional_catalog_response, product_tree
+from .facets import filter_products, product_facets
+from .fieldsets import parse_fieldset
+from .models import Category, Product, ProductVariant, Rating
+from .pagination import ProductCursorPagination, RatingCursorPagination
+from .responses import JSONResponse
+from .serializers import RatingSerializer
+
+
+def _bad_request(error):
+    """Réponse d'erreur de DRF (400 d'un filtre, 404 d'un curseur invalide…)."""
+    # Comme rest_framework.views.exception_handler
+    detail = error.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {"detail": detail}
+    return JSONResponse(detail, status=error.status_code)
+
+
+async def _paginated_products(request, products, facets=False):
+    """Page de produits (et facettes) au format de ``views.paginate_products``."""
+    drf_request = Request(request)
+    fieldset = parse_fieldset(drf_request)
+    if fieldset is not None:
+        page = sync_to_async(
+            lambda: views.paginate_products(drf_request, products).data
+        )()
+    else:
+        page = _fast_page(drf_request, products)
+    if not facets:
+        return await page
+    data, facet_counts = await asyncio.gather(
+        page, sync_to_async(product_facets)(products)
+    )
+    data["facets"] = facet_counts
+    return data
+
+
+async def _fast_page(drf_request, products):
+    paginator = ProductCursorPagination()
+    rows = await sync_to_async(paginator.paginate_queryset)(
+        products.values(*fast_serializers.PRODUCT_COLUMNS), drf_request
+    )
+    results = await fast_serializers.aserialize_product_rows(rows)
+    return paginator.get_paginated_response(results).data
+
+
+@require_safe
+@conditional_catalog_response(lambda: product_tree())
+@cache_catalog_response
+async def get_products(request):
+    """Retourne la liste paginée et filtrée des produits, avec les compteurs de facettes."""
+    try:
+        products = filter_products(Product.objects.all(), request.GET)
+        # Page et facettes sont indépendantes : chargées ensemble
+        return JSONResponse(await _paginated_products(request, products, facets=True))
+    except APIException as error:  # Filtre, tri ou curseur invalide
+        return _bad_request(error)
+
+
+@require_safe
+@conditional_catalog_response(lambda pk: product_tree(pk=pk))
+@cache_catalog_response
+async def get_product(request, pk):
+    """Retourne un produit spécifique."""
+    fieldset = parse_fieldset(Request(request))
+    try:
+        if fieldset is None:
+            data = await fast_serializers.aserialize_product(pk)
+            if data is None:
+                raise Product.DoesNotExist
+        else:
+            data = await sync_to_async(views.shaped_product_data)(pk, fieldset)
+    except Product.DoesNotExist:
+        return JSONResponse({"error": "Product not found"}, status=404)
+    return JSONResponse(data)
+
+
+@require_safe
+@conditional_catalog_response(
+    lambda variant_id: product_tree(variants=variant_id)
+)
+@cache_catalog_response
+async def get_variant_details(request, variant_id):
+    """Retourne les détails d’une variante spécifique (variante et produit chargés ensemble)."""
+    fieldset = parse_fieldset(Request(request))
+    try:
+        if fieldset is None:
+            data = await fast_serializers.aserialize_variant_details(variant_id)
+            if data is None:
+                raise ProductVariant.DoesNotExist
+        else:
+            data = await sync_to_async(views.shaped_variant_data)(variant_id, fieldset)
+    except ProductVariant.DoesNotExist:
+        return JSONResponse({"error": "Variant not found"}, status=404)
+    except Product.DoesNotExist:
+        return JSONResponse({"error": "Product not found"}, status=404)
+    return JSONResponse(data)
+
+
+@require_safe
+@conditional_catalog_response(lambda: [Category.objects.all()])
+@cache_catalog_response
+async def get_categories(request):
+    """Retourne la liste des catégories."""
+    categories = Category.objects.all()
+    return JSONResponse(await fast_serializers.aserialize_categories(categories))
+
+
+@require_safe
+async def get_comments(request, product_id):
+    """Retourne les évaluations paginées d’un produit spécifique."""
+    ratings = Rating.objects.filter(product_id=product_id).select_related("user")
+    paginator = RatingCursorPagination()
+    try:
+        page = await sync_to_async(paginator.paginate_queryset)(
+            ratings, Request(request)
+        )
+    except APIException as error:  # Filtre, tri ou curseur invalide
+        return _bad_request(error)
+    # Vérifier l'existence du produit seulement si la page est vide
+    if not page and not await Product.objects.filter(pk=product_id).aexists():
+        return JSONResponse({"error": "Product not found"}, status=404)
+    serializer = RatingSerializer(page, many=True)
+    return JSONResponse(paginator.get_paginated_response(serializer.data).data)
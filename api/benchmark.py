@@ -0,0 +1,300 @@
+"""Mesure des endpoints de ``api.urls`` via le client de test de Django.
+
+Chaque route est appelée plusieurs fois avec des paramètres tirés de la base
+(idéalement générée par ``seed_catalog``) ; on relève les latences (p50, p95,
+p99), le nombre de requêtes SQL et la taille des réponses. Tout s'exécute dans
+une transaction annulée à la fin, et chaque appel dans un point de sauvegarde
+annulé : les routes d'écriture voient toujours le même état et la base n'est pas
+modifiée.
+"""
+
+import math
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import urls
+from .images import source_images, widths
+from .models import (
+    Cart,
+    Category,
+    Product,
+    ProductVariant,
+    ProductVariantSize,
+    SubCategory,
+    Wishlist,
+)
+from .seeding import DEFAULT_PASSWORD
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    """Percentile par rang le plus proche d'une liste triée."""
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+
+class Sample:
+    """Identifiants réels utilisés pour construire les requêtes de chaque route."""
+
+    def __init__(self):
+        cart_item = Cart.objects.filter(
+            user__in=Wishlist.objects.values("user")
+        ).first() or Cart.objects.first()
+        self.user = cart_item.user if cart_item else User.objects.first()
+        if self.user is None:
+            raise LookupError("Aucun utilisateur : lancez d'abord seed_catalog.")
+        self.cart_item = cart_item
+        self.wishlist_item = Wishlist.objects.filter(user=self.user).first()
+        size = ProductVariantSize.objects.select_related("variant").first()
+        if size is None:
+            raise LookupError("Aucune taille de variante : lancez d'abord seed_catalog.")
+        self.size = size
+        self.variant = size.variant
+        self.product = Product.objects.get(pk=self.variant.product_id)
+        self.category = Category.objects.get(pk=self.product.category_id)
+        self.subcategory = (
+            SubCategory.objects.filter(pk=self.product.subCategory_id).first()
+            or SubCategory.objects.first()
+        )
+        self.search_term = self.product.title.split()[0]
+        variant_ids = ProductVariant.objects.order_by("id").values_list("id", flat=True)
+        self.variant_ids = ",".join(str(pk) for pk in variant_ids[:20])
+        # Les images générées par seed_catalog n'ont pas de fichier : première image réelle
+        self.image_name = next(source_images(), "products/missing.jpg")
+        self.token = Token.objects.get_or_create(user=self.user)[0].key
+        self.activation_token = self.user.email_verification_token or uuid.uuid4()
+        self.admin = User.objects.create(
+            username=f"benchmark_admin_{uuid.uuid4().hex[:8]}", is_staff=True
+        )
+
+    def cart_payload(self, **extra):
+        item = self.cart_item
+        payload = {
+            "user_id": self.user.pk,
+            "variant_id": item.variant_id if item else self.variant.pk,
+            "size_id": item.size_id if item else self.size.pk,
+        }
+        payload.update(extra)
+        return payload
+
+    def cart_batch_payload(self):
+        line = {"variant_id": self.variant.pk, "size_id": self.size.pk}
+        return {
+            "operations": [
+                {"op": "add", "quantity": 1, **line},
+                {"op": "set", "quantity": 2, **line},
+            ]
+        }
+
+    def wishlist_payload(self):
+        item = self.wishlist_item
+        return {
+            "user_id": self.user.pk,
+            "variant_id": item.variant_id if item else self.variant.pk,
+        }
+
+
+# Jeton de /api/metrics pendant la mesure (voir run_benchmark)
+METRICS_TOKEN = "benchmark-metrics-token"
+
+# Nom de la route -> fonction(sample) retournant (méthode, kwargs de l'URL, corps,
+# utilisateur ou jeton Bearer brut)
+ROUTES = {
+    "hello_world": lambda s: ("get", {}, None, None),
+    "get_cache_stats": lambda s: ("get", {}, None, s.admin),
+    "get_db_stats": lambda s: ("get", {}, None, s.admin),
+    "get_resized_image": lambda s: (
+        "get",
+        {"width": widths()[0], "name": s.image_name},
+        None,
+        None,
+    ),
+    "get_metrics": lambda s: ("get", {}, None, METRICS_TOKEN),
+    "get_products": lambda s: ("get", {}, None, None),
+    "get_product_cards": lambda s: ("get", {}, None, None),
+    "search_products": lambda s: ("get", {}, {"q": s.search_term}, None),
+    "get_categories": lambda s: ("get", {}, None, None),
+    "get_product": lambda s: ("get", {"pk": s.product.pk}, None, None),
+    "get_product_by_category": lambda s: (
+        "get",
+        {"category_id": s.category.pk},
+        None,
+        None,
+    ),
+    "get_product_by_subcategory": lambda s: (
+        "get",
+        {"subcategory_id": s.subcategory.pk if s.subcategory else 0},
+        None,
+        None,
+    ),
+    "get_subcateregory_by_category": lambda s: (
+        "get",
+        {"category_id": s.category.pk},
+        None,
+        None,
+    ),
+    "get_variants_bulk": lambda s: ("get", {}, {"ids": s.variant_ids}, None),
+    "get_variant_details": lambda s: (
+        "get",
+        {"variant_id": s.variant.pk},
+        None,
+        None,
+    ),
+    "get_size_details": lambda s: ("get", {"size_id": s.size.pk}, None, None),
+    "get_category": lambda s: ("get", {"pk": s.category.pk}, None, None),
+    "login": lambda s: (
+        "post",
+        {},
+        {"username": s.user.username, "password": DEFAULT_PASSWORD},
+        None,
+    ),
+    "logout": lambda s: ("post", {}, {"token": s.token}, None),
+    "register": lambda s: (
+        "post",
+        {},
+        {
+            "username": "benchmark_new_user",
+            "email": "benchmark_new_user@example.com",
+            "password": "benchmark-password",
+        },
+        None,
+    ),
+    "activate_account": lambda s: (
+        "get",
+        {"email_verification_token": s.activation_token},
+        None,
+        None,
+    ),
+    "get_current_user": lambda s: ("get", {}, None, s.user),
+    "username_exists": lambda s: ("post", {}, {"username": s.user.username}, None),
+    "email_exists": lambda s: ("post", {}, {"email": s.user.email}, None),
+    "send_verification_code": lambda s: ("post", {}, {"email": s.user.email}, None),
+    "reset_password": lambda s: (
+        "post",
+        {},
+        {"email": s.user.email, "newPassword": DEFAULT_PASSWORD},
+        None,
+    ),
+    "save_comment": lambda s: (
+        "post",
+        {},
+        {"product": s.product.pk, "user": s.user.pk, "stars": 4, "comment": "Bien"},
+        None,
+    ),
+    "get_comments": lambda s: ("get", {"product_id": s.product.pk}, None, None),
+    "get_user": lambda s: ("get", {"user_id": s.user.pk}, None, None),
+    "get_cart_user": lambda s: ("get", {}, None, s.user),
+    "add_to_cart": lambda s: ("post", {}, s.cart_payload(quantity=1), s.user),
+    "update_cart": lambda s: ("post", {}, s.cart_payload(quantity=2), s.user),
+    "empty_cart": lambda s: ("get", {}, None, s.user),
+    "remove_from_cart": lambda s: ("post", {}, s.cart_payload(), s.user),
+    "cart_batch": lambda s: ("post", {}, s.cart_batch_payload(), s.user),
+    "get_cart_summary": lambda s: ("get", {}, None, s.user),
+    "user_wishlist": lambda s: ("get", {}, None, s.user),
+    "get_wishlist_ids": lambda s: ("get", {}, None, s.user),
+    "add_to_wishlist": lambda s: ("post", {}, s.wishlist_payload(), s.user),
+    "remove_from_wishlist": lambda s: ("post", {}, s.wishlist_payload(), s.user),
+    "empty_wishlist": lambda s: ("post", {}, {"user_id": s.user.pk}, s.user),
+    "already_in_wishlist": lambda s: ("post", {}, s.wishlist_payload(), s.user),
+}
+
+
+def route_names():
+    """Noms des routes de ``api.urls``, dans l'ordre de déclaration."""
+    return [
+        pattern.name or pattern.callback.__name__ for pattern in urls.urlpatterns
+    ]
+
+
+def _auth_headers(user):
+    if user is None:
+        return {}
+    token = user if isinstance(user, str) else RefreshToken.for_user(user).access_token
+    return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+
+def _call(client, method, path, data, headers):
+    if method == "get":
+        return client.get(path, data, **headers)
+    return client.post(path, data, content_type="application/json", **headers)
+
+
+def _body(response):
+    # Pas de response.close() : il émet request_finished, qui fermerait la connexion
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def measure_route(client, name, sample, iterations, warmup):
+    method, kwargs, data, user = ROUTES[name](sample)
+    path = reverse(name, kwargs=kwargs)
+    headers = _auth_headers(user)
+    timings, queries = [], []
+    for index in range(warmup + iterations):
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = _call(client, method, path, data, headers)
+                elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        body = _body(response)
+        if index >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured.captured_queries))
+    timings.sort()
+    return {
+        "name": name,
+        "method": method.upper(),
+        "path": path,
+        "status": response.status_code,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "queries": max(queries),
+        "bytes": len(body),
+    }
+
+
+def run_benchmark(iterations=50, warmup=2, only=None, cache=False):
+    """Mesure les routes de ``api.urls`` (toutes, ou celles de ``only``) sans
+    modifier la base. Le cache du catalogue est désactivé sauf si ``cache``."""
+    client = Client(raise_request_exception=False)
+    results, skipped = [], []
+    with override_settings(
+        CATALOG_CACHE_ENABLED=cache,
+        EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+        METRICS_TOKEN=METRICS_TOKEN,
+    ), transaction.atomic():
+        sample = Sample()
+        for name in route_names():
+            if only and name not in only:
+                continue
+            if name not in ROUTES:
+                skipped.append(name)
+                continue
+            results.append(measure_route(client, name, sample, iterations, warmup))
+        transaction.set_rollback(True)
+    return {
+        "database": connection.vendor,
+        "iterations": iterations,
+        "cache": cache,
+        "dataset": {
+            "products": Product.objects.count(),
+            "categories": Category.objects.count(),
+            "users": User.objects.count(),
+        },
+        "endpoints": results,
+        "skipped": skipped,
+    }
@@ -0,0 +1,182 @@
+"""Cache des réponses des endpoints publics du catalogue.
+
+Les clés portent une version du catalogue, incrémentée par les signaux dès qu'un
+modèle du catalogue change (voir ``api.signals``) : les anciennes entrées ne sont
+plus jamais relues et expirent d'elles-mêmes. Le backend est celui de l'alias
+``CATALOG_CACHE_ALIAS`` de ``settings.CACHES`` (fichiers par défaut, mémoire
+locale ou tout autre backend Django). Le backend doit être partagé par tous les
+workers : la version d'un cache en mémoire locale n'est incrémentée que dans le
+processus qui a fait l'écriture, les autres serviraient l'ancien catalogue
+jusqu'à expiration. ``check_shared_cache`` (appelé par gunicorn.conf.py) refuse
+cette configuration.
+
+Sur un défaut de cache, la vue lit le catalogue sur le primaire (voir
+``api.db_routers``) : juste après une incrémentation de version, un réplica en
+retard servirait encore l'ancien catalogue, qui serait stocké sous la nouvelle
+clé et resservi jusqu'à expiration de l'entrée.
+
+Les succès et échecs sont comptés par processus et exposés avec les autres
+métriques (``shopsy_catalog_cache_lookups_total``, voir ``api.metrics``), qui
+les additionnent pour tous les workers.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.response import Response
+
+from .db_routers import routing_context
+from .metrics import collect, get_registry
+from .responses import JSONResponse
+
+VERSION_KEY = "catalog:version"
+DELETED_KEY = "catalog:deleted_at"
+LOOKUPS_METRIC = "shopsy_catalog_cache_lookups_total"
+
+
+def get_cache():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Partir de l'horodatage évite de réutiliser une ancienne version si la
+        # clé a été évincée
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def catalog_deleted_at():
+    """Horodatage de la dernière suppression dans le catalogue (voir api.conditional).
+
+    Une suppression ne fait avancer aucun ``updated_at`` : sans ce repère,
+    Last-Modified resterait inchangé et les clients garderaient la ligne
+    supprimée. Si la clé a été évincée, elle repart de maintenant (les clients
+    revalident une fois).
+    """
+    cache = get_cache()
+    deleted_at = cache.get(DELETED_KEY)
+    if deleted_at is None:
+        cache.add(DELETED_KEY, time.time(), timeout=None)
+        deleted_at = cache.get(DELETED_KEY)
+    return deleted_at
+
+
+def record_catalog_deletion():
+    get_cache().set(DELETED_KEY, time.time(), timeout=None)
+
+
+def check_shared_cache(workers):
+    """Lève ``ImproperlyConfigured`` si plusieurs processus auraient chacun leur cache.
+
+    Vrai même sans cache des réponses : la date de dernière suppression
+    (``catalog_deleted_at``) y est lue par les GET conditionnels.
+    """
+    if workers > 1 and isinstance(get_cache(), LocMemCache):
+        raise ImproperlyConfigured(
+            f"Cache du catalogue en mémoire locale avec {workers} workers : les "
+            "écritures n'invalideraient que le cache de leur processus. Utiliser "
+            "CATALOG_CACHE_BACKEND=file (ou Redis, Memcached)."
+        )
+
+
+def _lookup_count(counters, result):
+    return counters.get((LOOKUPS_METRIC, (("result", result),)), 0)
+
+
+def cache_stats():
+    """Version courante et succès / échecs de tous les workers (voir api.metrics)."""
+    cache = get_cache()
+    get_registry().flush(force=True)
+    counters, _ = collect()
+    hits = _lookup_count(counters, "hit")
+    misses = _lookup_count(counters, "miss")
+    total = hits + misses
+    return {
+        "backend": f"{cache.__class__.__module__}.{cache.__class__.__name__}",
+        "version": cache.get(VERSION_KEY),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
+
+
+def _cache_key(request):
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f"catalog:{catalog_version()}:{url_hash}"
+
+
+def _lookup(request):
+    """Retourne ``(clé, données en cache ou None)`` et met à jour les compteurs.
+
+    Les compteurs sont ceux du processus (``api.metrics``) : rien n'est écrit
+    dans le cache partagé, ni à chaque succès ni à chaque échec.
+    """
+    key = _cache_key(request)
+    data = get_cache().get(key)
+    result = "miss" if data is None else "hit"
+    get_registry().inc(LOOKUPS_METRIC, (("result", result),))
+    return key, data
+
+
+def _store(key, response):
+    if response.status_code == 200:
+        get_cache().set(key, response.data)
+
+
+def _enabled(request):
+    return request.method == "GET" and getattr(settings, "CATALOG_CACHE_ENABLED", True)
+
+
+def cache_catalog_response(view):
+    """Met en cache les réponses 200 d'une vue GET du catalogue (à placer sous ``@api_view``).
+
+    Les vues asynchrones doivent retourner une réponse portant ``data``
+    (``api.responses.JSONResponse``).
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not _enabled(request):
+                return await view(request, *args, **kwargs)
+            key, data = await sync_to_async(_lookup)(request)
+            if data is not None:
+                return JSONResponse(data)
+            with routing_context(pinned=True):
+                response = await view(request, *args, **kwargs)
+            await sync_to_async(_store)(key, response)
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _enabled(request):
+            return view(request, *args, **kwargs)
+        key, data = _lookup(request)
+        if data is not None:
+            return Response(data)
+        with routing_context(pinned=True):
+            response = view(request, *args, **kwargs)
+        _store(key, response)
+        return response
+
+    return wrapper
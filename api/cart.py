@@ -0,0 +1,229 @@
+"""Modifications groupées du panier (``/api/cart/batch/``) et récapitulatif chiffré
+(``/api/cart/summary/``).
+
+Les opérations sont validées d'abord, sans toucher à la base, puis appliquées
+en mémoire sur les lignes du panier, et enfin écrites dans une seule
+transaction : au plus une suppression, un ``bulk_update`` et un
+``bulk_create``. Le nombre de requêtes ne dépend pas du nombre d'opérations.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Round
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .fast_serializers import format_decimal, image_url
+from .models import Cart, ProductImage, ProductVariant, ProductVariantSize
+from .pricing import AsNumeric, effective_price
+
+MAX_OPERATIONS = 100
+
+# add : ajoute à la quantité (crée la ligne au besoin) ; set : remplace la
+# quantité d'une ligne existante ; remove : supprime une ligne existante
+OPERATIONS = ("add", "set", "remove")
+
+
+class CartConflict(Exception):
+    """Le panier a été modifié en même temps par une autre requête."""
+
+
+def _positive_int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 1 else None
+
+
+def parse_operations(data):
+    """Liste de ``(op, variant_id, size_id, quantity)`` ; lève ``ValidationError``."""
+    operations = data.get("operations") if hasattr(data, "get") else None
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError({"operations": "Doit être une liste non vide."})
+    if len(operations) > MAX_OPERATIONS:
+        raise ValidationError(
+            {"operations": f"Au plus {MAX_OPERATIONS} opérations par requête."}
+        )
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+            raise ValidationError(
+                {f"operations[{index}]": f"op doit valoir {', '.join(OPERATIONS)}."}
+            )
+        variant_id = _positive_int(operation.get("variant_id"))
+        if variant_id is None:
+            raise ValidationError({f"operations[{index}]": "variant_id est requis."})
+        size_id = None
+        if operation.get("size_id"):
+            size_id = _positive_int(operation["size_id"])
+            if size_id is None:
+                raise ValidationError({f"operations[{index}]": "size_id invalide."})
+        quantity = None
+        if operation["op"] != "remove":
+            quantity = _positive_int(operation.get("quantity", 1))
+            if quantity is None:
+                raise ValidationError(
+                    {f"operations[{index}]": "quantity doit être un entier positif."}
+                )
+        parsed.append((operation["op"], variant_id, size_id, quantity))
+    return parsed
+
+
+def _check_references(operations):
+    """Vérifie variantes et tailles avec une requête ``in_bulk`` chacune."""
+    variants = ProductVariant.objects.only("id").in_bulk(
+        {variant_id for _, variant_id, _, _ in operations}
+    )
+    size_ids = {size_id for _, _, size_id, _ in operations if size_id}
+    sizes = (
+        ProductVariantSize.objects.only("id", "variant_id").in_bulk(size_ids)
+        if size_ids
+        else {}
+    )
+    for index, (_, variant_id, size_id, _) in enumerate(operations):
+        if variant_id not in variants:
+            raise ValidationError({f"operations[{index}]": "Variant not found."})
+        if size_id and (size_id not in sizes or sizes[size_id].variant_id != variant_id):
+            raise ValidationError({f"operations[{index}]": "Size not found."})
+
+
+def apply_operations(user, operations):
+    """Applique les opérations au panier de ``user`` et retourne ses lignes."""
+    _check_references(operations)
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            # Verrouille les lignes concernées jusqu'à la fin de la transaction
+            items = {
+                (item.variant_id, item.size_id): item
+                for item in Cart.objects.select_for_update().filter(
+                    user=user,
+                    variant_id__in={variant_id for _, variant_id, _, _ in operations},
+                )
+            }
+            originals = dict(items)
+            touched = set()
+            for index, (op, variant_id, size_id, quantity) in enumerate(operations):
+                key = (variant_id, size_id)
+                touched.add(key)
+                item = items.get(key)
+                if op == "add" and item is None:
+                    # Ligne absente ou supprimée plus tôt dans le lot : repart de zéro
+                    item = originals.get(key) or Cart(
+                        user=user, variant_id=variant_id, size_id=size_id, created_at=now
+                    )
+                    item.quantity = quantity
+                    item.updated_at = now
+                    items[key] = item
+                    continue
+                if item is None:
+                    raise ValidationError(
+                        {f"operations[{index}]": "Cart item not found."}
+                    )
+                if op == "remove":
+                    items[key] = None
+                else:
+                    item.quantity = item.quantity + quantity if op == "add" else quantity
+                    item.updated_at = now
+
+            removed = [item.pk for key, item in originals.items() if items[key] is None]
+            changed, created = [], []
+            for key in touched:
+                if items[key] is not None:
+                    (changed if key in originals else created).append(items[key])
+            if removed:
+                Cart.objects.filter(pk__in=removed).delete()
+            if changed:
+                Cart.objects.bulk_update(changed, ["quantity", "updated_at"])
+            if created:
+                Cart.objects.bulk_create(created)
+    except IntegrityError as error:
+        # Ligne créée entre-temps par une requête concurrente : rien n'a été écrit
+        raise CartConflict from error
+    return Cart.objects.filter(user=user).order_by("id")
+
+
+def _amount(expression):
+    """Montant arrondi au centime (``quantity`` est un entier : arrondi exact)."""
+    return ExpressionWrapper(
+        Round(AsNumeric(expression) * F("quantity"), 2),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def priced_cart(user):
+    """Lignes du panier avec prix unitaire remisé et montants, calculés par la base."""
+    main_image = (
+        ProductImage.objects.filter(variant=OuterRef("variant_id"))
+        .order_by("-mainImage", "id")
+        .values("image")[:1]
+    )
+    return (
+        Cart.objects.filter(user=user)
+        .annotate(unit_price=effective_price("variant__price", "variant__discount"))
+        .annotate(
+            line_subtotal=_amount(F("variant__price")),
+            line_total=_amount(F("unit_price")),
+            main_image=Subquery(main_image),
+        )
+        .order_by("id")
+    )
+
+
+def cart_summary(user):
+    """Panier enrichi et totaux en deux requêtes, quel que soit le nombre de lignes."""
+    lines = priced_cart(user)
+    totals = lines.aggregate(
+        count=Sum("quantity"),
+        subtotal=Sum("line_subtotal"),
+        discount_total=Sum(F("line_subtotal") - F("line_total")),
+        total=Sum("line_total"),
+    )
+    items = [
+        {
+            "id": line["id"],
+            "product_id": line["variant__product_id"],
+            "variant_id": line["variant_id"],
+            "size_id": line["size_id"],
+            "title": line["variant__product__title"],
+            "color": line["variant__color"],
+            "size": line["size__size"],
+            "image": image_url(line["main_image"]),
+            "stock": line["variant__stock"],
+            "quantity": line["quantity"],
+            "price": format_decimal(line["variant__price"]),
+            "discount": line["variant__discount"],
+            "unit_price": format_decimal(line["unit_price"]),
+            "subtotal": format_decimal(line["line_subtotal"]),
+            "total": format_decimal(line["line_total"]),
+        }
+        for line in lines.values(
+            "id",
+            "variant_id",
+            "size_id",
+            "quantity",
+            "variant__product_id",
+            "variant__product__title",
+            "variant__color",
+            "variant__stock",
+            "variant__price",
+            "variant__discount",
+            "size__size",
+            "unit_price",
+            "line_subtotal",
+            "line_total",
+            "main_image",
+        )
+    ]
+    return {
+        "items": items,
+        "count": totals["count"] or 0,
+        "subtotal": format_decimal(totals["subtotal"] or Decimal(0)),
+        "discount_total": format_decimal(totals["discount_total"] or Decimal(0)),
+        "total": format_decimal(totals["total"] or Decimal(0)),
+    }
@@ -0,0 +1,120 @@
+"""GET conditionnels (ETag / Last-Modified) pour les endpoints du catalogue.
+
+Les validateurs sont calculés à partir de max(updated_at) et du nombre de lignes
+des tables concernées (le nombre de lignes rend visibles les suppressions), en
+une seule requête et sans sérialiser la réponse. Last-Modified tient aussi
+compte de la dernière suppression dans le catalogue (``catalog_deleted_at``).
+"""
+
+import hashlib
+import math
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import Count, IntegerField, Max, Value
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import catalog_deleted_at
+from .models import Product, ProductImage, ProductVariant, ProductVariantSize
+
+
+def product_tree(**lookups):
+    """Querysets de l'arborescence produit (produits, variantes, tailles, images)
+    restreints aux produits correspondant à ``lookups``."""
+
+    def prefixed(prefix):
+        return {f"{prefix}{key}": value for key, value in lookups.items()}
+
+    return [
+        Product.objects.filter(**lookups),
+        ProductVariant.objects.filter(**prefixed("product__")),
+        ProductVariantSize.objects.filter(**prefixed("variant__product__")),
+        ProductImage.objects.filter(**prefixed("product__")),
+    ]
+
+
+def catalog_validators(querysets):
+    """Retourne ``(signature, last_modified)`` pour les querysets donnés."""
+    summaries = [
+        queryset.order_by()
+        .annotate(table=Value(index, output_field=IntegerField()))
+        .values("table")
+        .annotate(last=Max("updated_at"), count=Count("pk"))
+        .values_list("table", "last", "count")
+        for index, queryset in enumerate(querysets)
+    ]
+    rows = summaries[0].union(*summaries[1:], all=True) if len(summaries) > 1 else summaries[0]
+    rows = sorted(rows, key=lambda row: row[0])
+    signature = ";".join(
+        f"{table}:{last.isoformat() if last else ''}:{count}" for table, last, count in rows
+    )
+    last_modified = max((last for _, last, _ in rows if last), default=None)
+    return signature, last_modified
+
+
+def _validators(request, get_querysets, kwargs):
+    signature, last_modified = catalog_validators(get_querysets(**kwargs))
+    etag = '"%s"' % hashlib.md5(
+        f"{request.get_full_path()}|{signature}".encode()
+    ).hexdigest()
+    # Arrondi au-dessus : une suppression dans la seconde du dernier
+    # Last-Modified envoyé doit quand même le faire avancer
+    timestamp = math.ceil(catalog_deleted_at())
+    if last_modified:
+        timestamp = max(timestamp, int(last_modified.timestamp()))
+    return etag, timestamp
+
+
+def _set_validators(response, etag, timestamp):
+    response["ETag"] = etag
+    if timestamp is not None:
+        response["Last-Modified"] = http_date(timestamp)
+    return response
+
+
+def conditional_catalog_response(get_querysets):
+    """Répond 304 quand le client a déjà la version courante (à placer sous ``@api_view``).
+
+    ``get_querysets(**kwargs)`` reçoit les arguments de l'URL et retourne les
+    querysets dont dépend la réponse. S'applique aussi aux vues asynchrones.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                etag, timestamp = await sync_to_async(_validators)(
+                    request, get_querysets, kwargs
+                )
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=timestamp
+                )
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                return _set_validators(response, etag, timestamp)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            etag, timestamp = _validators(request, get_querysets, kwargs)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return _set_validators(response, etag, timestamp)
+
+        return wrapper
+
+    return decorator
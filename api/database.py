@@ -0,0 +1,37 @@
+"""État des connexions à la base, pour régler le pool et la persistance.
+
+Les valeurs sont celles du worker qui répond (chaque processus a son propre
+pool) : interroger l'endpoint plusieurs fois pour voir plusieurs workers.
+"""
+
+import os
+
+from django.db import connections
+
+
+def pool_stats(connection):
+    """Compteurs ``psycopg_pool`` du pool de la connexion, ou None sans pool."""
+    pool = getattr(connection, "pool", None)
+    if pool is None:
+        return None
+    # get_stats() ne remet pas les compteurs à zéro (contrairement à pop_stats())
+    return {"name": pool.name, "closed": pool.closed, **pool.get_stats()}
+
+
+def connection_stats():
+    databases = {}
+    for alias in connections:
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        options = settings_dict.get("OPTIONS", {})
+        databases[alias] = {
+            "vendor": connection.vendor,
+            "conn_max_age": settings_dict.get("CONN_MAX_AGE"),
+            "conn_health_checks": settings_dict.get("CONN_HEALTH_CHECKS"),
+            "server_side_binding": bool(options.get("server_side_binding")),
+            "server_side_cursors": not settings_dict.get(
+                "DISABLE_SERVER_SIDE_CURSORS"
+            ),
+            "pool": pool_stats(connection),
+        }
+    return {"pid": os.getpid(), "databases": databases}
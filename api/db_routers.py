@@ -0,0 +1,109 @@
+"""Routage des lectures du catalogue vers des réplicas en lecture seule.
+
+``DATABASE_REPLICAS`` liste les alias de ``DATABASES`` qui sont des réplicas.
+Les lectures des modèles du catalogue (``CATALOG_MODELS``) y sont envoyées, sur
+un même réplica tiré au hasard pour toute la requête HTTP ; les autres modèles
+et toutes les écritures restent sur ``default``. Une requête est épinglée sur
+``default`` :
+
+- si sa méthode n'est pas sûre (POST, PUT, PATCH, DELETE : voir
+  ``api.middleware.ReplicaRoutingMiddleware``) ;
+- dès qu'elle écrit, pour relire ses propres écritures ;
+- tant qu'une transaction est ouverte sur ``default``.
+
+Hors requête (commandes, shell), le contexte courant suit les mêmes règles.
+
+Essai local avec deux bases SQLite, dans un fichier de réglages local :
+
+    DATABASES = {
+        "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": "db.sqlite3"},
+        "replica": {"ENGINE": "django.db.backends.sqlite3", "NAME": "replica.sqlite3"},
+    }
+    DATABASE_REPLICAS = ["replica"]
+
+puis ``cp db.sqlite3 replica.sqlite3`` pour « répliquer ».
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CATALOG_MODELS = {
+    "api.category",
+    "api.subcategory",
+    "api.product",
+    "api.productvariant",
+    "api.productvariantsize",
+    "api.productimage",
+    "api.productcard",
+    "api.rating",
+}
+
+
+class RoutingState:
+    """Choix de base du contexte courant : réplica tiré une fois, épinglage."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = None
+
+
+_state = ContextVar("catalog_db_routing")
+
+
+def _current_state():
+    state = _state.get(None)
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+@contextmanager
+def routing_context(pinned=False):
+    """Nouvel état de routage (une requête HTTP), restauré à la sortie."""
+    token = _state.set(RoutingState(pinned))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+def pin_to_primary():
+    _current_state().pinned = True
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+class CatalogReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or model._meta.label_lower not in CATALOG_MODELS:
+            return DEFAULT_DB_ALIAS
+        state = _current_state()
+        if state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica not in aliases:
+            state.replica = random.choice(aliases)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les réplicas ont les mêmes données que le primaire
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,142 @@
+"""Filtres à facettes de la liste des produits et calcul des compteurs associés."""
+
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import ProductVariant, ProductVariantSize
+from .pricing import effective_price
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def _split(value):
+    return [item for item in (part.strip() for part in value.split(",")) if item]
+
+
+def _decimal(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    # Decimal accepte « NaN » et « Infinity », que le filtre ne sait pas comparer
+    if number is None or not number.is_finite():
+        raise ValidationError({name: "Doit être un nombre."})
+    return number
+
+
+def _ids(params, name):
+    values = _split(params.get(name, ""))
+    # Chiffres ASCII seulement : isdigit() accepte « ² » ou « ٣ », int() « 1_0 »
+    ids = [int(value) for value in values if value.isascii() and value.isdigit()]
+    if len(ids) != len(values) or any(pk < 1 for pk in ids):
+        raise ValidationError({name: "Doit être une liste d'identifiants."})
+    return ids
+
+
+def _money(value):
+    return None if value is None else f"{value:.2f}"
+
+
+def filter_products(products, params):
+    """Applique les filtres de la requête (``gender``, ``color``, ``size``,
+    ``price_min``, ``price_max``, ``category``, ``subcategory``, ``in_stock``).
+
+    Les filtres de variante portent sur une même variante : ``color=red&size=M``
+    retient les produits ayant une variante rouge disponible en M.
+    """
+    genders = _split(params.get("gender", ""))
+    if genders:
+        products = products.filter(gender__in=genders)
+    categories = _ids(params, "category")
+    if categories:
+        products = products.filter(category_id__in=categories)
+    subcategories = _ids(params, "subcategory")
+    if subcategories:
+        products = products.filter(subCategory_id__in=subcategories)
+
+    variants = ProductVariant.objects.filter(product=OuterRef("pk"))
+    variant_filtered = False
+    colors = _split(params.get("color", ""))
+    if colors:
+        variants = variants.filter(color__in=colors)
+        variant_filtered = True
+    sizes = _split(params.get("size", ""))
+    if sizes:
+        variants = variants.filter(
+            Exists(
+                ProductVariantSize.objects.filter(
+                    variant=OuterRef("pk"), size__in=sizes
+                )
+            )
+        )
+        variant_filtered = True
+    price_min = _decimal(params, "price_min")
+    price_max = _decimal(params, "price_max")
+    if price_min is not None or price_max is not None:
+        variants = variants.alias(effective_price=effective_price())
+        if price_min is not None:
+            variants = variants.filter(effective_price__gte=price_min)
+        if price_max is not None:
+            variants = variants.filter(effective_price__lte=price_max)
+        variant_filtered = True
+    if params.get("in_stock", "").lower() in TRUE_VALUES:
+        variants = variants.filter(stock__gt=0)
+        variant_filtered = True
+    if variant_filtered:
+        products = products.filter(Exists(variants))
+    return products
+
+
+def product_facets(products):
+    """Compteurs de facettes (nombre de produits par valeur) pour ``products``.
+
+    Quatre requêtes d'agrégation au total, quel que soit le nombre de valeurs.
+    """
+    products = products.order_by()
+    gender, category, subcategory = {}, {}, {}
+    for row in products.values("gender", "category", "subCategory").annotate(
+        count=Count("id")
+    ):
+        gender[row["gender"]] = gender.get(row["gender"], 0) + row["count"]
+        category[row["category"]] = category.get(row["category"], 0) + row["count"]
+        if row["subCategory"] is not None:
+            subcategory[row["subCategory"]] = (
+                subcategory.get(row["subCategory"], 0) + row["count"]
+            )
+
+    variants = ProductVariant.objects.filter(product__in=products.values("id"))
+    color = {
+        row["color"]: row["count"]
+        for row in variants.values("color")
+        .annotate(count=Count("product", distinct=True))
+        .order_by("color")
+    }
+    size = {
+        row["size"]: row["count"]
+        for row in ProductVariantSize.objects.filter(variant__in=variants.values("id"))
+        .values("size")
+        .annotate(count=Count("variant__product", distinct=True))
+        .order_by("size")
+    }
+    summary = variants.aggregate(
+        price_min=Min(effective_price()),
+        price_max=Max(effective_price()),
+        in_stock=Count("product", distinct=True, filter=Q(stock__gt=0)),
+    )
+    return {
+        "gender": gender,
+        "category": category,
+        "subcategory": subcategory,
+        "color": color,
+        "size": size,
+        "price": {
+            "min": _money(summary["price_min"]),
+            "max": _money(summary["price_max"]),
+        },
+        "in_stock": summary["in_stock"],
+    }
@@ -0,0 +1,266 @@
+"""Sérialisation rapide des endpoints de lecture les plus sollicités.
+
+Produit exactement le même JSON que ``ProductSerializer``,
+``ProductVariantSerializer`` et ``CategorySerializer``, mais à partir de lignes
+``values()`` assemblées avec des dict et des listes, sans instancier de modèles
+ni de champs DRF. La parité est vérifiée par ``api.tests``.
+
+Le chargement (``variant_querysets``) est séparé de l'assemblage
+(``build_*``), qui ne fait aucune requête : les variantes ``a*`` chargent les
+mêmes querysets en parallèle avec l'ORM asynchrone.
+"""
+
+import asyncio
+from decimal import Decimal
+
+from .images import image_srcset
+from .models import Product, ProductImage, ProductVariant, ProductVariantSize
+from .ratings import STAR_VALUES
+
+CATEGORY_COLUMNS = ["id", "title", "slug", "short_desc", "long_desc"]
+PRODUCT_COLUMNS = [
+    "id",
+    "title",
+    "short_desc",
+    "long_desc",
+    "category_id",
+    "subCategory_id",
+    "gender",
+    "rating_count",
+    "rating_avg",
+    "rating_1",
+    "rating_2",
+    "rating_3",
+    "rating_4",
+    "rating_5",
+]
+PRODUCT_SUMMARY_COLUMNS = [
+    "id",
+    "title",
+    "category_id",
+    "subCategory_id",
+    "gender",
+    "rating_count",
+    "rating_avg",
+]
+VARIANT_COLUMNS = ["id", "product_id", "color", "price", "stock", "discount"]
+SIZE_COLUMNS = ["id", "variant_id", "size"]
+IMAGE_COLUMNS = ["id", "variant_id", "image", "mainImage"]
+
+CENT = Decimal("0.01")
+
+
+def format_decimal(value):
+    """Même rendu que ``serializers.DecimalField(decimal_places=2)``."""
+    if value is None:
+        return ""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value).strip())
+    return "{:f}".format(value.quantize(CENT))
+
+
+def image_url(name, storage=ProductImage._meta.get_field("image").storage):
+    """Même rendu que ``serializers.ImageField(use_url=True)`` sans requête."""
+    return storage.url(name) if name else None
+
+
+def rating_row_summary(row):
+    """Même rendu que ``serializers.rating_summary`` pour une ligne ``values()``."""
+    return {
+        "count": row["rating_count"],
+        "average": round(row["rating_avg"], 2),
+        "histogram": {str(stars): row[f"rating_{stars}"] for stars in STAR_VALUES},
+    }
+
+
+def serialize_categories(categories):
+    return list(categories.values(*CATEGORY_COLUMNS))
+
+
+def variant_querysets(**variant_lookups):
+    """Querysets ``values()`` des variantes, tailles et images (indépendants entre eux)."""
+
+    def prefixed(prefix):
+        return {f"{prefix}{key}": value for key, value in variant_lookups.items()}
+
+    return (
+        ProductVariant.objects.filter(**variant_lookups)
+        .order_by("id")
+        .values(*VARIANT_COLUMNS),
+        ProductVariantSize.objects.filter(**prefixed("variant__"))
+        .order_by("id")
+        .values(*SIZE_COLUMNS),
+        ProductImage.objects.filter(**prefixed("variant__"))
+        .order_by("id")
+        .values(*IMAGE_COLUMNS),
+    )
+
+
+def build_variants(variant_rows, size_rows, image_rows):
+    """Assemble les variantes (avec tailles et images), dans l'ordre des lignes."""
+    sizes = {}
+    for row in size_rows:
+        sizes.setdefault(row["variant_id"], []).append(
+            {"id": row["id"], "variant": row["variant_id"], "size": row["size"]}
+        )
+    images = {}
+    for row in image_rows:
+        images.setdefault(row["variant_id"], []).append(
+            {
+                "id": row["id"],
+                "image": image_url(row["image"]),
+                "srcset": image_srcset(row["image"]),
+                "mainImage": row["mainImage"],
+                "variant": row["variant_id"],
+            }
+        )
+    return [
+        (
+            row["product_id"],
+            {
+                "id": row["id"],
+                "color": row["color"],
+                "price": format_decimal(row["price"]),
+                "stock": row["stock"],
+                "sizes": sizes.get(row["id"], []),
+                "images": images.get(row["id"], []),
+                "discount": row["discount"],
+            },
+        )
+        for row in variant_rows
+    ]
+
+
+def build_products(product_rows, variants):
+    """Assemble les produits à partir de leurs lignes et de ``build_variants``."""
+    by_product = {}
+    for product_id, variant in variants:
+        by_product.setdefault(product_id, []).append(variant)
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "short_desc": row["short_desc"],
+            "long_desc": row["long_desc"],
+            "category": row["category_id"],
+            "subCategory": row["subCategory_id"],
+            "gender": row["gender"],
+            "variants": by_product.get(row["id"], []),
+            "rating": rating_row_summary(row),
+        }
+        for row in product_rows
+    ]
+
+
+def serialize_product_rows(product_rows):
+    """Sérialise des lignes ``values(*PRODUCT_COLUMNS)`` : 3 requêtes au total."""
+    product_rows = list(product_rows)
+    if not product_rows:
+        return []
+    ids = [row["id"] for row in product_rows]
+    variant_rows, size_rows, image_rows = variant_querysets(product_id__in=ids)
+    return build_products(
+        product_rows, build_variants(variant_rows, size_rows, image_rows)
+    )
+
+
+def serialize_products(products):
+    """Sérialise un queryset de produits : 4 requêtes au total."""
+    return serialize_product_rows(products.values(*PRODUCT_COLUMNS))
+
+
+def serialize_variant_details(variant_id):
+    """Réponse de ``get_variant_details`` (variante + produit parent), ou None."""
+    products = serialize_products(Product.objects.filter(variants=variant_id))
+    if not products:
+        return None
+    product = products[0]
+    variant = next(v for v in product["variants"] if v["id"] == variant_id)
+    return {**variant, "product": product}
+
+
+def serialize_variants(variant_ids):
+    """Réponse de ``get_variants_bulk`` : 4 requêtes quel que soit le nombre d'ids.
+
+    Les variantes gardent l'ordre de ``variant_ids`` et portent l'id de leur
+    produit ; chaque produit parent n'est résumé qu'une fois dans ``products``.
+    """
+    variant_rows, size_rows, image_rows = variant_querysets(id__in=variant_ids)
+    found = {
+        variant["id"]: {**variant, "product": product_id}
+        for product_id, variant in build_variants(variant_rows, size_rows, image_rows)
+    }
+    product_ids = {variant["product"] for variant in found.values()}
+    products = (
+        Product.objects.filter(pk__in=product_ids).values(*PRODUCT_SUMMARY_COLUMNS)
+        if product_ids
+        else []
+    )
+    return {
+        "variants": [found[pk] for pk in variant_ids if pk in found],
+        "products": {
+            str(row["id"]): {
+                "id": row["id"],
+                "title": row["title"],
+                "category": row["category_id"],
+                "subCategory": row["subCategory_id"],
+                "gender": row["gender"],
+                "rating": {
+                    "count": row["rating_count"],
+                    "average": round(row["rating_avg"], 2),
+                },
+            }
+            for row in products
+        },
+        "missing": [pk for pk in variant_ids if pk not in found],
+    }
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def aserialize_product_rows(product_rows):
+    """Comme ``serialize_product_rows``, les 3 requêtes étant lancées ensemble."""
+    if not product_rows:
+        return []
+    ids = [row["id"] for row in product_rows]
+    variant_rows, size_rows, image_rows = await asyncio.gather(
+        *map(_alist, variant_querysets(product_id__in=ids))
+    )
+    return build_products(
+        product_rows, build_variants(variant_rows, size_rows, image_rows)
+    )
+
+
+async def _aproducts(**product_lookups):
+    """Produits correspondant à ``product_lookups`` : les 4 requêtes ne dépendent
+    que des paramètres et sont lancées ensemble."""
+    variant_lookups = {f"product__{key}": value for key, value in product_lookups.items()}
+    product_rows, variant_rows, size_rows, image_rows = await asyncio.gather(
+        _alist(Product.objects.filter(**product_lookups).values(*PRODUCT_COLUMNS)),
+        *map(_alist, variant_querysets(**variant_lookups)),
+    )
+    return build_products(
+        product_rows, build_variants(variant_rows, size_rows, image_rows)
+    )
+
+
+async def aserialize_product(pk):
+    """Réponse de ``get_product``, ou None."""
+    products = await _aproducts(pk=pk)
+    return products[0] if products else None
+
+
+async def aserialize_variant_details(variant_id):
+    """Comme ``serialize_variant_details`` : variante et produit chargés ensemble."""
+    products = await _aproducts(variants=variant_id)
+    if not products:
+        return None
+    product = products[0]
+    variant = next(v for v in product["variants"] if v["id"] == variant_id)
+    return {**variant, "product": product}
+
+
+async def aserialize_categories(categories):
+    return await _alist(categories.values(*CATEGORY_COLUMNS))
@@ -0,0 +1,142 @@
+"""Champs partiels (``?fields=``) et relations à la demande (``?expand=``).
+
+``?fields=id,title,variants.price`` limite les champs renvoyés (les chemins
+pointés visent les relations imbriquées) et ``?expand=variants.images`` active
+une relation imbriquée. Sans aucun de ces paramètres, la réponse complète
+historique est renvoyée. Le queryset suit la demande : colonnes inutiles
+différées et préchargements superflus supprimés.
+"""
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+# Colonnes lues par les champs calculés (SerializerMethodField)
+COMPUTED_COLUMNS = {
+    "rating": [
+        "rating_count",
+        "rating_avg",
+        "rating_1",
+        "rating_2",
+        "rating_3",
+        "rating_4",
+        "rating_5",
+    ],
+    "srcset": ["image"],
+}
+
+# Colonnes volumineuses jamais sérialisées
+DEFERRED_COLUMNS = {"search_vector"}
+
+
+class FieldNode:
+    """Champs demandés à un niveau de la réponse.
+
+    ``fields`` vaut None quand tous les champs simples sont demandés ;
+    ``expand`` associe chaque relation incluse à son propre nœud.
+    """
+
+    def __init__(self):
+        self.fields = None
+        self.expand = {}
+
+    def child(self, name):
+        return self.expand.setdefault(name, FieldNode())
+
+
+def _paths(value):
+    return [path.split(".") for path in (value or "").split(",") if path.strip()]
+
+
+def parse_fieldset(request):
+    """Construit l'arbre des champs demandés, ou None pour la réponse complète."""
+    fields = request.query_params.get("fields")
+    expand = request.query_params.get("expand")
+    if fields is None and expand is None:
+        return None
+    root = FieldNode()
+    for path in _paths(expand):
+        node = root
+        for name in path:
+            node = node.child(name.strip())
+    for path in _paths(fields):
+        node = root
+        for name in path[:-1]:
+            node = node.child(name.strip())
+        if node.fields is None:
+            node.fields = set()
+        node.fields.add(path[-1].strip())
+    if fields is not None and root.fields is None:
+        root.fields = set()
+    return root
+
+
+def _is_relation(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def _nested(field):
+    return field.child if isinstance(field, serializers.ListSerializer) else field
+
+
+def relation_fieldset(node, name):
+    """Nœud d'une relation si elle est demandée (``expand`` ou ``fields``), sinon None."""
+    if name in node.expand:
+        return node.expand[name]
+    if node.fields is not None and name in node.fields:
+        return FieldNode()
+    return None
+
+
+def shape_serializer(serializer, node):
+    """Retire du serializer (et de ses serializers imbriqués) les champs non demandés."""
+    if node is None:
+        return serializer
+    fields = _nested(serializer).fields
+    for name, field in list(fields.items()):
+        if _is_relation(field):
+            child_node = relation_fieldset(node, name)
+            if child_node is None:
+                fields.pop(name)
+            else:
+                shape_serializer(field, child_node)
+        elif node.fields is not None and name not in node.fields:
+            fields.pop(name)
+    return serializer
+
+
+def shape_queryset(queryset, node, serializer_class, required=()):
+    """Adapte ``queryset`` aux champs demandés : ``only()`` et préchargements utiles.
+
+    ``required`` liste les colonnes toujours chargées (clé vers le parent d'un
+    préchargement, champ d'ordre de la pagination…).
+    """
+    model = queryset.model
+    declared = serializer_class().fields
+    relations = {}
+    columns = {"pk", *required}
+    for name, field in declared.items():
+        if _is_relation(field):
+            if node is None:
+                relations[name] = None
+            else:
+                child_node = relation_fieldset(node, name)
+                if child_node is not None:
+                    relations[name] = child_node
+        elif node is not None and (node.fields is None or name in node.fields):
+            columns.update(COMPUTED_COLUMNS.get(name, [name]))
+
+    for name, child_node in relations.items():
+        relation = model._meta.get_field(name)
+        child_queryset = shape_queryset(
+            relation.related_model.objects.order_by("pk"),
+            child_node,
+            type(_nested(declared[name])),
+            required=[relation.field.name],
+        )
+        queryset = queryset.prefetch_related(Prefetch(name, queryset=child_queryset))
+
+    concrete = {field.name for field in model._meta.concrete_fields}
+    if node is None:
+        deferred = DEFERRED_COLUMNS & concrete
+        return queryset.defer(*deferred) if deferred else queryset
+    return queryset.only(*(c for c in columns if c == "pk" or c in concrete))
@@ -0,0 +1,210 @@
+"""Déclinaisons redimensionnées des images produit (Pillow), avec cache disque.
+
+Une déclinaison est définie par l'image source (nom dans le stockage des
+médias), une largeur prise dans ``IMAGE_WIDTHS`` et un format choisi d'après
+l'en-tête ``Accept`` (AVIF si Pillow sait l'encoder, puis WebP, sinon JPEG ou
+PNG pour les sources transparentes). Les fichiers produits sont rangés dans
+``IMAGE_CACHE_DIR`` ; au-delà de ``IMAGE_CACHE_MAX_BYTES``, les moins
+récemment servis sont supprimés (la date de modification sert de date
+d'accès). La clé de cache inclut la date de modification de la source : une
+source remplacée produit de nouvelles déclinaisons.
+
+Parcourir le répertoire du cache coûte un ``stat`` par fichier : une requête ne
+le fait pas à chaque déclinaison générée. Chaque processus tient une taille
+estimée (celle du dernier parcours plus ce qu'il a écrit depuis) et ne
+parcourt le cache que lorsqu'elle dépasse la limite ; il descend alors à
+``EVICT_TARGET`` de la limite, ce qui espace les parcours suivants. Les
+écritures des autres workers ne sont rattrapées qu'au parcours suivant.
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps
+
+from .models import ProductImage
+
+# Format : (nom Pillow, type MIME, options d'encodage)
+FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 55}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": (
+        "JPEG",
+        "image/jpeg",
+        {"quality": 82, "optimize": True, "progressive": True},
+    ),
+    "png": ("PNG", "image/png", {"optimize": True}),
+}
+
+# Ordre de préférence quand le client accepte plusieurs formats
+NEGOTIATED_FORMATS = ("avif", "webp")
+
+# Part de IMAGE_CACHE_MAX_BYTES conservée par une éviction déclenchée par une requête
+EVICT_TARGET = 0.9
+
+# Taille estimée du cache par répertoire, pour ce processus (voir plus haut)
+_estimated_bytes = {}
+_estimate_lock = threading.Lock()
+
+
+def storage():
+    return ProductImage._meta.get_field("image").storage
+
+
+def widths():
+    return sorted(settings.IMAGE_WIDTHS)
+
+
+def supported_formats():
+    Image.init()
+    return [name for name, (pil_format, *_) in FORMATS.items() if pil_format in Image.SAVE]
+
+
+def bucket_width(width):
+    """Plus petite largeur de ``IMAGE_WIDTHS`` couvrant ``width`` (sinon la plus grande)."""
+    buckets = widths()
+    return next((bucket for bucket in buckets if bucket >= width), buckets[-1])
+
+
+def negotiate_format(accept):
+    """Format moderne accepté par le client, ou None (JPEG ou PNG selon la source)."""
+    supported = supported_formats()
+    for name in NEGOTIATED_FORMATS:
+        if name in supported and FORMATS[name][1] in accept:
+            return name
+    return None
+
+
+def resized_url(name, width):
+    # Encodée comme storage.url() : srcset sépare les URL par des espaces
+    return f"{settings.RESIZED_IMAGES_URL}{width}/{filepath_to_uri(name)}"
+
+
+def image_srcset(name):
+    """Valeur de l'attribut HTML ``srcset`` (une URL par largeur), None sans image."""
+    if not name:
+        return None
+    return ", ".join(f"{resized_url(name, width)} {width}w" for width in widths())
+
+
+def source_images(directory="products"):
+    """Noms (dans le stockage des médias) des fichiers sous ``directory``."""
+    files = storage()
+    if not files.exists(directory):
+        return
+    subdirectories, filenames = files.listdir(directory)
+    for filename in sorted(filenames):
+        yield f"{directory}/{filename}"
+    for subdirectory in sorted(subdirectories):
+        yield from source_images(f"{directory}/{subdirectory}")
+
+
+def _source_is_transparent(image):
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def _cache_path(name, width, format_name, source_mtime):
+    key = hashlib.sha256(f"{name}|{source_mtime}".encode()).hexdigest()
+    return os.path.join(
+        settings.IMAGE_CACHE_DIR, key[:2], key, f"{width}.{format_name}"
+    )
+
+
+def _render(source, path, width, format_name):
+    pil_format, _, options = FORMATS[format_name]
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        # Jamais d'agrandissement : la source plus étroite est seulement réencodée
+        if image.width > width:
+            image = image.resize(
+                (width, max(1, round(image.height * width / image.width))),
+                Image.Resampling.LANCZOS,
+            )
+        if format_name == "jpeg" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        image.save(temporary, pil_format, **options)
+    os.replace(temporary, path)
+
+
+def get_derivative(name, width, accept=""):
+    """Chemin et type MIME de la déclinaison négociée, générée si besoin.
+
+    Lève ``FileNotFoundError`` si la source n'existe pas et
+    ``PIL.UnidentifiedImageError`` si ce n'est pas une image.
+    """
+    return ensure_derivative(name, width, negotiate_format(accept))
+
+
+def ensure_derivative(name, width, format_name=None, evict_after=True):
+    """Comme ``get_derivative`` pour un format donné (None : JPEG ou PNG selon la source)."""
+    source = storage().path(name)
+    source_mtime = os.stat(source).st_mtime_ns
+    if format_name is None:
+        with Image.open(source) as image:
+            format_name = "png" if _source_is_transparent(image) else "jpeg"
+    path = _cache_path(name, width, format_name, source_mtime)
+    try:
+        os.utime(path)  # Dernier accès, pour l'éviction LRU
+    except FileNotFoundError:
+        _render(source, path, width, format_name)
+        if evict_after and _over_limit(os.path.getsize(path)):
+            max_bytes = settings.IMAGE_CACHE_MAX_BYTES
+            evict(max_bytes, int(max_bytes * EVICT_TARGET))
+    return path, FORMATS[format_name][1]
+
+
+def _over_limit(written):
+    """Ajoute ``written`` à la taille estimée ; vrai s'il faut parcourir le cache."""
+    directory = settings.IMAGE_CACHE_DIR
+    with _estimate_lock:
+        if directory not in _estimated_bytes:
+            return True  # Jamais mesuré par ce processus
+        _estimated_bytes[directory] += written
+        return _estimated_bytes[directory] > settings.IMAGE_CACHE_MAX_BYTES
+
+
+def _cached_files():
+    for directory, _, filenames in os.walk(settings.IMAGE_CACHE_DIR):
+        for filename in filenames:
+            if not filename.endswith(".tmp"):
+                yield os.path.join(directory, filename)
+
+
+def evict(max_bytes, target_bytes=None):
+    """Au-delà de ``max_bytes``, supprime les déclinaisons les moins récemment
+    servies jusqu'à descendre à ``target_bytes`` (par défaut ``max_bytes``)."""
+    if target_bytes is None:
+        target_bytes = max_bytes
+    entries = []
+    total = 0
+    for path in _cached_files():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:  # Supprimé par un autre worker
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+    removed = 0
+    if total > max_bytes:
+        for _, size, path in sorted(entries):
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+    with _estimate_lock:
+        _estimated_bytes[settings.IMAGE_CACHE_DIR] = total
+    return removed
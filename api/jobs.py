@@ -0,0 +1,134 @@
+"""File de tâches de fond stockée en base (table ``api_job``).
+
+Une tâche est une fonction enregistrée avec ``@task`` (voir ``api.tasks``) ;
+``enqueue`` ajoute une ligne à la file, dans la transaction courante : la
+tâche n'est visible des workers qu'une fois la requête validée. La commande
+``run_jobs`` réserve les tâches dues et les exécute dans un pool de threads.
+
+Une tâche qui lève une exception est retentée plus tard (attente doublée à
+chaque essai, de ``JOBS_RETRY_BASE_SECONDS`` jusqu'à ``JOBS_RETRY_MAX_SECONDS``)
+puis, après ``max_attempts`` essais, passe au statut ``dead`` et son
+``on_dead`` est appelé. Une tâche réservée par un worker arrêté brutalement est
+reprise après ``JOBS_LOCK_TIMEOUT`` secondes : une tâche doit donc supporter
+d'être exécutée deux fois.
+
+En production, au moins un processus ``run_jobs`` doit tourner à côté de
+gunicorn (service ``worker`` de docker-compose.yml) : sans lui, les tâches
+restent en file.
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger("api.jobs")
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, function, name, max_attempts, on_dead):
+        self.function = function
+        self.name = name
+        self.max_attempts = max_attempts
+        self.on_dead = on_dead
+
+    def __call__(self, **payload):
+        return self.function(**payload)
+
+    def enqueue(self, **payload):
+        return enqueue(self.name, **payload)
+
+
+def task(name=None, max_attempts=None, on_dead=None):
+    """Enregistre une fonction comme tâche ; ``on_dead(**payload)`` est appelé
+    quand la tâche est abandonnée."""
+
+    def decorator(function):
+        registered = Task(function, name or function.__name__, max_attempts, on_dead)
+        TASKS[registered.name] = registered
+        return registered
+
+    return decorator
+
+
+def enqueue(name, run_at=None, **payload):
+    if name not in TASKS:
+        raise LookupError(f"Tâche inconnue : {name}")
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=TASKS[name].max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def retry_delay(attempts):
+    """Attente avant le prochain essai (exponentielle, avec ±10 % d'aléa)."""
+    delay = min(
+        settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_MAX_SECONDS,
+    )
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def claim_jobs(limit):
+    """Réserve jusqu'à ``limit`` tâches dues (ou abandonnées par un worker disparu)."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    with transaction.atomic():
+        # skip_locked : plusieurs workers se partagent la file sans s'attendre
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.PENDING, run_at__lte=now)
+                | Q(status=Job.RUNNING, locked_at__lt=stale)
+            )
+            .order_by("run_at")
+            .values_list("id", flat=True)[:limit]
+        )
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING, locked_at=now, attempts=F("attempts") + 1
+        )
+    return list(Job.objects.filter(id__in=ids).order_by("run_at"))
+
+
+def run_job(job):
+    """Exécute une tâche réservée et enregistre son résultat (succès, nouvel essai, abandon)."""
+    registered = TASKS.get(job.name)
+    try:
+        if registered is None:
+            raise LookupError(f"Tâche inconnue : {job.name}")
+        registered(**job.payload)
+    except Exception as error:
+        job.last_error = f"{type(error).__name__}: {error}"
+        if registered is None or job.attempts >= job.max_attempts:
+            job.status = Job.DEAD
+            logger.error("Tâche %s abandonnée : %s", job, job.last_error)
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+            logger.warning("Tâche %s en échec, nouvel essai à %s", job, job.run_at)
+    else:
+        job.status = Job.DONE
+        job.last_error = ""
+    job.locked_at = None
+    job.save(update_fields=["status", "run_at", "locked_at", "last_error", "updated_at"])
+    if job.status == Job.DEAD and registered is not None and registered.on_dead:
+        try:
+            registered.on_dead(**job.payload)
+        except Exception:
+            logger.exception("on_dead de la tâche %s en échec", job)
+    return job
+
+
+def run_pending(limit=100):
+    """Exécute dans le thread courant les tâches dues (tests, développement)."""
+    return [run_job(job) for job in claim_jobs(limit)]
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.benchmark import run_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque route de api/urls.py (p50/p95/p99, requêtes SQL, taille des "
+        "réponses) et écrit le rapport en JSON. La base n'est pas modifiée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=50, help="Appels mesurés par route."
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=2, help="Appels non mesurés par route."
+        )
+        parser.add_argument(
+            "--only", nargs="+", help="Noms des routes à mesurer (toutes par défaut)."
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Laisse le cache du catalogue actif (désactivé par défaut).",
+        )
+        parser.add_argument(
+            "--output", help="Fichier JSON où écrire le rapport (sortie standard sinon)."
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations doit être au moins 1.")
+        try:
+            report = run_benchmark(
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                only=options["only"],
+                cache=options["cache"],
+            )
+        except LookupError as error:
+            raise CommandError(str(error))
+        report["generated_at"] = timezone.now().isoformat()
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+            self.stdout.write(
+                self.style.SUCCESS(f"Rapport écrit dans {options['output']}.")
+            )
+        else:
+            self.stdout.write(output)
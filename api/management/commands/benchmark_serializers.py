@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import fast_serializers
+from api.fieldsets import shape_queryset
+from api.models import Category, Product
+from api.serializers import CategorySerializer, ProductSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la sérialisation DRF et la sérialisation rapide (api.fast_serializers) "
+        "sur les produits et catégories existants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=24, help="Nombre de produits par itération."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=50, help="Nombre d'itérations."
+        )
+
+    def _measure(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings[len(timings) // 2] * 1000
+
+    def handle(self, *args, **options):
+        limit, repeat = options["limit"], options["repeat"]
+        products = Product.objects.order_by("id")[:limit]
+        categories = Category.objects.order_by("id")
+
+        cases = [
+            (
+                f"produits ({limit})",
+                lambda: ProductSerializer(
+                    shape_queryset(products, None, ProductSerializer), many=True
+                ).data,
+                lambda: fast_serializers.serialize_products(products),
+            ),
+            (
+                "catégories",
+                lambda: CategorySerializer(categories, many=True).data,
+                lambda: fast_serializers.serialize_categories(categories),
+            ),
+        ]
+        for label, drf, fast in cases:
+            if drf() != fast():
+                self.stderr.write(self.style.ERROR(f"{label} : réponses différentes."))
+                continue
+            drf_ms = self._measure(drf, repeat)
+            fast_ms = self._measure(fast, repeat)
+            speedup = drf_ms / fast_ms if fast_ms else float("inf")
+            self.stdout.write(
+                f"{label:<20} DRF {drf_ms:8.2f} ms   rapide {fast_ms:8.2f} ms   "
+                f"x{speedup:.1f}"
+            )
@@ -0,0 +1,61 @@
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import UnidentifiedImageError
+
+from api.images import (
+    NEGOTIATED_FORMATS,
+    ensure_derivative,
+    evict,
+    source_images,
+    supported_formats,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère à l'avance les déclinaisons redimensionnées des images de "
+        "media/products/ (toutes les largeurs de IMAGE_WIDTHS, formats modernes "
+        "et format de repli), pour que les premières requêtes ne les calculent pas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--widths",
+            type=int,
+            nargs="+",
+            help="Largeurs à générer, parmi IMAGE_WIDTHS (toutes par défaut).",
+        )
+
+    def handle(self, *args, **options):
+        widths = options["widths"] or settings.IMAGE_WIDTHS
+        unknown = sorted(set(widths) - set(settings.IMAGE_WIDTHS))
+        if unknown:
+            raise CommandError(f"Largeurs hors de IMAGE_WIDTHS : {unknown}.")
+        # None : JPEG, ou PNG pour les sources transparentes
+        formats = [name for name in NEGOTIATED_FORMATS if name in supported_formats()]
+        formats.append(None)
+
+        generated = skipped = 0
+        for name in source_images():
+            try:
+                for width in widths:
+                    for format_name in formats:
+                        ensure_derivative(name, width, format_name, evict_after=False)
+                        generated += 1
+            except (OSError, UnidentifiedImageError) as error:
+                skipped += 1
+                self.stderr.write(f"{name} ignoré : {error}")
+        removed = evict(settings.IMAGE_CACHE_MAX_BYTES)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{generated} déclinaisons prêtes, {skipped} fichiers ignorés."
+            )
+        )
+        if removed:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{removed} déclinaisons supprimées : le cache dépasse "
+                    f"IMAGE_CACHE_MAX_BYTES ({settings.IMAGE_CACHE_MAX_BYTES} octets)."
+                )
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.read_models import rebuild_product_cards
+
+
+class Command(BaseCommand):
+    help = "Reconstruit toutes les cartes produit (modèle de lecture des pages de liste)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Nombre de produits traités par lot.",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_product_cards(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"{count} cartes produit reconstruites.")
+        )
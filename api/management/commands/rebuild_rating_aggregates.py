@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats des avis (nombre, moyenne, histogramme) de tous les produits."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_rating_aggregates()
+        self.stdout.write(
+            self.style.SUCCESS(f"Agrégats recalculés ({count} produits notés).")
+        )
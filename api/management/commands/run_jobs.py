@@ -0,0 +1,97 @@
+import logging
+import signal
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from api.jobs import claim_jobs, run_job
+
+logger = logging.getLogger("api.jobs")
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Chaque thread a sa connexion : ne pas la laisser vieillir entre deux tâches
+        close_old_connections()
+
+
+def _check(futures, jobs):
+    """Journalise les tâches dont le résultat n'a pas pu être enregistré.
+
+    Les exceptions de la tâche elle-même sont gérées par ``run_job`` ; celles
+    qui sortent de ``run_job`` (base indisponible pendant ``save()``…) laissent
+    la tâche ``running`` jusqu'à ``JOBS_LOCK_TIMEOUT``, puis elle est rejouée.
+    """
+    for future in futures:
+        job = jobs.pop(future)
+        try:
+            future.result()
+        except Exception:
+            logger.exception("Tâche %s : résultat non enregistré", job)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les tâches de fond de la file (api.jobs) dans un pool de threads. "
+        "Tourne jusqu'à SIGINT/SIGTERM, qui laisse finir les tâches en cours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.JOBS_WORKER_THREADS,
+            help="Tâches exécutées en parallèle.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help="Secondes d'attente quand la file est vide.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Vide la file des tâches dues puis s'arrête.",
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads < 1:
+            raise CommandError("--threads doit être au moins 1.")
+        stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stopping.set())
+
+        done = 0
+        running = set()
+        submitted = {}  # Future -> tâche
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            while not stopping.is_set():
+                # Ne réserver que ce que le pool peut commencer tout de suite
+                free = threads - len(running)
+                jobs = claim_jobs(free) if free else []
+                for job in jobs:
+                    future = executor.submit(_run_in_thread, job)
+                    submitted[future] = job
+                    running.add(future)
+                if not running:
+                    if options["once"]:
+                        break
+                    close_old_connections()
+                    stopping.wait(options["poll_interval"])
+                    continue
+                timeout = None if free == len(jobs) else options["poll_interval"]
+                finished, running = wait(running, timeout, return_when=FIRST_COMPLETED)
+                _check(finished, submitted)
+                done += len(finished)
+            finished = wait(running).done
+            _check(finished, submitted)
+            done += len(finished)
+        self.stdout.write(self.style.SUCCESS(f"{done} tâches exécutées."))
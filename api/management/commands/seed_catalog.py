@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.seeding import DEFAULT_PREFIX, clear_seeded, seed_catalog
+
+# Option -> (valeur par défaut, aide)
+QUANTITIES = {
+    "categories": (5, "Nombre de catégories."),
+    "subcategories": (3, "Sous-catégories par catégorie."),
+    "products": (200, "Nombre total de produits."),
+    "variants": (3, "Variantes (couleurs) par produit, 8 au plus."),
+    "sizes": (4, "Tailles par variante, 6 au plus."),
+    "images": (2, "Images par variante."),
+    "ratings": (5, "Avis par produit."),
+    "users": (20, "Nombre d'utilisateurs."),
+    "cart-items": (3, "Articles du panier par utilisateur."),
+    "wishlist-items": (3, "Articles de la liste de souhaits par utilisateur."),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un catalogue synthétique (catégories, produits, variantes, tailles, "
+        "images, avis, utilisateurs avec panier et liste de souhaits)."
+    )
+
+    def add_arguments(self, parser):
+        for name, (default, help_text) in QUANTITIES.items():
+            parser.add_argument(f"--{name}", type=int, default=default, help=help_text)
+        parser.add_argument(
+            "--prefix",
+            default=DEFAULT_PREFIX,
+            help="Préfixe des slugs de catégorie et des noms d'utilisateur générés.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Graine du générateur aléatoire."
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Supprime d'abord les données générées avec le même préfixe.",
+        )
+
+    def handle(self, *args, **options):
+        quantities = {
+            name.replace("-", "_"): options[name.replace("-", "_")]
+            for name in QUANTITIES
+        }
+        if any(value < 0 for value in quantities.values()):
+            raise CommandError("Les quantités doivent être positives.")
+        if quantities["products"] and not quantities["categories"]:
+            raise CommandError("Il faut au moins une catégorie pour créer des produits.")
+        with transaction.atomic():
+            if options["clear"]:
+                clear_seeded(options["prefix"])
+            counts = seed_catalog(
+                prefix=options["prefix"], seed=options["seed"], **quantities
+            )
+        self.stdout.write(json.dumps(counts, indent=2))
+        self.stdout.write(self.style.SUCCESS("Catalogue synthétique généré."))
@@ -0,0 +1,284 @@
+"""Métriques des requêtes au format texte Prometheus, correctes avec plusieurs workers.
+
+Chaque processus accumule ses compteurs et histogrammes en mémoire et les écrit
+(au plus toutes les ``METRICS_FLUSH_INTERVAL`` secondes, et à sa sortie) dans son
+propre fichier de ``METRICS_DIR``. L'endpoint ``/api/metrics`` additionne tous
+les fichiers du répertoire : les valeurs sont celles de l'ensemble des workers,
+y compris ceux qui ont été recyclés. Le répertoire doit être partagé par les
+workers d'une même instance et vidé au démarrage du serveur (voir
+``clear_metrics``).
+
+L'endpoint n'est ouvert qu'aux requêtes portant ``Authorization: Bearer
+<METRICS_TOKEN>`` (``bearer_token`` dans la configuration de scrape de
+Prometheus) ; sans ``METRICS_TOKEN``, il reste fermé.
+"""
+
+import atexit
+import glob
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+logger = logging.getLogger("api.metrics")
+
+# Bornes supérieures des histogrammes (la case +Inf est ajoutée au rendu)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+METRICS = {
+    "shopsy_http_requests_total": ("counter", "Requêtes HTTP traitées."),
+    "shopsy_http_request_errors_total": (
+        "counter",
+        "Requêtes HTTP terminées par une erreur serveur (5xx).",
+    ),
+    "shopsy_http_request_duration_seconds": (
+        "histogram",
+        "Durée de traitement des requêtes HTTP.",
+    ),
+    "shopsy_db_queries_per_request": (
+        "histogram",
+        "Nombre de requêtes SQL par requête HTTP.",
+    ),
+    "shopsy_catalog_cache_lookups_total": (
+        "counter",
+        "Consultations du cache du catalogue, par résultat (hit, miss).",
+    ),
+}
+
+
+def metrics_dir():
+    return settings.METRICS_DIR
+
+
+class MetricsRegistry:
+    """Valeurs d'un processus ; ``labels`` est un tuple de couples (nom, valeur)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.pid = os.getpid()
+        # Le suffixe aléatoire évite d'écraser le fichier d'un ancien processus de même pid
+        self.path = os.path.join(
+            directory, f"metrics-{self.pid}-{uuid.uuid4().hex[:8]}.json"
+        )
+        self.lock = threading.Lock()
+        # Un seul thread écrit le fichier à la fois (workers gthread)
+        self.flush_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    "buckets": list(buckets),
+                    "counts": [0] * len(buckets),
+                    "sum": 0,
+                    "count": 0,
+                }
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def flush(self, force=False):
+        """Écrit les valeurs du processus dans son fichier (remplacement atomique).
+
+        Hors ``force``, un thread qui trouve une écriture en cours n'attend pas :
+        elle contiendra aussi ses valeurs, ou la suivante.
+        """
+        if not self.flush_lock.acquire(blocking=force):
+            return
+        try:
+            interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+            if not force and time.monotonic() - self.last_flush < interval:
+                return
+            with self.lock:
+                self.last_flush = time.monotonic()
+                data = {
+                    "counters": [
+                        [name, dict(labels), value]
+                        for (name, labels), value in self.counters.items()
+                    ],
+                    "histograms": [
+                        [name, dict(labels), histogram]
+                        for (name, labels), histogram in self.histograms.items()
+                    ],
+                }
+            os.makedirs(self.directory, exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as file:
+                json.dump(data, file)
+            os.replace(temporary, self.path)
+        finally:
+            self.flush_lock.release()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Registre du processus courant (recréé après un fork ou un changement de répertoire)."""
+    global _registry
+    registry = _registry
+    if (
+        registry is None
+        or registry.pid != os.getpid()
+        or registry.directory != metrics_dir()
+    ):
+        with _registry_lock:
+            registry = _registry
+            if (
+                registry is None
+                or registry.pid != os.getpid()
+                or registry.directory != metrics_dir()
+            ):
+                registry = _registry = MetricsRegistry(metrics_dir())
+    return registry
+
+
+@atexit.register
+def _flush_at_exit():
+    registry = _registry
+    if registry is not None and registry.pid == os.getpid():
+        try:
+            registry.flush(force=True)
+        except OSError:
+            pass
+
+
+def record_request(route, method, status, duration, queries):
+    registry = get_registry()
+    route_labels = (("route", route),)
+    registry.inc(
+        "shopsy_http_requests_total",
+        (("route", route), ("method", method), ("status", str(status))),
+    )
+    if status >= 500:
+        registry.inc("shopsy_http_request_errors_total", route_labels)
+    registry.observe(
+        "shopsy_http_request_duration_seconds", route_labels, duration, DURATION_BUCKETS
+    )
+    registry.observe(
+        "shopsy_db_queries_per_request", route_labels, queries, QUERY_BUCKETS
+    )
+    try:
+        registry.flush()
+    except OSError:
+        # Les valeurs restent en mémoire pour la prochaine écriture ; la
+        # requête mesurée ne doit pas échouer pour autant
+        logger.exception("Écriture des métriques impossible dans %s", registry.path)
+
+
+def collect(directory=None):
+    """Additionne les fichiers de tous les processus : ``(counters, histograms)``."""
+    counters, histograms = {}, {}
+    for path in glob.glob(os.path.join(directory or metrics_dir(), "metrics-*.json")):
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):  # Fichier supprimé entre-temps
+            continue
+        for name, labels, value in data["counters"]:
+            key = (name, tuple(sorted(labels.items())))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, histogram in data["histograms"]:
+            key = (name, tuple(sorted(labels.items())))
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = {
+                    "buckets": histogram["buckets"],
+                    "counts": list(histogram["counts"]),
+                    "sum": histogram["sum"],
+                    "count": histogram["count"],
+                }
+                continue
+            total["counts"] = [a + b for a, b in zip(total["counts"], histogram["counts"])]
+            total["sum"] += histogram["sum"]
+            total["count"] += histogram["count"]
+    return counters, histograms
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms):
+    """Format d'exposition texte de Prometheus (version 0.0.4)."""
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            continue
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                lines.append(
+                    f"{name}_bucket{_labels(labels, le=_number(bound))} {count}"
+                )
+            lines.append(
+                f'{name}_bucket{_labels(labels, le="+Inf")} {histogram["count"]}'
+            )
+            lines.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_text():
+    """Métriques agrégées de tous les workers, après écriture de celles du processus courant."""
+    get_registry().flush(force=True)
+    return render(*collect())
+
+
+def clear_metrics(directory=None):
+    """Supprime les fichiers de métriques (à appeler au démarrage du serveur)."""
+    for path in glob.glob(os.path.join(directory or metrics_dir(), "metrics-*")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class HasMetricsToken(BasePermission):
+    """Autorise les requêtes dont le jeton Bearer est ``settings.METRICS_TOKEN``."""
+
+    def has_permission(self, request, view):
+        expected = getattr(settings, "METRICS_TOKEN", "")
+        scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        return (
+            bool(expected)
+            and scheme.lower() == "bearer"
+            and hmac.compare_digest(token.strip().encode(), expected.encode())
+        )
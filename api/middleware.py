@@ -0,0 +1,251 @@
+"""Middlewares de mesure des requêtes et de routage des lectures.
+
+Tous fonctionnent en mode synchrone (WSGI) comme asynchrone (ASGI) : sous ASGI,
+un middleware seulement synchrone obligerait Django à exécuter toute la pile
+dans un thread, et les vues asynchrones de ``api.async_views`` ne libéreraient
+plus rien.
+"""
+
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .db_routers import replicas, routing_context
+from .metrics import record_request
+
+logger = logging.getLogger("api.profiling")
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _wrap_queries(wrapper):
+    """Installe ``wrapper`` sur toutes les connexions ; à refermer avec ``close()``.
+
+    Les connexions sont propres à chaque thread : sous ASGI, l'appel doit passer
+    par ``sync_to_async``, dans le thread où l'ORM asynchrone exécute les requêtes
+    de la vue.
+    """
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(wrapper))
+    return stack
+
+
+class AsyncCapableMiddleware:
+    """Base des middlewares de l'API : ``__call__`` ou ``__acall__`` selon la pile."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.call(request)
+
+
+class RequestProfile:
+    """Mesures d'une requête : temps et nombre de requêtes SQL, vue, rendu."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.view_start = None
+        self.view_end = None
+        self.render_end = None
+        self.total = None
+        self.size = None
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+    def rendered(self, response):
+        self.render_end = time.perf_counter()
+
+    def metrics(self):
+        """Durées en millisecondes ; la vue inclut la sérialisation et ses requêtes SQL."""
+        metrics = {"db": _ms(self.db_time)}
+        if self.view_start is not None:
+            view_end = self.view_end or self.start + self.total
+            metrics["view"] = _ms(view_end - self.view_start)
+            if self.view_end is not None and self.render_end is not None:
+                metrics["render"] = _ms(self.render_end - self.view_end)
+        metrics["total"] = _ms(self.total)
+        return metrics
+
+    def server_timing(self):
+        parts = []
+        for name, duration in self.metrics().items():
+            part = f"{name};dur={duration}"
+            if name == "db":
+                part += f';desc="{self.db_queries} queries"'
+            parts.append(part)
+        if self.size is not None:
+            parts.append(f'bytes;desc="{self.size}"')
+        return ", ".join(parts)
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Ajoute un en-tête ``Server-Timing`` (SQL, vue, rendu, total, taille).
+
+    Réglages : ``PROFILING_ENABLED`` (sinon le middleware est retiré de la pile au
+    démarrage), ``PROFILING_SAMPLE_RATE`` (part des requêtes mesurées, de 0 à 1)
+    et ``PROFILING_SLOW_REQUEST_MS`` (au-delà, la requête est journalisée sur le
+    logger ``api.profiling`` ; 0 pour désactiver). À placer en tête de
+    ``MIDDLEWARE`` pour que le total couvre toute la pile.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+        self.slow_request_ms = getattr(settings, "PROFILING_SLOW_REQUEST_MS", 0)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def call(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        profile = request.profile = RequestProfile()
+        with _wrap_queries(profile.db_wrapper):
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        profile = request.profile = RequestProfile()
+        queries = await sync_to_async(_wrap_queries)(profile.db_wrapper)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        profile.total = time.perf_counter() - profile.start
+        if not response.streaming:
+            profile.size = len(response.content)
+        response["Server-Timing"] = profile.server_timing()
+        if self.slow_request_ms and profile.total * 1000 >= self.slow_request_ms:
+            logger.warning(
+                "Requête lente %s %s (%s) : %s",
+                request.method,
+                request.get_full_path(),
+                response.status_code,
+                response["Server-Timing"],
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Appelé juste après la vue, avant le rendu (les Response DRF sont rendues ici)
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.view_end = time.perf_counter()
+            response.add_post_render_callback(profile.rendered)
+        return response
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Alimente ``api.metrics`` : requêtes, erreurs, durée et requêtes SQL par route.
+
+    La route est le nom d'URL (``get_products``, ``add_to_cart``…), ou
+    ``unmatched`` quand aucune URL ne correspond. Retiré de la pile si
+    ``METRICS_ENABLED`` est faux.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with _wrap_queries(counter):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+        queries = await sync_to_async(_wrap_queries)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+        # record_request écrit périodiquement un fichier : hors de la boucle
+        await sync_to_async(self.record)(
+            request, response, time.perf_counter() - start, counter
+        )
+        return response
+
+    def record(self, request, response, duration, counter):
+        match = request.resolver_match
+        record_request(
+            (match.url_name if match else None) or "unmatched",
+            request.method,
+            response.status_code,
+            duration,
+            counter.count,
+        )
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """Donne à chaque requête son état de routage (voir ``api.db_routers``).
+
+    Les requêtes GET, HEAD et OPTIONS lisent le catalogue sur un réplica ; les
+    autres sont épinglées sur ``default`` dès le départ. Retiré de la pile si
+    ``DATABASE_REPLICAS`` est vide. L'état est une ``ContextVar`` : sous ASGI,
+    ``sync_to_async`` le transmet aux requêtes de l'ORM.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def call(self, request):
+        with routing_context(pinned=request.method not in self.SAFE_METHODS):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routing_context(pinned=request.method not in self.SAFE_METHODS):
+            return await self.get_response(request)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_category_slug'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'id'], name='api_product_categor_d3db2f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['subCategory', 'id'], name='api_product_subCate_cbddca_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 22:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_product_cards(apps, schema_editor):
+    from api.read_models import rebuild_product_cards
+
+    rebuild_product_cards(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='api.product')),
+                ('title', models.CharField(max_length=255)),
+                ('gender', models.CharField(max_length=50)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('main_image', models.ImageField(blank=True, max_length=255, upload_to='')),
+                ('colors', models.JSONField(default=list)),
+                ('sizes', models.JSONField(default=list)),
+                ('in_stock', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.category')),
+                ('subCategory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.subcategory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', 'product'], name='api_product_categor_c4d3b2_idx'), models.Index(fields=['subCategory', 'product'], name='api_product_subCate_a9d91b_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_product_cards, migrations.RunPython.noop),
+    ]
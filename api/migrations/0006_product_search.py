@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-17 22:25
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_VECTOR = """
+    setweight(to_tsvector('simple', COALESCE(p.title, '')), 'A')
+    || setweight(to_tsvector('simple', COALESCE(c.title, '')), 'B')
+    || setweight(to_tsvector('simple', COALESCE(s.title, '')), 'B')
+    || setweight(to_tsvector('simple', COALESCE(p.short_desc, '')), 'C')
+    || setweight(to_tsvector('simple', COALESCE(p.long_desc, '')), 'D')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX api_product_search_gin "
+            "ON api_product USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            f"UPDATE api_product AS p SET search_vector = {POSTGRES_VECTOR} "
+            "FROM api_category AS c, api_product AS q "
+            'LEFT JOIN api_subcategory AS s ON s.id = q."subCategory_id" '
+            "WHERE c.id = p.category_id AND q.id = p.id"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE api_product_fts USING fts5("
+            "title, short_desc, long_desc, category, subcategory, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO api_product_fts "
+            "(rowid, title, short_desc, long_desc, category, subcategory) "
+            "SELECT p.id, p.title, COALESCE(p.short_desc, ''), "
+            "COALESCE(p.long_desc, ''), c.title, COALESCE(s.title, '') "
+            "FROM api_product p JOIN api_category c ON c.id = p.category_id "
+            'LEFT JOIN api_subcategory s ON s.id = p."subCategory_id"'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS api_product_search_gin")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS api_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_productcard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
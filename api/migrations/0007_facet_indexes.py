@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 22:26
+
+import api.pricing
+import django.db.models.expressions
+import django.db.models.functions.math
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_product_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['gender', 'id'], name='api_product_gender_0b2146_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'color'], name='api_product_product_9e5c1e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['color', 'product'], name='api_product_color_535fa9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'stock'], name='api_product_product_eb6378_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(models.ExpressionWrapper(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(api.pricing.AsNumeric(models.F('price')), '*', django.db.models.expressions.CombinedExpression(models.Value(100), '-', models.F('discount'))), '/', models.Value(100)), 2), output_field=models.DecimalField(decimal_places=2, max_digits=10)), models.F('product'), name='api_variant_eff_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariantsize',
+            index=models.Index(fields=['size', 'variant'], name='api_product_size_f4e712_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-17 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['product', 'created_at'], name='api_rating_product_08aa6d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['product', 'stars', 'created_at'], name='api_rating_product_89b4b8_idx'),
+        ),
+    ]
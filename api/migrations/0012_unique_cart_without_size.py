@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-17 23:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates_without_size(apps, schema_editor):
+    """Fusionne les lignes sans taille en double avant de poser les contraintes.
+
+    Pour le panier, la ligne conservée (la plus ancienne) reçoit la somme des
+    quantités.
+    """
+    for model_name in ("Cart", "Wishlist"):
+        model = apps.get_model("api", model_name)
+        duplicates = (
+            model.objects.filter(size__isnull=True)
+            .values("user_id", "variant_id")
+            .annotate(count=Count("id"), keep=Min("id"))
+            .filter(count__gt=1)
+        )
+        if model_name == "Cart":
+            duplicates = duplicates.annotate(total=Sum("quantity"))
+        for duplicate in duplicates:
+            rows = model.objects.filter(
+                size__isnull=True,
+                user_id=duplicate["user_id"],
+                variant_id=duplicate["variant_id"],
+            )
+            if model_name == "Cart":
+                rows.filter(id=duplicate["keep"]).update(quantity=duplicate["total"])
+            rows.exclude(id=duplicate["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_job_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates_without_size, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('size__isnull', True)), fields=('user', 'variant'), name='api_cart_unique_without_size'),
+        ),
+        migrations.AddConstraint(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(condition=models.Q(('size__isnull', True)), fields=('user', 'variant'), name='api_wishlist_unique_without_size'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_unique_cart_without_size'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rating',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+    ]
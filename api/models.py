@@ -1,9 +1,12 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django import forms
 import uuid
 
+from .pricing import effective_price
+
 
 class User(AbstractUser):
     """Modèle utilisateur personnalisé pour étendre les fonctionnalités de base."""
@@ -53,6 +56,7 @@ class Category(models.Model):
     slug = models.SlugField(max_length=255, unique=True)
     short_desc = models.TextField(blank=True, null=True)
     long_desc = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
@@ -63,6 +67,7 @@ class SubCategory(models.Model):
     short_desc = models.TextField(blank=True, null=True)
     long_desc = models.TextField(blank=True, null=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
@@ -81,6 +86,26 @@ class Product(models.Model):
     gender = models.CharField(
         max_length=50, choices=[("m", "M"), ("f", "F"), ("b", "B")]
     )
+    # Vecteur de recherche pondéré, maintenu par api.search (index GIN sous PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Agrégats des avis, maintenus par api.ratings
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_1 = models.IntegerField(default=0, editable=False)
+    rating_2 = models.IntegerField(default=0, editable=False)
+    rating_3 = models.IntegerField(default=0, editable=False)
+    rating_4 = models.IntegerField(default=0, editable=False)
+    rating_5 = models.IntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Pagination par curseur (ordre par id) filtrée par catégorie
+            models.Index(fields=["category", "id"]),
+            models.Index(fields=["subCategory", "id"]),
+            models.Index(fields=["gender", "id"]),
+        ]
 
     def __str__(self):
         return self.title
@@ -96,6 +121,18 @@ class ProductVariant(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
     discount = models.IntegerField(default=0)  # Discount percentage
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Filtres à facettes (voir api.facets)
+            models.Index(fields=["product", "color"]),
+            models.Index(fields=["color", "product"]),
+            models.Index(fields=["product", "stock"]),
+            models.Index(
+                effective_price(), "product", name="api_variant_eff_price_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.product.title} - {self.color} - {self.price}"
@@ -120,6 +157,10 @@ class ProductVariantSize(models.Model):
         blank=True,
     )
     size = models.CharField(max_length=50)  # Example: S, M, L, XL
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["size", "variant"])]
 
     def __str__(self):
         return f"{self.variant.product.title} - {self.size}"
@@ -143,12 +184,48 @@ class ProductImage(models.Model):
     )  # La couleur associée aux images
     mainImage = models.BooleanField(default=False)
     image = models.ImageField(upload_to=variant_image_path)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         main_image_text = "principale " if self.mainImage else ""
         return f"Image {main_image_text}de {self.product.title} ({self.color})"
 
 
+class ProductCard(models.Model):
+    """Modèle de lecture dénormalisé pour les pages de liste (une « carte » par produit).
+
+    Maintenu à jour par les signaux de ``api.signals`` ; reconstruit en entier par
+    la commande ``rebuild_product_cards``.
+    """
+
+    product = models.OneToOneField(
+        Product, primary_key=True, related_name="card", on_delete=models.CASCADE
+    )
+    title = models.CharField(max_length=255)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    subCategory = models.ForeignKey(
+        SubCategory, on_delete=models.CASCADE, null=True, blank=True
+    )
+    gender = models.CharField(max_length=50)
+    min_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True
+    )  # Prix le plus bas après remise
+    main_image = models.ImageField(max_length=255, blank=True)
+    colors = models.JSONField(default=list)
+    sizes = models.JSONField(default=list)
+    in_stock = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["category", "product"]),
+            models.Index(fields=["subCategory", "product"]),
+        ]
+
+    def __str__(self):
+        return f"Carte de {self.title}"
+
+
 class Rating(models.Model):
     """Avis des utilisateurs avec une note et un commentaire."""
 
@@ -156,11 +233,19 @@ class Rating(models.Model):
         Product, related_name="ratings", on_delete=models.CASCADE
     )
     user = models.ForeignKey(User, related_name="ratings", on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now=True)
+    # Fixe à la création : clé du tri « newest » (voir RatingCursorPagination)
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     stars = models.IntegerField(default=0)  # Note sur 5
     comment = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Pagination des avis d'un produit (voir RatingCursorPagination)
+            models.Index(fields=["product", "created_at"]),
+            models.Index(fields=["product", "stars", "created_at"]),
+        ]
+
     def __str__(self):
         return f"{self.product.title} - {self.stars}★ by {self.user}"
 
@@ -183,6 +268,15 @@ class Cart(models.Model):
             "variant",
             "size",
         )  # Empêche les doublons pour le même utilisateur, variante et taille
+        constraints = [
+            # NULL n'étant égal à rien, unique_together laisse passer les
+            # doublons sans taille : index partiel dédié (cible de l'upsert)
+            models.UniqueConstraint(
+                fields=["user", "variant"],
+                condition=models.Q(size__isnull=True),
+                name="api_cart_unique_without_size",
+            ),
+        ]
 
     def __str__(self):
         return f"Panier de {self.user.username} - {self.variant.product} - ({self.quantity})"
@@ -205,6 +299,45 @@ class Wishlist(models.Model):
 
     class Meta:
         unique_together = ("user", "variant", "size")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "variant"],
+                condition=models.Q(size__isnull=True),
+                name="api_wishlist_unique_without_size",
+            ),
+        ]
 
     def __str__(self):
         return f"Liste de souhaits de {self.user.username} - {self.variant.product}"
+
+
+class Job(models.Model):
+    """Tâche de fond en file d'attente (voir ``api.jobs`` et la commande ``run_jobs``)."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    DEAD = "dead"  # Échecs répétés : plus de nouvelle tentative
+    STATUSES = [
+        (PENDING, "En attente"),
+        (RUNNING, "En cours"),
+        (DONE, "Terminée"),
+        (DEAD, "Abandonnée"),
+    ]
+
+    name = models.CharField(max_length=100)  # Nom de la tâche enregistrée
+    payload = models.JSONField(default=dict)  # Arguments nommés de la tâche
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Prochaine exécution
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_at"])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,137 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductCursorPagination(CursorPagination):
+    """Pagination par curseur (keyset) pour les listes de produits.
+
+    L'ordre est stable (clé primaire) et la taille de page est bornée, ce qui
+    garde chaque page à coût constant quelle que soit la position dans le
+    catalogue.
+    """
+
+    ordering = ("id",)
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class ProductCardCursorPagination(ProductCursorPagination):
+    """Pagination par curseur des cartes produit (clé : ``product_id``)."""
+
+    ordering = ("product_id",)
+
+
+class RatingCursorPagination(CursorPagination):
+    """Pagination par curseur des avis d'un produit, avec choix du tri (``?sort=``).
+
+    Le curseur de DRF ne retient que la première colonne du tri (``stars`` n'a
+    que 5 valeurs) et complète par un OFFSET. Ici, il contient la position
+    complète (toutes les colonnes du tri, jusqu'à l'id, qui départage) : chaque
+    page est filtrée par ``(a > x) OR (a = x AND b < y) OR …``, servie par les
+    index de ``Rating``, et un avis ajouté ou modifié pendant le parcours ne
+    décale pas les pages suivantes.
+    """
+
+    SORTS = {
+        "newest": ("-created_at", "-id"),
+        "highest": ("-stars", "-created_at", "-id"),
+        "lowest": ("stars", "-created_at", "-id"),
+    }
+    ordering = SORTS["newest"]
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Curseur invalide."
+
+    def get_ordering(self, request, queryset, view):
+        sort = request.query_params.get("sort", "newest")
+        if sort not in self.SORTS:
+            raise ValidationError({"sort": f"Valeurs possibles : {', '.join(self.SORTS)}."})
+        return self.SORTS[sort]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+        position, reverse = self.decode_cursor(request)
+        # En arrière : tri inversé, puis page remise dans l'ordre
+        ordering = _reverse(self.ordering) if reverse else self.ordering
+        if position is not None:
+            queryset = queryset.filter(_after(ordering, position))
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        return self.page
+
+    def _position(self, instance):
+        return [getattr(instance, field.lstrip("-")) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor((self._position(self.page[-1]), False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor((self._position(self.page[0]), True))
+
+    def decode_cursor(self, request):
+        """``(position, en arrière)`` ; ``(None, False)`` sans curseur."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")))
+            values = cursor["p"]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+            return position, bool(cursor.get("r"))
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+
+    def encode_cursor(self, cursor):
+        position, reverse = cursor
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in position
+        ]
+        data = {"p": values, "r": 1} if reverse else {"p": values}
+        encoded = b64encode(json.dumps(data, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+def _reverse(ordering):
+    return tuple(field[1:] if field.startswith("-") else f"-{field}" for field in ordering)
+
+
+def _after(ordering, position):
+    """Lignes situées après ``position`` dans ``ordering`` (chaîne de OR, sens mixtes)."""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{field.lstrip('-')}__{lookup}": position[index]})
+        for previous, value in zip(ordering[:index], position):
+            step &= Q(**{previous.lstrip("-"): value})
+        condition |= step
+    return condition
@@ -0,0 +1,26 @@
+from django.db.models import DecimalField, ExpressionWrapper, F, FloatField, Func
+from django.db.models.functions import Round
+
+
+class AsNumeric(Func):
+    """Laisse la valeur telle quelle, sauf sous SQLite où elle est convertie en REAL.
+
+    SQLite stocke les décimaux « ronds » comme des entiers, ce qui transformerait
+    les divisions en divisions entières.
+    """
+
+    template = "%(expressions)s"
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template="CAST(%(expressions)s AS REAL)"
+        )
+
+
+def effective_price(price="price", discount="discount"):
+    """Expression du prix après remise : price * (100 - discount) / 100, arrondi au centime."""
+    return ExpressionWrapper(
+        Round(AsNumeric(F(price)) * (100 - F(discount)) / 100, 2),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
@@ -0,0 +1,84 @@
+"""Agrégats des avis (nombre, somme, moyenne, histogramme 1–5) stockés sur Product."""
+
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .models import Product, Rating
+
+STAR_VALUES = range(1, 6)
+
+
+def _bucket(stars):
+    """Nom de la colonne d'histogramme pour ``stars``, ou None hors de 1–5."""
+    try:
+        stars = int(stars)
+    except (TypeError, ValueError):
+        return None
+    return f"rating_{stars}" if stars in STAR_VALUES else None
+
+
+def update_rating_aggregates(product_id, added=None, removed=None):
+    """Applique l'ajout et/ou le retrait d'une note aux agrégats d'un produit.
+
+    Une seule requête UPDATE à base de F() : à appeler dans la transaction qui
+    crée, modifie ou supprime le Rating.
+    """
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = int(added or 0) - int(removed or 0)
+    changes = {
+        "rating_count": F("rating_count") + count_delta,
+        "rating_sum": F("rating_sum") + sum_delta,
+        "updated_at": timezone.now(),  # Invalide les ETag du produit
+        # Les expressions d'un UPDATE lisent les anciennes valeurs de la ligne
+        "rating_avg": Coalesce(
+            Cast(F("rating_sum") + sum_delta, FloatField())
+            / NullIf(F("rating_count") + count_delta, Value(0)),
+            Value(0.0),
+        ),
+    }
+    for stars, delta in ((added, 1), (removed, -1)):
+        bucket = _bucket(stars)
+        if bucket is None:
+            continue
+        if bucket in changes:
+            del changes[bucket]  # Ajout et retrait dans la même case : rien à faire
+        else:
+            changes[bucket] = F(bucket) + delta
+    Product.objects.filter(pk=product_id).update(**changes)
+
+
+def rebuild_rating_aggregates(product_model=Product, rating_model=Rating):
+    """Recalcule les agrégats de tous les produits à partir des Rating.
+
+    Les modèles peuvent être fournis (migrations de données).
+    """
+    totals = (
+        rating_model.objects.values("product")
+        .annotate(
+            count=Count("id"),
+            total=Sum("stars"),
+            **{
+                f"rating_{stars}": Count("id", filter=Q(stars=stars))
+                for stars in STAR_VALUES
+            },
+        )
+        .order_by()
+    )
+    products = []
+    for row in totals:
+        product = product_model(
+            pk=row["product"],
+            rating_count=row["count"],
+            rating_sum=row["total"] or 0,
+            rating_avg=(row["total"] or 0) / row["count"],
+        )
+        for stars in STAR_VALUES:
+            setattr(product, f"rating_{stars}", row[f"rating_{stars}"])
+        products.append(product)
+    fields = ["rating_count", "rating_sum", "rating_avg"] + [
+        f"rating_{stars}" for stars in STAR_VALUES
+    ]
+    product_model.objects.update(**{field: 0 for field in fields})
+    product_model.objects.bulk_update(products, fields, batch_size=500)
+    return len(products)
@@ -0,0 +1,130 @@
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import (
+    Product,
+    ProductCard,
+    ProductImage,
+    ProductVariant,
+    ProductVariantSize,
+)
+from .pricing import effective_price
+
+CARD_FIELDS = [
+    "title",
+    "category",
+    "subCategory",
+    "gender",
+    "min_price",
+    "main_image",
+    "colors",
+    "sizes",
+    "in_stock",
+    "updated_at",
+]
+
+
+def _card_models(apps):
+    if apps is None:
+        return Product, ProductCard, ProductImage, ProductVariant, ProductVariantSize
+    return tuple(
+        apps.get_model("api", name)
+        for name in (
+            "Product",
+            "ProductCard",
+            "ProductImage",
+            "ProductVariant",
+            "ProductVariantSize",
+        )
+    )
+
+
+def refresh_product_cards(product_ids, apps=None):
+    """Recalcule les cartes des produits donnés en un nombre fixe de requêtes.
+
+    Les cartes des produits qui n'existent plus sont supprimées. ``apps`` :
+    registre des modèles historiques (migrations de données).
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    (
+        Product,
+        ProductCard,
+        ProductImage,
+        ProductVariant,
+        ProductVariantSize,
+    ) = _card_models(apps)
+    products = Product.objects.filter(pk__in=product_ids).values(
+        "id", "title", "category_id", "subCategory_id", "gender"
+    )
+    variants = {
+        row["product_id"]: row
+        for row in ProductVariant.objects.filter(product_id__in=product_ids)
+        .values("product_id")
+        .annotate(min_price=Min(effective_price()), max_stock=Max("stock"))
+        .order_by()
+    }
+    colors = {}
+    for product_id, color in (
+        ProductVariant.objects.filter(product_id__in=product_ids)
+        .values_list("product_id", "color")
+        .order_by("product_id", "color")
+        .distinct()
+    ):
+        colors.setdefault(product_id, []).append(color)
+    sizes = {}
+    for product_id, size in (
+        ProductVariantSize.objects.filter(variant__product_id__in=product_ids)
+        .values_list("variant__product_id", "size")
+        .order_by("variant__product_id", "size")
+        .distinct()
+    ):
+        sizes.setdefault(product_id, []).append(size)
+    main_images = {}
+    for product_id, image in (
+        ProductImage.objects.filter(product_id__in=product_ids, mainImage=True)
+        .values_list("product_id", "image")
+        .order_by("product_id", "-id")
+    ):
+        main_images[product_id] = image  # La plus ancienne l'emporte
+
+    cards = []
+    for product in products:
+        pid = product["id"]
+        variant = variants.get(pid, {})
+        cards.append(
+            ProductCard(
+                product_id=pid,
+                title=product["title"],
+                category_id=product["category_id"],
+                subCategory_id=product["subCategory_id"],
+                gender=product["gender"],
+                min_price=variant.get("min_price"),
+                main_image=main_images.get(pid, ""),
+                colors=colors.get(pid, []),
+                sizes=sizes.get(pid, []),
+                in_stock=(variant.get("max_stock") or 0) > 0,
+            )
+        )
+    missing = product_ids - {card.product_id for card in cards}
+    if missing:
+        ProductCard.objects.filter(product_id__in=missing).delete()
+    if cards:
+        ProductCard.objects.bulk_create(
+            cards,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=CARD_FIELDS,
+        )
+
+
+def rebuild_product_cards(batch_size=500, apps=None):
+    """Reconstruit toutes les cartes par lots ; retourne le nombre de produits."""
+    Product, ProductCard, *_ = _card_models(apps)
+    product_ids = list(Product.objects.order_by("id").values_list("id", flat=True))
+    with transaction.atomic():
+        ProductCard.objects.exclude(product_id__in=product_ids).delete()
+        for start in range(0, len(product_ids), batch_size):
+            refresh_product_cards(product_ids[start : start + batch_size], apps)
+    return len(product_ids)
@@ -0,0 +1,14 @@
+"""Réponses JSON des vues sans ``@api_view`` (vues asynchrones)."""
+
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+class JSONResponse(HttpResponse):
+    """Réponse JSON rendue comme celles de DRF (mêmes octets), qui garde ``data``."""
+
+    def __init__(self, data, status=200):
+        super().__init__(
+            JSONRenderer().render(data), content_type="application/json", status=status
+        )
+        self.data = data
@@ -0,0 +1,97 @@
+"""Recherche plein texte des produits.
+
+Sous PostgreSQL, ``Product.search_vector`` contient un tsvector pondéré (titre,
+catégories, descriptions) indexé en GIN. Sous SQLite, une table virtuelle FTS5
+(``api_product_fts``) sert de repli pour le développement local.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+
+from .models import Category, Product, SubCategory
+
+SEARCH_CONFIG = getattr(settings, "PRODUCT_SEARCH_CONFIG", "simple")
+FTS_TABLE = "api_product_fts"
+
+# Poids bm25 des colonnes FTS5 : title, short_desc, long_desc, category, subcategory
+FTS_WEIGHTS = (10.0, 2.0, 1.0, 4.0, 4.0)
+
+
+def _search_vector():
+    from django.contrib.postgres.search import SearchVector
+
+    category_title = Subquery(
+        Category.objects.filter(pk=OuterRef("category_id")).values("title")[:1]
+    )
+    subcategory_title = Subquery(
+        SubCategory.objects.filter(pk=OuterRef("subCategory_id")).values("title")[:1]
+    )
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(category_title, weight="B", config=SEARCH_CONFIG)
+        + SearchVector(subcategory_title, weight="B", config=SEARCH_CONFIG)
+        + SearchVector("short_desc", weight="C", config=SEARCH_CONFIG)
+        + SearchVector("long_desc", weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def index_products(products):
+    """Met à jour l'index de recherche des produits du queryset donné."""
+    if connection.vendor == "postgresql":
+        products.update(search_vector=_search_vector())
+    elif connection.vendor == "sqlite":
+        ids_sql, params = products.values("id").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({ids_sql})", params)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} "
+                "(rowid, title, short_desc, long_desc, category, subcategory) "
+                "SELECT p.id, p.title, COALESCE(p.short_desc, ''), "
+                "COALESCE(p.long_desc, ''), c.title, COALESCE(s.title, '') "
+                "FROM api_product p "
+                "JOIN api_category c ON c.id = p.category_id "
+                'LEFT JOIN api_subcategory s ON s.id = p."subCategory_id" '
+                f"WHERE p.id IN ({ids_sql})",
+                params,
+            )
+
+
+def unindex_product(product_id):
+    """Retire un produit supprimé de l'index FTS5 (le tsvector part avec la ligne)."""
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def _fts5_query(text):
+    """Transforme la saisie utilisateur en requête FTS5 sûre (préfixes, ET implicite)."""
+    terms = re.findall(r"\w+", text)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_product_ids(text, limit):
+    """Retourne les ids des produits correspondant à ``text``, du plus pertinent au moins pertinent."""
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+        return list(
+            Product.objects.filter(search_vector=query)
+            .annotate(rank=SearchRank("search_vector", query))
+            .order_by("-rank", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+    fts_query = _fts5_query(text)
+    if not fts_query:
+        return []
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT %s",
+            [fts_query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
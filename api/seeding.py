@@ -0,0 +1,245 @@
+"""Génération d'un catalogue synthétique pour les mesures de performance.
+
+Les objets sont créés par ``bulk_create`` (sans signaux) ; les modèles de lecture
+(cartes produit, index de recherche, agrégats des avis) sont reconstruits à la
+fin, puis la version du cache du catalogue est incrémentée. Les données générées
+sont reconnaissables à leur préfixe (slug des catégories, nom des utilisateurs),
+ce qui permet de les supprimer avec ``clear_seeded``.
+"""
+
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from .cache import bump_catalog_version
+from .models import (
+    Cart,
+    Category,
+    Product,
+    ProductImage,
+    ProductVariant,
+    ProductVariantSize,
+    Rating,
+    SubCategory,
+    Wishlist,
+)
+from .ratings import rebuild_rating_aggregates
+from .read_models import refresh_product_cards
+from .search import index_products
+
+User = get_user_model()
+
+DEFAULT_PREFIX = "seed"
+DEFAULT_PASSWORD = "seed-password"
+COLORS = ["noir", "blanc", "rouge", "bleu", "vert", "jaune", "gris", "rose"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+WORDS = [
+    "coton",
+    "lin",
+    "laine",
+    "veste",
+    "chemise",
+    "robe",
+    "pantalon",
+    "pull",
+    "léger",
+    "classique",
+    "sport",
+    "été",
+    "hiver",
+    "confort",
+]
+
+
+def _sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length)).capitalize()
+
+
+def clear_seeded(prefix=DEFAULT_PREFIX):
+    """Supprime les catégories et utilisateurs générés (et tout ce qui en dépend)."""
+    categories, _ = Category.objects.filter(slug__startswith=f"{prefix}-").delete()
+    users, _ = User.objects.filter(username__startswith=f"{prefix}_").delete()
+    return categories + users
+
+
+def seed_catalog(
+    categories=5,
+    subcategories=3,
+    products=200,
+    variants=3,
+    sizes=4,
+    images=2,
+    ratings=5,
+    users=20,
+    cart_items=3,
+    wishlist_items=3,
+    prefix=DEFAULT_PREFIX,
+    seed=0,
+    batch_size=1000,
+):
+    """Crée un catalogue synthétique ; ``products`` est le nombre total de produits,
+    les autres quantités sont par parent (sous-catégories par catégorie, variantes
+    par produit…). Retourne le nombre d'objets créés par modèle."""
+    rng = random.Random(seed)
+    sizes = min(sizes, len(SIZES))
+    variants = min(variants, len(COLORS))
+
+    password = make_password(DEFAULT_PASSWORD)  # Hachage coûteux : une seule fois
+    user_objects = User.objects.bulk_create(
+        [
+            User(
+                username=f"{prefix}_{index}",
+                email=f"{prefix}_{index}@example.com",
+                password=password,
+                is_active=True,
+            )
+            for index in range(users)
+        ],
+        batch_size=batch_size,
+    )
+    category_objects = Category.objects.bulk_create(
+        [
+            Category(
+                title=f"Catégorie {index}",
+                slug=f"{prefix}-{index}",
+                img=f"categories/{prefix}-{index}.jpg",
+                short_desc=_sentence(rng, 4),
+                long_desc=_sentence(rng, 12),
+            )
+            for index in range(categories)
+        ],
+        batch_size=batch_size,
+    )
+    subcategory_objects = SubCategory.objects.bulk_create(
+        [
+            SubCategory(
+                title=f"{category.title} / {index}",
+                short_desc=_sentence(rng, 4),
+                category=category,
+            )
+            for category in category_objects
+            for index in range(subcategories)
+        ],
+        batch_size=batch_size,
+    )
+    subcategories_by_category = {}
+    for subcategory in subcategory_objects:
+        subcategories_by_category.setdefault(subcategory.category_id, []).append(
+            subcategory
+        )
+
+    product_objects = []
+    for index in range(products):
+        category = category_objects[index % len(category_objects)]
+        choices = subcategories_by_category.get(category.pk)
+        product_objects.append(
+            Product(
+                title=f"{_sentence(rng, 3)} {index}",
+                short_desc=_sentence(rng, 6),
+                long_desc=_sentence(rng, 30),
+                category=category,
+                subCategory=rng.choice(choices) if choices else None,
+                gender=rng.choice("mfb"),
+            )
+        )
+    product_objects = Product.objects.bulk_create(product_objects, batch_size=batch_size)
+
+    variant_objects = ProductVariant.objects.bulk_create(
+        [
+            ProductVariant(
+                product=product,
+                color=color,
+                price=Decimal(rng.randrange(500, 20000)) / 100,
+                stock=rng.choice([0, 3, 10, 50]),
+                discount=rng.choice([0, 0, 10, 25]),
+            )
+            for product in product_objects
+            for color in rng.sample(COLORS, variants)
+        ],
+        batch_size=batch_size,
+    )
+    size_objects = ProductVariantSize.objects.bulk_create(
+        [
+            ProductVariantSize(variant=variant, size=size)
+            for variant in variant_objects
+            for size in SIZES[:sizes]
+        ],
+        batch_size=batch_size,
+    )
+    image_objects = ProductImage.objects.bulk_create(
+        [
+            ProductImage(
+                product_id=variant.product_id,
+                variant=variant,
+                color=variant.color,
+                mainImage=index == 0,
+                image=f"products/{variant.product_id}/{variant.color}/{index}.jpg",
+            )
+            for variant in variant_objects
+            for index in range(images)
+        ],
+        batch_size=batch_size,
+    )
+
+    rating_objects = []
+    if user_objects:
+        rating_objects = Rating.objects.bulk_create(
+            [
+                Rating(
+                    product=product,
+                    user=rng.choice(user_objects),
+                    stars=rng.randint(1, 5),
+                    comment=_sentence(rng, 10),
+                )
+                for product in product_objects
+                for _ in range(ratings)
+            ],
+            batch_size=batch_size,
+        )
+
+    sizes_by_variant = {}
+    for size in size_objects:
+        sizes_by_variant.setdefault(size.variant_id, []).append(size)
+    cart_objects, wishlist_objects = [], []
+    for user in user_objects:
+        picked = rng.sample(
+            variant_objects, min(cart_items + wishlist_items, len(variant_objects))
+        )
+        for variant in picked[:cart_items]:
+            choices = sizes_by_variant.get(variant.pk)
+            cart_objects.append(
+                Cart(
+                    user=user,
+                    variant=variant,
+                    quantity=rng.randint(1, 3),
+                    size=rng.choice(choices) if choices else None,
+                )
+            )
+        for variant in picked[cart_items:]:
+            wishlist_objects.append(Wishlist(user=user, variant=variant))
+    Cart.objects.bulk_create(cart_objects, batch_size=batch_size)
+    Wishlist.objects.bulk_create(wishlist_objects, batch_size=batch_size)
+
+    # bulk_create ne déclenche pas les signaux : reconstruire les modèles de lecture
+    product_ids = [product.pk for product in product_objects]
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start : start + batch_size]
+        refresh_product_cards(batch)
+        index_products(Product.objects.filter(pk__in=batch))
+    rebuild_rating_aggregates()
+    bump_catalog_version()
+
+    return {
+        "users": len(user_objects),
+        "categories": len(category_objects),
+        "subcategories": len(subcategory_objects),
+        "products": len(product_objects),
+        "variants": len(variant_objects),
+        "sizes": len(size_objects),
+        "images": len(image_objects),
+        "ratings": len(rating_objects),
+        "cart_items": len(cart_objects),
+        "wishlist_items": len(wishlist_objects),
+    }
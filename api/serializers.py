@@ -5,6 +5,7 @@ from .models import (
     ProductVariant,
     ProductVariantSize,
     ProductImage,
+    ProductCard,
     Category,
     SubCategory,
     Rating,
@@ -14,8 +15,8 @@ from .models import (
 from django.contrib.auth import get_user_model
 from rest_framework.exceptions import ValidationError
 from django.utils import timezone
-from django.conf import settings
-from django.core.mail import send_mail
+from .images import image_srcset
+from .tasks import send_activation_email
 
 # from django.contrib.auth.models import User
 
@@ -71,37 +72,10 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.email_verification_sent_at = timezone.now()
         user.save()
 
-        # 3. Send activation email
-        # Configure your email settings in settings.py (EMAIL_BACKEND, EMAIL_HOST, etc.)
-        # Make sure your frontend's activation page URL is correct
-        # Example: http://localhost:3000/activate?token=... or http://yourdomain.com/activate?token=...
-        # If your backend directly handles the activation link, it would be http://localhost:8000/api/activate/<token>/
-
-        # This is an example of the backend generating a link that points to the FRONTEND
-        # The frontend will then call the backend's /api/activate/<token>/ endpoint.
-        # ADJUST THIS URL TO MATCH YOUR FRONTEND'S ACTIVATION ROUTE!
-        frontend_activation_url = f"{settings.FRONTEND_BASE_URL}activate?token={user.email_verification_token}"
-
-        try:
-            send_mail(
-                "Activez votre compte sur Shopsy!",
-                f"Cher(e) {user.username},\n\n"
-                f"Bienvenue sur Shopsy! Pour activer votre compte, veuillez cliquer sur le lien ci-dessous :\n\n"
-                f"{frontend_activation_url}\n\n"  # Link to frontend activation page
-                f"Ce lien expirera dans 24 heures.\n\n"
-                f"Si vous n'avez pas créé de compte sur Shopsy, veuillez ignorer cet email.\n\n"
-                f"Merci,\nL'équipe Shopsy",
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            user.delete()  # Clean up the user if email couldn't be sent
-            raise ValidationError(
-                {
-                    "email": "Impossible d'envoyer l'email d'activation pour le moment. Veuillez réessayer plus tard."
-                }
-            )
+        # 3. Send activation email, en tâche de fond (api.tasks) : le serveur SMTP
+        # ne bloque pas la requête. Si l'envoi échoue définitivement, la tâche
+        # supprime le compte resté inactif.
+        send_activation_email.enqueue(user_id=user.pk)
 
         # Do NOT return a token here. The user is not yet active.
         return user
@@ -119,10 +93,14 @@ class ProductImageSerializer(serializers.ModelSerializer):
     """Serializer pour les images de produit."""
 
     image = serializers.ImageField(use_url=True)
+    srcset = serializers.SerializerMethodField()  # Déclinaisons redimensionnées
 
     class Meta:
         model = ProductImage
-        fields = ["id", "image", "mainImage", "variant"]
+        fields = ["id", "image", "srcset", "mainImage", "variant"]
+
+    def get_srcset(self, image):
+        return image_srcset(image.image.name)
 
 
 class ProductVariantSizeSerializer(serializers.ModelSerializer):
@@ -162,10 +140,22 @@ class SubCategorySerializer(serializers.ModelSerializer):
         fields = ["id", "title", "short_desc", "long_desc", "category"]
 
 
+def rating_summary(product):
+    """Résumé des avis d'un produit à partir de ses colonnes d'agrégats."""
+    return {
+        "count": product.rating_count,
+        "average": round(product.rating_avg, 2),
+        "histogram": {
+            str(stars): getattr(product, f"rating_{stars}") for stars in range(1, 6)
+        },
+    }
+
+
 class ProductSerializer(serializers.ModelSerializer):
     variants = ProductVariantSerializer(
         many=True, read_only=True
     )  # Inclure les variantes
+    rating = serializers.SerializerMethodField()  # Agrégats des avis, sans requête
 
     class Meta:
         model = Product
@@ -178,18 +168,47 @@ class ProductSerializer(serializers.ModelSerializer):
             "subCategory",
             "gender",
             "variants",
+            "rating",
+        ]
+
+    def get_rating(self, product):
+        return rating_summary(product)
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """Serializer pour les cartes produit des pages de liste."""
+
+    id = serializers.IntegerField(source="product_id", read_only=True)
+    main_image = serializers.ImageField(use_url=True, read_only=True)
+
+    class Meta:
+        model = ProductCard
+        fields = [
+            "id",
+            "title",
+            "category",
+            "subCategory",
+            "gender",
+            "min_price",
+            "main_image",
+            "colors",
+            "sizes",
+            "in_stock",
         ]
 
 
 class RatingSerializer(serializers.ModelSerializer):
     """Serializer pour les évaluations de produit."""
 
+    username = serializers.CharField(source="user.username", read_only=True)
+
     class Meta:
         model = Rating
         fields = [
             "id",
             "product",
             "user",
+            "username",
             "stars",
             "comment",
             "created_at",
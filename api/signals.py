@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Category,
+    Product,
+    ProductImage,
+    ProductVariant,
+    ProductVariantSize,
+    Rating,
+    SubCategory,
+)
+from .cache import bump_catalog_version, record_catalog_deletion
+from .ratings import update_rating_aggregates
+from .read_models import refresh_product_cards
+from .search import index_products, unindex_product
+
+
+def schedule_card_refresh(product_id):
+    """Met à jour la carte du produit une fois la transaction validée.
+
+    Attendre le commit évite de recréer la carte d'un produit en cours de
+    suppression en cascade.
+    """
+    if product_id is not None:
+        transaction.on_commit(lambda: refresh_product_cards([product_id]))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    schedule_card_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def product_saved_reindex(sender, instance, **kwargs):
+    index_products(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_unindex(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def category_saved_reindex(sender, instance, created, **kwargs):
+    if not created:
+        index_products(Product.objects.filter(category_id=instance.pk))
+
+
+@receiver(post_save, sender=SubCategory)
+def subcategory_saved_reindex(sender, instance, created, **kwargs):
+    if not created:
+        index_products(Product.objects.filter(subCategory_id=instance.pk))
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_child_changed(sender, instance, **kwargs):
+    schedule_card_refresh(instance.product_id)
+
+
+@receiver(post_save, sender=ProductVariantSize)
+@receiver(post_delete, sender=ProductVariantSize)
+def variant_size_changed(sender, instance, **kwargs):
+    product_id = (
+        ProductVariant.objects.filter(pk=instance.variant_id)
+        .values_list("product_id", flat=True)
+        .first()
+    )
+    schedule_card_refresh(product_id)
+
+
+@receiver(pre_save, sender=Rating)
+def rating_remember_previous(sender, instance, **kwargs):
+    instance._previous_rating = (
+        Rating.objects.filter(pk=instance.pk).values_list("product_id", "stars").first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_rating", None)
+    if created or previous is None:
+        update_rating_aggregates(instance.product_id, added=instance.stars)
+        return
+    previous_product_id, previous_stars = previous
+    if previous_product_id == instance.product_id:
+        if int(previous_stars) != int(instance.stars):
+            update_rating_aggregates(
+                instance.product_id, added=instance.stars, removed=previous_stars
+            )
+    else:
+        update_rating_aggregates(previous_product_id, removed=previous_stars)
+        update_rating_aggregates(instance.product_id, added=instance.stars)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    update_rating_aggregates(instance.product_id, removed=instance.stars)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductVariantSize)
+@receiver(post_delete, sender=ProductVariantSize)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Rating)  # Les agrégats d'avis font partie du produit
+@receiver(post_delete, sender=Rating)
+def catalog_changed(sender, **kwargs):
+    """Invalide le cache des réponses du catalogue une fois l'écriture validée."""
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariantSize)
+@receiver(post_delete, sender=ProductImage)
+def catalog_row_deleted(sender, **kwargs):
+    """Fait avancer Last-Modified des GET conditionnels (voir api.conditional)."""
+    transaction.on_commit(record_catalog_deletion)
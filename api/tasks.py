@@ -0,0 +1,51 @@
+"""Tâches de fond de l'API (exécutées par ``run_jobs``, voir ``api.jobs``)."""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.utils import timezone
+
+from .jobs import task
+
+User = get_user_model()
+
+
+@task()
+def send_email(subject, message, recipients, from_email=None):
+    send_mail(
+        subject,
+        message,
+        from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients,
+        fail_silently=False,
+    )
+
+
+def delete_inactive_user(user_id):
+    """Supprime le compte dont l'e-mail d'activation n'a jamais pu être envoyé."""
+    User.objects.filter(pk=user_id, is_active=False).delete()
+
+
+@task(on_dead=delete_inactive_user)
+def send_activation_email(user_id):
+    user = User.objects.filter(pk=user_id, is_active=False).first()
+    if user is None:  # Compte déjà activé ou supprimé
+        return
+    # Lien vers la page d'activation du frontend, qui appelle /api/activate/<token>/
+    frontend_activation_url = (
+        f"{settings.FRONTEND_BASE_URL}activate?token={user.email_verification_token}"
+    )
+    send_mail(
+        "Activez votre compte sur Shopsy!",
+        f"Cher(e) {user.username},\n\n"
+        f"Bienvenue sur Shopsy! Pour activer votre compte, veuillez cliquer sur le lien ci-dessous :\n\n"
+        f"{frontend_activation_url}\n\n"
+        f"Ce lien expirera dans 24 heures.\n\n"
+        f"Si vous n'avez pas créé de compte sur Shopsy, veuillez ignorer cet email.\n\n"
+        f"Merci,\nL'équipe Shopsy",
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        fail_silently=False,
+    )
+    # Le délai de validité du lien court à partir de l'envoi effectif
+    User.objects.filter(pk=user.pk).update(email_verification_sent_at=timezone.now())
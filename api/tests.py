@@ -1,3 +1,1841 @@
-from django.test import TestCase
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.response import Response
+
+from . import async_views, fast_serializers, images, metrics, views
+from .benchmark import ROUTES, _auth_headers, route_names, run_benchmark
+from .cache import (
+    DELETED_KEY,
+    bump_catalog_version,
+    cache_catalog_response,
+    cache_stats,
+    check_shared_cache,
+    get_cache,
+)
+from .db_routers import CatalogReplicaRouter, routing_context
+from .fieldsets import shape_queryset
+from .jobs import claim_jobs, run_pending, task
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    Cart,
+    Category,
+    Job,
+    Product,
+    ProductCard,
+    ProductImage,
+    ProductVariant,
+    ProductVariantSize,
+    Rating,
+    SubCategory,
+    User,
+    Wishlist,
+)
+from .pricing import effective_price
+from .ratings import STAR_VALUES, rebuild_rating_aggregates
+from .read_models import rebuild_product_cards
+from .search import search_product_ids
+from .seeding import clear_seeded, seed_catalog
+from .serializers import (
+    CategorySerializer,
+    ProductSerializer,
+    ProductVariantSerializer,
+)
+from .tasks import send_email
+
+
+class CatalogFixtureMixin:
+    """Petit catalogue : 2 catégories, produits avec variantes, tailles et images."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            Category.objects.create(
+                title="Femme", slug="femme", short_desc="Mode femme", long_desc=None
+            ),
+            Category.objects.create(title="Homme", slug="homme"),
+        ]
+        cls.subcategory = SubCategory.objects.create(
+            title="Robes", category=cls.categories[0]
+        )
+        prices = [Decimal("19.90"), Decimal("5"), Decimal("120.05")]
+        for index in range(4):
+            product = Product.objects.create(
+                title=f"Produit {index}",
+                short_desc="Court",
+                long_desc="Long" if index % 2 else None,
+                category=cls.categories[index % 2],
+                subCategory=cls.subcategory if index % 2 == 0 else None,
+                gender="mfb"[index % 3],
+                rating_count=index,
+                rating_sum=index * 4,
+                rating_avg=(index * 4 / index) if index else 0,
+                rating_4=index,
+            )
+            for position, color in enumerate(["rouge", "bleu"][: index % 2 + 1]):
+                variant = ProductVariant.objects.create(
+                    product=product,
+                    color=color,
+                    price=prices[(index + position) % len(prices)],
+                    stock=index * position,
+                    discount=10 * position,
+                )
+                for size in ["S", "M"][: position + 1]:
+                    ProductVariantSize.objects.create(variant=variant, size=size)
+                ProductImage.objects.create(
+                    product=product,
+                    variant=variant,
+                    color=color,
+                    mainImage=position == 0,
+                    image=f"products/{product.pk}/{color}/photo.jpg",
+                )
+        # Une image sans fichier et une variante sans taille ni image
+        ProductImage.objects.create(
+            product=product, variant=variant, color=variant.color, image=""
+        )
+        ProductVariant.objects.create(product=product, color="vert", price="7.5")
+
+
+class ProductCardBackfillTests(TransactionTestCase):
+    """Base existante : la migration 0005 crée les cartes des produits déjà présents."""
+
+    before = [("api", "0004_product_listing_indexes")]
+    after = [("api", "0005_productcard")]
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate(self.before)
+        self.addCleanup(self.migrate_to_latest)
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_cards_created_by_migration(self):
+        apps = self.executor.loader.project_state(self.before).apps
+        category = apps.get_model("api", "Category").objects.create(title="Femme", slug="femme")
+        product = apps.get_model("api", "Product").objects.create(
+            title="Robe", short_desc="Court", category=category, gender="f"
+        )
+        variant = apps.get_model("api", "ProductVariant").objects.create(
+            product=product, color="rouge", price="20", discount=10, stock=3
+        )
+        apps.get_model("api", "ProductVariantSize").objects.create(variant=variant, size="M")
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        card = apps.get_model("api", "ProductCard").objects.get(product_id=product.pk)
+        self.assertEqual(card.title, "Robe")
+        self.assertEqual(card.min_price, Decimal("18.00"))
+        self.assertEqual((card.colors, card.sizes, card.in_stock), (["rouge"], ["M"], True))
+
+
+class ProductCardRefreshTests(CatalogFixtureMixin, TestCase):
+    def card(self, product):
+        return ProductCard.objects.get(product=product)
+
+    def test_cards_follow_product_and_variant_edits(self):
+        product = Product.objects.order_by("id").first()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.title = "Robe longue"
+            product.save()
+        self.assertEqual(self.card(product).title, "Robe longue")
+
+        variant = product.variants.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.price = Decimal("1.50")
+            variant.discount = 0
+            variant.color = "noir"
+            variant.save()
+        card = self.card(product)
+        self.assertEqual(card.min_price, Decimal("1.50"))
+        self.assertIn("noir", card.colors)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariantSize.objects.create(variant=variant, size="XXL")
+        self.assertIn("XXL", self.card(product).sizes)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertFalse(ProductCard.objects.filter(product_id=product.pk).exists())
+
+    def test_rebuild_command(self):
+        ProductCard.objects.all().delete()
+        call_command("rebuild_product_cards", stdout=io.StringIO())
+        self.assertEqual(ProductCard.objects.count(), Product.objects.count())
+
+
+@skipUnless(connection.vendor == "sqlite", "Index FTS5 de SQLite")
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class SqliteSearchTests(CatalogFixtureMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.robe = Product.objects.create(
+            title="Robe d'été",
+            short_desc="Légère",
+            category=cls.categories[0],
+            subCategory=cls.subcategory,
+            gender="f",
+        )
+        cls.sac = Product.objects.create(
+            title="Sac", short_desc="Assorti à la robe", category=cls.categories[1]
+        )
+        rebuild_product_cards()
+
+    def search(self, text):
+        return search_product_ids(text, 50)
+
+    def test_title_ranks_above_subcategory_and_description(self):
+        ids = self.search("robe")
+        in_subcategory = set(
+            Product.objects.filter(subCategory=self.subcategory).values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(set(ids), in_subcategory | {self.sac.pk})
+        self.assertEqual(ids[0], self.robe.pk)
+        self.assertEqual(ids[-1], self.sac.pk)
+
+    def test_diacritics_and_case_are_ignored(self):
+        for text in ("ete", "ÉTÉ", "légère", "LEGERE"):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), [self.robe.pk])
+
+    def test_user_input_is_not_fts5_syntax(self):
+        self.assertEqual(self.search('"robe*'), self.search("robe"))
+        self.assertEqual(self.search("robe NOT sac"), [])
+        self.assertEqual(self.search("*()"), [])
+
+    def test_endpoint_returns_cards_in_rank_order(self):
+        response = self.client.get("/api/products/search/", {"q": "robe été"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.robe.pk])
+
+    def test_product_edit_and_delete_reindex(self):
+        self.robe.title = "Chemise"
+        self.robe.save()
+        self.assertEqual(self.search("chemise"), [self.robe.pk])
+        self.assertEqual(self.search("ete"), [])
+        self.robe.delete()
+        self.assertEqual(self.search("chemise"), [])
+
+    def test_category_edit_reindexes_its_products(self):
+        category = self.categories[1]
+        category.title = "Accessoires"
+        category.save()
+        self.assertEqual(
+            set(self.search("accessoires")),
+            set(Product.objects.filter(category=category).values_list("id", flat=True)),
+        )
+        self.assertEqual(self.search("homme"), [])
+
+    def test_subcategory_edit_reindexes_its_products(self):
+        self.subcategory.title = "Jupes"
+        self.subcategory.save()
+        self.assertEqual(
+            set(self.search("jupes")),
+            set(
+                Product.objects.filter(subCategory=self.subcategory).values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+        self.assertEqual(self.search("robes"), [])
+
+
+class FastSerializerParityTests(CatalogFixtureMixin, TestCase):
+    """La sérialisation rapide doit produire exactement le JSON des serializers DRF."""
+
+    def test_products(self):
+        products = Product.objects.order_by("id")
+        expected = ProductSerializer(
+            shape_queryset(products, None, ProductSerializer), many=True
+        ).data
+        self.assertEqual(fast_serializers.serialize_products(products), expected)
+
+    def test_variant_details(self):
+        products = shape_queryset(Product.objects, None, ProductSerializer)
+        for variant in ProductVariant.objects.all():
+            expected = dict(ProductVariantSerializer(variant).data)
+            expected["product"] = ProductSerializer(
+                products.get(pk=variant.product_id)
+            ).data
+            self.assertEqual(
+                fast_serializers.serialize_variant_details(variant.pk), expected
+            )
+        self.assertIsNone(fast_serializers.serialize_variant_details(0))
+
+    def test_categories(self):
+        categories = Category.objects.order_by("id")
+        self.assertEqual(
+            fast_serializers.serialize_categories(categories),
+            CategorySerializer(categories, many=True).data,
+        )
+
+    def test_decimal_rendering(self):
+        for value in ["5", "19.9", "120.05", "0.005", "1234567.891"]:
+            field = ProductVariantSerializer().fields["price"]
+            self.assertEqual(
+                fast_serializers.format_decimal(Decimal(value)),
+                field.to_representation(Decimal(value)),
+            )
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class VariantBulkTests(CatalogFixtureMixin, TestCase):
+    def bulk(self, ids):
+        return self.client.get("/api/products/variants/", {"ids": ids})
+
+    def test_matches_variant_details(self):
+        ids = list(ProductVariant.objects.order_by("-id").values_list("id", flat=True))
+        response = self.bulk(",".join(map(str, ids + ids[:1] + [999999])))
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual([variant["id"] for variant in data["variants"]], ids)
+        self.assertEqual(data["missing"], [999999])
+        # Un produit par entrée, même partagé par plusieurs variantes
+        self.assertEqual(
+            set(data["products"]),
+            {str(pk) for pk in Product.objects.values_list("id", flat=True)},
+        )
+        for variant in data["variants"]:
+            details = self.client.get(f"/api/products/variant/{variant['id']}/").json()
+            product = details.pop("product")
+            self.assertEqual(variant, {**details, "product": product["id"]})
+            summary = data["products"][str(product["id"])]
+            self.assertEqual(summary["title"], product["title"])
+            self.assertEqual(summary["rating"]["count"], product["rating"]["count"])
+
+    def test_invalid_ids(self):
+        too_many = ",".join(str(pk) for pk in range(1, views.MAX_BULK_VARIANTS + 2))
+        for ids in ("", "1,a", "-1", "0", "²", "1,2²", "٣", "１２", "1_0", too_many):
+            with self.subTest(ids=ids[:20]):
+                self.assertEqual(self.bulk(ids).status_code, 400)
+
+    def test_query_count_does_not_depend_on_ids(self):
+        ids = list(ProductVariant.objects.values_list("id", flat=True))
+        counts = []
+        for subset in (ids[:1], ids):
+            with CaptureQueriesContext(connection) as captured:
+                self.bulk(",".join(map(str, subset)))
+            counts.append(len(captured))
+        self.assertEqual(counts, [4, 4])
+
+    def test_not_cached(self):
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(
+            CATALOG_CACHE_ENABLED=True,
+            CACHES={**settings.CACHES, settings.CATALOG_CACHE_ALIAS: local},
+        ):
+            before = cache_stats()
+            ids = list(ProductVariant.objects.values_list("id", flat=True))
+            for subset in (ids, ids[::-1], ids[:1]):
+                self.assertEqual(self.bulk(",".join(map(str, subset))).status_code, 200)
+            stats = cache_stats()
+        self.assertEqual(
+            (stats["hits"], stats["misses"]), (before["hits"], before["misses"])
+        )
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class ProductListingPaginationTests(CatalogFixtureMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        rebuild_product_cards()
+
+    def walk(self, url, during=None):
+        """Ids de toutes les pages (2 produits par page) ; ``during`` après la 1re page."""
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            page = response.json()
+            self.assertLessEqual(len(page["results"]), 2)
+            pages.append(page)
+            ids += [row["id"] for row in page["results"]]
+            url = page["next"]
+            if during and len(pages) == 1:
+                with self.captureOnCommitCallbacks(execute=True):
+                    during(ids)
+        return ids, pages
+
+    def test_walk_forward_and_back(self):
+        expected = list(Product.objects.order_by("id").values_list("id", flat=True))
+        for url in (
+            "/api/products/?page_size=2",
+            "/api/products/?page_size=2&fields=id,title",
+            "/api/products/cards/?page_size=2",
+        ):
+            with self.subTest(url=url):
+                ids, pages = self.walk(url)
+                self.assertEqual(ids, expected)
+                self.assertIsNone(pages[0]["previous"])
+                back, previous = [], pages[-1]["previous"]
+                while previous:
+                    page = self.client.get(previous).json()
+                    back = [row["id"] for row in page["results"]] + back
+                    previous = page["previous"]
+                self.assertEqual(back, ids[: len(back)])
+
+    def test_filters_are_kept_across_pages(self):
+        expected = list(
+            Product.objects.filter(category=self.categories[0])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        ids, pages = self.walk(
+            f"/api/products/?page_size=1&category={self.categories[0].pk}"
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(pages), len(expected))
+
+    def test_changes_during_walk(self):
+        products = list(Product.objects.order_by("id"))
+        added = []
+
+        def change(seen):
+            # Produit ajouté (en fin de liste), produit à venir supprimé
+            added.append(
+                Product.objects.create(title="Nouveau", category=self.categories[1]).pk
+            )
+            products[-1].delete()
+
+        for url in ("/api/products/?page_size=2", "/api/products/cards/?page_size=2"):
+            with self.subTest(url=url):
+                added.clear()
+                ids, _ = self.walk(url, during=change)
+                expected = [product.pk for product in products[:-1]] + added
+                self.assertEqual(ids, expected)
+                products = list(Product.objects.order_by("id"))
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class ProductFacetTests(CatalogFixtureMixin, TestCase):
+    """Filtres et compteurs comparés à un calcul en Python sur le jeu de données."""
+
+    def price(self, variant):
+        return (variant.price * (100 - variant.discount) / 100).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+
+    def matches(self, variant, params):
+        sizes = {size.size for size in variant.sizes.all()}
+        price = self.price(variant)
+        return (
+            ("color" not in params or variant.color in params["color"].split(","))
+            and ("size" not in params or sizes & set(params["size"].split(",")))
+            and ("price_min" not in params or price >= Decimal(params["price_min"]))
+            and ("price_max" not in params or price <= Decimal(params["price_max"]))
+            and ("in_stock" not in params or variant.stock > 0)
+        )
+
+    def expected(self, params):
+        variant_filters = {"color", "size", "price_min", "price_max", "in_stock"}
+        products = [
+            product
+            for product in Product.objects.prefetch_related("variants__sizes")
+            if ("gender" not in params or product.gender in params["gender"].split(","))
+            and (
+                "category" not in params
+                or params["category"] == str(product.category_id)
+            )
+            and (
+                not variant_filters & set(params)
+                or any(self.matches(v, params) for v in product.variants.all())
+            )
+        ]
+        variants = [v for product in products for v in product.variants.all()]
+
+        def count(values):
+            counts = {}
+            for value in values:
+                counts[value] = counts.get(value, 0) + 1
+            return counts
+
+        def distinct_products(pairs):
+            return count(value for value, _ in set(pairs))
+
+        prices = [self.price(variant) for variant in variants]
+        facets = {
+            "gender": count(product.gender for product in products),
+            "category": count(str(product.category_id) for product in products),
+            "subcategory": count(
+                str(product.subCategory_id)
+                for product in products
+                if product.subCategory_id
+            ),
+            "color": distinct_products((v.color, v.product_id) for v in variants),
+            "size": distinct_products(
+                (size.size, v.product_id) for v in variants for size in v.sizes.all()
+            ),
+            "price": {
+                "min": f"{min(prices):.2f}" if prices else None,
+                "max": f"{max(prices):.2f}" if prices else None,
+            },
+            "in_stock": len({v.product_id for v in variants if v.stock > 0}),
+        }
+        return sorted(product.pk for product in products), facets
+
+    def test_filters_and_counts(self):
+        for params in (
+            {},
+            {"gender": "m,f"},
+            {"category": str(self.categories[0].pk)},
+            {"color": "bleu"},
+            {"size": "M"},
+            {"color": "rouge", "size": "M"},
+            {"price_min": "6", "price_max": "20"},
+            {"in_stock": "1"},
+            {"color": "vert", "in_stock": "1"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    "/api/products/", {**params, "page_size": 100}
+                )
+                self.assertEqual(response.status_code, 200, response.content)
+                data = response.json()
+                ids, facets = self.expected(params)
+                self.assertEqual(sorted(row["id"] for row in data["results"]), ids)
+                self.assertEqual(data["facets"], facets)
+
+    def test_invalid_filters(self):
+        for params in (
+            {"price_min": "abc"},
+            {"price_min": "NaN"},
+            {"price_max": "Infinity"},
+            {"price_min": "-inf"},
+            {"category": "1,x"},
+            {"category": "-1"},
+            {"subcategory": "²"},
+            {"subcategory": "٣"},
+            {"category": "１２"},
+            {"category": "1_0"},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get("/api/products/", params)
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class FieldsetTests(CatalogFixtureMixin, TestCase):
+    VARIANT_COLUMNS = {"id", "color", "price", "stock", "discount"}
+
+    def setUp(self):
+        self.variant = ProductVariant.objects.filter(
+            sizes__isnull=False, images__isnull=False
+        ).first()
+        self.product_url = f"/api/products/{self.variant.product_id}/"
+        self.variant_url = f"/api/products/variant/{self.variant.pk}/"
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertShapedFrom(self, shaped, full):
+        """``shaped`` ne contient que des champs de ``full``, avec les mêmes valeurs."""
+        if isinstance(shaped, list):
+            self.assertEqual(len(shaped), len(full))
+            for shaped_item, full_item in zip(shaped, full):
+                self.assertShapedFrom(shaped_item, full_item)
+        elif isinstance(shaped, dict):
+            self.assertLessEqual(set(shaped), set(full))
+            for key, value in shaped.items():
+                self.assertShapedFrom(value, full[key])
+        else:
+            self.assertEqual(shaped, full)
+
+    def test_product_fields(self):
+        full = self.get(self.product_url)
+        data = self.get(self.product_url, fields="id,title")
+        self.assertEqual(set(data), {"id", "title"})
+        self.assertShapedFrom(data, full)
+
+        data = self.get(self.product_url, fields="id,variants.color")
+        self.assertEqual(set(data), {"id", "variants"})
+        self.assertTrue(data["variants"])
+        self.assertEqual({key for v in data["variants"] for key in v}, {"color"})
+        self.assertShapedFrom(data, full)
+
+    def test_product_expand(self):
+        full = self.get(self.product_url)
+        data = self.get(self.product_url, expand="variants")
+        self.assertEqual(set(data), set(full))
+        for variant in data["variants"]:
+            self.assertEqual(set(variant), self.VARIANT_COLUMNS)
+        self.assertShapedFrom(data, full)
+
+        data = self.get(self.product_url, fields="id", expand="variants.images")
+        self.assertEqual(set(data), {"id", "variants"})
+        for variant in data["variants"]:
+            self.assertEqual(set(variant), self.VARIANT_COLUMNS | {"images"})
+        self.assertShapedFrom(data, full)
+
+    def test_variant_with_product(self):
+        full = self.get(self.variant_url)
+        data = self.get(self.variant_url, fields="id,sizes.size,product.title")
+        self.assertEqual(data["product"], {"title": full["product"]["title"]})
+        self.assertEqual(set(data), {"id", "sizes", "product"})
+        self.assertShapedFrom(data, full)
+
+        data = self.get(self.variant_url, fields="id")
+        self.assertEqual(data, {"id": self.variant.pk})
+
+    def test_listing_fields(self):
+        full = self.get("/api/products/")
+        data = self.get("/api/products/", fields="id,title")
+        keys = {key for row in data["results"] for key in row}
+        self.assertEqual(keys, {"id", "title"})
+        self.assertShapedFrom(data["results"], full["results"])
+
+    def listing_queries(self, **params):
+        """SQL de la page et de ses préchargements (hors validateurs et facettes)."""
+        with CaptureQueriesContext(connection) as captured:
+            self.get("/api/products/", **params)
+        return [
+            query["sql"]
+            for query in captured
+            if query["sql"].endswith("LIMIT 25")
+            or re.search(r'_id" IN \(\d', query["sql"])
+        ]
+
+    def test_queryset_follows_fields(self):
+        queries = self.listing_queries(fields="id,title")
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("long_desc", queries[0])
+
+        queries = self.listing_queries(fields="id,variants.color")
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"color"', queries[1])
+        self.assertNotIn('"price"', queries[1])
+
+        queries = self.listing_queries(expand="variants.images")
+        tables = [re.search(r'FROM "(\w+)"', sql).group(1) for sql in queries]
+        self.assertEqual(
+            tables, ["api_product", "api_productvariant", "api_productimage"]
+        )
+
+
+class RatingPaginationTests(CatalogFixtureMixin, TestCase):
+    SORT_KEYS = {
+        "newest": lambda rating: (-rating.created_at.timestamp(), -rating.id),
+        "highest": lambda rating: (-rating.stars, -rating.created_at.timestamp(), -rating.id),
+        "lowest": lambda rating: (rating.stars, -rating.created_at.timestamp(), -rating.id),
+    }
+
+    def setUp(self):
+        self.product = Product.objects.first()
+        self.user = User.objects.create_user("lectrice", "l@example.com", "secret123")
+        start = timezone.now() - timedelta(days=1)
+        for index in range(11):
+            rating = self.rate(stars=index % 5 + 1)
+            # Dates en double : l'id doit départager
+            Rating.objects.filter(pk=rating.pk).update(
+                created_at=start + timedelta(minutes=index // 2)
+            )
+
+    def rate(self, stars):
+        return Rating.objects.create(
+            product=self.product, user=self.user, stars=stars, comment="Avis"
+        )
+
+    def expected(self, sort):
+        ratings = Rating.objects.filter(product=self.product)
+        return [rating.id for rating in sorted(ratings, key=self.SORT_KEYS[sort])]
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def walk(self, sort, during=None):
+        """Ids de toutes les pages (3 avis par page) ; ``during`` après la 1re page."""
+        url = f"/api/comments/{self.product.pk}/?sort={sort}&page_size=3"
+        ids, pages = [], []
+        while url:
+            page = self.get(url)
+            pages.append(page)
+            ids += [rating["id"] for rating in page["results"]]
+            url = page["next"]
+            if during and len(pages) == 1:
+                during(ids)
+        return ids, pages
+
+    def test_walk_forward_and_back(self):
+        for sort in self.SORT_KEYS:
+            with self.subTest(sort=sort):
+                ids, pages = self.walk(sort)
+                self.assertEqual(ids, self.expected(sort))
+                self.assertIsNone(pages[0]["previous"])
+                back, url = [], pages[-1]["previous"]
+                while url:
+                    page = self.get(url)
+                    back = [rating["id"] for rating in page["results"]] + back
+                    url = page["previous"]
+                self.assertEqual(back, ids[: len(back)])
+                self.assertEqual(len(back), len(ids) - len(pages[-1]["results"]))
+
+    def test_changes_during_walk(self):
+        for sort, stars in (("newest", 3), ("highest", 5), ("lowest", 1)):
+            with self.subTest(sort=sort):
+                expected = self.expected(sort)
+
+                def change(seen):
+                    # Nouvel avis placé avant le curseur, avis déjà vus et à venir modifiés
+                    self.rate(stars)
+                    for pk in (seen[0], expected[-1]):
+                        rating = Rating.objects.get(pk=pk)
+                        rating.comment = "Modifié"
+                        rating.save()
+
+                ids, _ = self.walk(sort, during=change)
+                self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        for cursor in ("abc", "eyJwIjpbMV19", "W10="):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    f"/api/comments/{self.product.pk}/", {"cursor": cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class RatingAggregateTests(CatalogFixtureMixin, TestCase):
+    FIELDS = ["rating_count", "rating_sum", "rating_avg"] + [
+        f"rating_{stars}" for stars in STAR_VALUES
+    ]
+
+    def setUp(self):
+        rebuild_rating_aggregates()  # Le jeu de données pose des agrégats sans avis
+        self.first, self.second = Product.objects.order_by("id")[:2]
+        self.user = User.objects.create_user("lectrice", "l@example.com", "secret123")
+
+    def rate(self, product, stars):
+        return Rating.objects.create(product=product, user=self.user, stars=stars)
+
+    def aggregates(self, product):
+        return Product.objects.filter(pk=product.pk).values(*self.FIELDS).get()
+
+    def assertAggregatesMatchRatings(self, *products):
+        for product in products:
+            stars = list(
+                Rating.objects.filter(product=product).values_list("stars", flat=True)
+            )
+            expected = {
+                "rating_count": len(stars),
+                "rating_sum": sum(stars),
+                "rating_avg": sum(stars) / len(stars) if stars else 0,
+                **{f"rating_{value}": stars.count(value) for value in STAR_VALUES},
+            }
+            self.assertEqual(self.aggregates(product), expected)
+
+    def test_create(self):
+        self.rate(self.first, 5)
+        self.rate(self.first, 2)
+        self.assertAggregatesMatchRatings(self.first, self.second)
+
+    def test_change_stars(self):
+        rating = self.rate(self.first, 5)
+        self.rate(self.first, 3)
+        rating.stars = 1
+        rating.save()
+        self.assertAggregatesMatchRatings(self.first)
+        rating.comment = "Sans changement de note"
+        rating.save()
+        self.assertAggregatesMatchRatings(self.first)
+
+    def test_delete(self):
+        rating = self.rate(self.first, 4)
+        self.rate(self.first, 2)
+        rating.delete()
+        self.assertAggregatesMatchRatings(self.first)
+        Rating.objects.get(product=self.first).delete()
+        self.assertAggregatesMatchRatings(self.first)
+
+    def test_move_to_another_product(self):
+        rating = self.rate(self.first, 4)
+        self.rate(self.second, 1)
+        rating.product = self.second
+        rating.save()
+        self.assertAggregatesMatchRatings(self.first, self.second)
+        rating.product = self.first
+        rating.stars = 2
+        rating.save()
+        self.assertAggregatesMatchRatings(self.first, self.second)
+
+    def test_rebuild_matches_incremental_updates(self):
+        ratings = [
+            self.rate(product, stars)
+            for product, stars in [
+                (self.first, 5),
+                (self.first, 3),
+                (self.second, 4),
+                (self.second, 1),
+            ]
+        ]
+        ratings[0].stars = 2
+        ratings[0].save()
+        ratings[1].product = self.second
+        ratings[1].save()
+        ratings[2].delete()
+        incremental = list(Product.objects.order_by("id").values("id", *self.FIELDS))
+        self.assertEqual(rebuild_rating_aggregates(), 2)
+        self.assertEqual(
+            list(Product.objects.order_by("id").values("id", *self.FIELDS)),
+            incremental,
+        )
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class ConditionalGetTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        self.variant = ProductVariant.objects.filter(
+            sizes__isnull=False, images__isnull=False
+        ).first()
+        self.url = f"/api/products/{self.variant.product_id}/"
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        settings_override = override_settings(
+            CACHES={**settings.CACHES, settings.CATALOG_CACHE_ALIAS: local}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_cache().clear()
+        self.age_catalog()
+
+    def age_catalog(self):
+        """Recule les updated_at et la dernière suppression d'une heure :
+        Last-Modified est à la seconde."""
+        self.past = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        for model in (Product, ProductVariant, ProductVariantSize, ProductImage):
+            model.objects.update(updated_at=self.past)
+        get_cache().set(DELETED_KEY, self.past.timestamp(), timeout=None)
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def test_validators(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertEqual(response["Last-Modified"], http_date(self.past.timestamp()))
+        self.assertNotEqual(self.client.get("/api/products/")["ETag"], response["ETag"])
+
+    def test_not_modified(self):
+        response = self.get()
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        for headers in (
+            {"If-None-Match": etag},
+            {"If-None-Match": f'"autre", {etag}'},
+            {"If-Modified-Since": last_modified},
+        ):
+            with self.subTest(headers=headers):
+                not_modified = self.get(**headers)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b"")
+                self.assertEqual(not_modified["ETag"], etag)
+        # If-None-Match l'emporte sur If-Modified-Since
+        response = self.get(
+            **{"If-None-Match": '"autre"', "If-Modified-Since": last_modified}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_edits_change_validators(self):
+        size = self.variant.sizes.first()
+        image = self.variant.images.first()
+
+        def update(instance, **values):
+            for field, value in values.items():
+                setattr(instance, field, value)
+            instance.save()
+
+        changes = [
+            ("variante modifiée", lambda: update(self.variant, price=Decimal("3"))),
+            ("taille modifiée", lambda: update(size, size="XL")),
+            ("image modifiée", lambda: update(image, mainImage=not image.mainImage)),
+            ("taille supprimée", size.delete),
+            ("image supprimée", image.delete),
+            ("variante supprimée", self.variant.delete),
+        ]
+        for label, change in changes:
+            with self.subTest(label):
+                self.age_catalog()
+                before = self.get()
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+                response = self.get(**{"If-None-Match": before["ETag"]})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], before["ETag"])
+                response = self.get(**{"If-Modified-Since": before["Last-Modified"]})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["Last-Modified"], before["Last-Modified"])
+
+    def test_delete_in_same_second_advances_last_modified(self):
+        products = [
+            Product.objects.create(title=title, category=self.categories[0])
+            for title in ("Ancien", "Récent")
+        ]
+        before = self.client.get("/api/products/", {"page_size": 100})
+        with self.captureOnCommitCallbacks(execute=True):
+            products[0].delete()
+        response = self.client.get(
+            "/api/products/",
+            {"page_size": 100},
+            headers={"If-Modified-Since": before["Last-Modified"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        ids = [row["id"] for row in response.json()["results"]]
+        self.assertNotIn(products[0].pk, ids)
+        self.assertIn(products[1].pk, ids)
+
+
+class AsyncViewParityTests(CatalogFixtureMixin, TestCase):
+    """Les vues asynchrones renvoient les mêmes octets et validateurs que les vues DRF."""
+
+    def setUp(self):
+        self.variant = ProductVariant.objects.filter(sizes__isnull=False).first()
+        self.product = self.variant.product
+        Rating.objects.create(
+            product=self.product,
+            user=User.objects.create_user("lectrice", "lectrice@example.com", "x"),
+            stars=4,
+            comment="Bien",
+        )
+
+    def cases(self):
+        product, variant = self.product.pk, self.variant.pk
+        return [
+            ("get_products", "/api/products/", {}),
+            ("get_products", "/api/products/?page_size=2&gender=f", {}),
+            ("get_products", "/api/products/?fields=id,title", {}),
+            ("get_products", "/api/products/?min_price=abc", {}),
+            ("get_products", "/api/products/?cursor=garbage", {}),
+            ("get_products", "/api/products/?fields=id&cursor=garbage", {}),
+            ("get_product", f"/api/products/{product}/", {"pk": product}),
+            ("get_product", f"/api/products/{product}/?fields=id", {"pk": product}),
+            ("get_product", "/api/products/0/", {"pk": 0}),
+            ("get_variant_details", "/", {"variant_id": variant}),
+            ("get_variant_details", "/?expand=product", {"variant_id": variant}),
+            ("get_variant_details", "/", {"variant_id": 0}),
+            ("get_categories", "/api/categories/", {}),
+            ("get_comments", "/", {"product_id": product}),
+            ("get_comments", "/?sort=pire", {"product_id": product}),
+            ("get_comments", "/?cursor=garbage", {"product_id": product}),
+            ("get_comments", "/", {"product_id": 0}),
+        ]
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    async def test_same_responses(self):
+        for name, url, kwargs in self.cases():
+            with self.subTest(name=name, url=url):
+                expected = await sync_to_async(self.sync_response)(name, url, kwargs)
+                request = AsyncRequestFactory().get(url)
+                response = await getattr(async_views, name)(request, **kwargs)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get("ETag"), expected.get("ETag"))
+                self.assertEqual(
+                    response.get("Last-Modified"), expected.get("Last-Modified")
+                )
+
+    def sync_response(self, name, url, kwargs):
+        response = getattr(views, name)(RequestFactory().get(url), **kwargs)
+        return response.render()
+
+    async def test_not_modified_and_cache_hit(self):
+        url = f"/api/products/{self.product.pk}/"
+        first = await async_views.get_product(
+            AsyncRequestFactory().get(url), pk=self.product.pk
+        )
+        request = AsyncRequestFactory().get(
+            url, headers={"If-None-Match": first["ETag"]}
+        )
+        response = await async_views.get_product(request, pk=self.product.pk)
+        self.assertEqual(response.status_code, 304)
+        # Réponse servie par le cache rempli lors du premier appel
+        cached = await async_views.get_product(
+            AsyncRequestFactory().get(url), pk=self.product.pk
+        )
+        self.assertEqual(cached["Content-Type"], "application/json")
+        self.assertEqual(cached.content, first.content)
+
+    async def test_rejects_unsafe_methods(self):
+        response = await async_views.get_categories(AsyncRequestFactory().post("/"))
+        self.assertEqual(response.status_code, 405)
+
+
+class BenchmarkTests(TestCase):
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual(set(route_names()) - set(ROUTES), set())
+
+    def test_run_leaves_database_untouched(self):
+        seed_catalog(categories=2, products=6, users=3, ratings=2)
+        before = (Product.objects.count(), Rating.objects.count(), Cart.objects.count())
+        report = run_benchmark(iterations=2, warmup=0)
+        self.assertEqual(report["skipped"], [])
+        self.assertEqual(len(report["endpoints"]), len(route_names()))
+        for endpoint in report["endpoints"]:
+            self.assertLess(endpoint["status"], 500, endpoint["name"])
+            self.assertLessEqual(endpoint["p50_ms"], endpoint["p99_ms"])
+        after = (Product.objects.count(), Rating.objects.count(), Cart.objects.count())
+        self.assertEqual(before, after)
+
+
+# Nombre maximal de requêtes SQL par route (cache du catalogue désactivé), quelle
+# que soit la taille des données. Toute hausse doit être justifiée ici.
+QUERY_BUDGETS = {
+    "hello_world": 0,
+    "get_cache_stats": 1,
+    "get_db_stats": 1,
+    "get_resized_image": 0,
+    "get_metrics": 0,
+    "get_products": 9,  # ETag + page (4) + facettes (4)
+    "get_product_cards": 2,
+    "search_products": 2,
+    "get_categories": 2,
+    "get_product": 5,
+    "get_product_by_category": 5,
+    "get_product_by_subcategory": 5,
+    "get_subcateregory_by_category": 1,
+    "get_variants_bulk": 4,
+    "get_variant_details": 5,
+    "get_size_details": 1,
+    "get_category": 1,
+    "login": 2,
+    "logout": 2,
+    "register": 6,
+    "activate_account": 1,
+    "get_current_user": 1,
+    "username_exists": 1,
+    "email_exists": 1,
+    "send_verification_code": 1,
+    "reset_password": 2,
+    "save_comment": 6,
+    "get_comments": 1,
+    "get_user": 1,
+    "get_cart_user": 4,
+    "add_to_cart": 7,
+    "update_cart": 8,
+    "empty_cart": 2,
+    "remove_from_cart": 7,
+    "cart_batch": 9,
+    "get_cart_summary": 3,
+    "user_wishlist": 3,
+    "get_wishlist_ids": 2,
+    "add_to_wishlist": 6,
+    "remove_from_wishlist": 7,
+    "empty_wishlist": 3,
+    "already_in_wishlist": 4,
+}
+
+# Deux tailles de données : les mêmes objets (premier produit, première catégorie,
+# premier utilisateur…) ont plus de variantes, tailles, avis, articles…
+DATASET_SCALES = {
+    "small": dict(
+        categories=2,
+        subcategories=1,
+        products=4,
+        variants=1,
+        sizes=1,
+        images=1,
+        ratings=1,
+        users=2,
+        cart_items=1,
+        wishlist_items=1,
+    ),
+    "large": dict(
+        categories=3,
+        subcategories=5,
+        products=45,
+        variants=4,
+        sizes=5,
+        images=3,
+        ratings=6,
+        users=8,
+        cart_items=6,
+        wishlist_items=6,
+    ),
+}
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class QueryBudgetTests(TestCase):
+    """Le nombre de requêtes de chaque route est borné et ne dépend pas des données."""
+
+    def test_budget_covers_every_route(self):
+        self.assertEqual(set(route_names()), set(QUERY_BUDGETS))
+
+    def test_query_counts(self):
+        counts = {}
+        for scale, quantities in DATASET_SCALES.items():
+            clear_seeded()
+            seed_catalog(**quantities)
+            report = run_benchmark(iterations=1, warmup=0)
+            counts[scale] = {e["name"]: e["queries"] for e in report["endpoints"]}
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(route=name):
+                self.assertLessEqual(counts["small"][name], budget)
+                self.assertLessEqual(counts["large"][name], budget)
+                self.assertEqual(counts["small"][name], counts["large"][name])
+
+
+def _bump_in_child():
+    bump_catalog_version()
+
+
+class CatalogCacheTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            CATALOG_CACHE_ENABLED=True,
+            CACHES={
+                **settings.CACHES,
+                settings.CATALOG_CACHE_ALIAS: {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": directory.name,
+                },
+            },
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_bump_from_another_worker_invalidates(self):
+        cached = self.client.get("/api/categories/").json()
+        # update() n'envoie pas de signal : seul le cache répond encore l'ancien titre
+        Category.objects.filter(pk=self.categories[0].pk).update(title="Enfant")
+        self.assertEqual(self.client.get("/api/categories/").json(), cached)
+
+        worker = multiprocessing.get_context("fork").Process(target=_bump_in_child)
+        worker.start()
+        worker.join()
+        self.assertEqual(worker.exitcode, 0)
+        titles = [row["title"] for row in self.client.get("/api/categories/").json()]
+        self.assertIn("Enfant", titles)
+
+    def test_lookups_counted_outside_the_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = settings.CACHES[settings.CATALOG_CACHE_ALIAS]["LOCATION"]
+        with override_settings(METRICS_DIR=directory.name):
+            self.client.get("/api/categories/")
+            files = sorted(os.listdir(cache_dir))
+            self.client.get("/api/categories/")
+            # Un succès n'écrit rien dans le cache
+            self.assertEqual(sorted(os.listdir(cache_dir)), files)
+            stats = cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_local_memory_cache_refused_with_several_workers(self):
+        check_shared_cache(workers=4)
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(
+            CACHES={**settings.CACHES, settings.CATALOG_CACHE_ALIAS: local}
+        ):
+            check_shared_cache(workers=1)
+            with self.assertRaises(ImproperlyConfigured):
+                check_shared_cache(workers=4)
+
+
+class ProfilingMiddlewareTests(CatalogFixtureMixin, TestCase):
+    @override_settings(PROFILING_ENABLED=True, CATALOG_CACHE_ENABLED=False)
+    def test_server_timing_header(self):
+        product = Product.objects.first()
+        response = self.client.get(f"/api/products/{product.pk}/")
+        metrics = dict(
+            part.split(";", 1)[0:2] for part in response["Server-Timing"].split(", ")
+        )
+        self.assertEqual(set(metrics), {"db", "view", "render", "total", "bytes"})
+        self.assertIn('desc="5 queries"', metrics["db"])
+        self.assertEqual(metrics["bytes"], f'desc="{len(response.content)}"')
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_request(self):
+        self.assertFalse(self.client.get("/api/hello/").has_header("Server-Timing"))
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_REQUEST_MS=0.001)
+    def test_slow_request_log(self):
+        with self.assertLogs("api.profiling", "WARNING"):
+            self.client.get("/api/hello/")
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        self.assertFalse(self.client.get("/api/hello/").has_header("Server-Timing"))
+
+
+# Pile de production sous ASGI (voir MIDDLEWARE et myshop.asgi)
+ASGI_MIDDLEWARE = [
+    path
+    for path in settings.MIDDLEWARE
+    if path != "whitenoise.middleware.WhiteNoiseMiddleware"
+]
+
+
+class RecordingASGIHandler(ASGIHandler):
+    """Retient les middlewares que Django a dû adapter (sync <-> async)."""
+
+    def __init__(self):
+        self.adapted = []
+        super().__init__()
+
+    def adapt_method_mode(self, is_async, method, method_is_async=None, debug=False, name=None):
+        adapted = super().adapt_method_mode(is_async, method, method_is_async, debug, name)
+        # Les hooks process_* (sans nom ni mode connu) sont courts : ignorés
+        if adapted is not method and (name or method_is_async is not None):
+            self.adapted.append(name or "haut de la pile")
+        return adapted
+
+
+@override_settings(
+    MIDDLEWARE=ASGI_MIDDLEWARE,
+    PROFILING_ENABLED=True,
+    METRICS_ENABLED=True,
+    DATABASE_REPLICAS=["default"],
+)
+class AsyncMiddlewareChainTests(CatalogFixtureMixin, TestCase):
+    def test_chain_stays_async(self):
+        handler = RecordingASGIHandler()
+        self.assertEqual(handler.adapted, [])
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    async def test_queries_measured_under_asgi(self):
+        product = await Product.objects.afirst()
+        response = await self.async_client.get(f"/api/products/{product.pk}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="5 queries"', response["Server-Timing"])
+
+
+class DatabaseStatsTests(TestCase):
+    def test_admin_only(self):
+        self.assertIn(self.client.get("/api/db/stats/").status_code, (401, 403))
+
+    def test_reports_connection_settings(self):
+        admin = User.objects.create(username="admin", is_staff=True)
+        response = self.client.get("/api/db/stats/", **_auth_headers(admin))
+        self.assertEqual(response.status_code, 200)
+        default = response.json()["databases"]["default"]
+        self.assertEqual(
+            set(default),
+            {
+                "vendor",
+                "conn_max_age",
+                "conn_health_checks",
+                "server_side_binding",
+                "server_side_cursors",
+                "pool",
+            },
+        )
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"])
+class ReplicaRouterTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.router = CatalogReplicaRouter()
+
+    def test_catalog_reads_use_one_replica_per_request(self):
+        with routing_context():
+            chosen = {self.router.db_for_read(Product) for _ in range(20)}
+            chosen.add(self.router.db_for_read(Category))
+            self.assertEqual(len(chosen), 1)
+            self.assertIn(chosen.pop(), ["replica1", "replica2"])
+            self.assertEqual(self.router.db_for_read(Cart), "default")
+
+    def test_reads_after_write_stay_on_primary(self):
+        with routing_context():
+            self.assertNotEqual(self.router.db_for_read(Product), "default")
+            self.assertEqual(self.router.db_for_write(Cart), "default")
+            self.assertEqual(self.router.db_for_read(Product), "default")
+        with routing_context():
+            self.assertNotEqual(self.router.db_for_read(Product), "default")
+
+    def test_reads_in_transaction_stay_on_primary(self):
+        with routing_context(), transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_unsafe_methods_are_pinned(self):
+        seen = {}
+
+        def view(request):
+            seen[request.method] = self.router.db_for_read(Product)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        middleware(RequestFactory().get("/"))
+        middleware(RequestFactory().post("/"))
+        self.assertNotEqual(seen["GET"], "default")
+        self.assertEqual(seen["POST"], "default")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        with routing_context():
+            self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_cache_fills_read_from_primary(self):
+        local = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        settings_override = override_settings(
+            CATALOG_CACHE_ENABLED=True,
+            CACHES={**settings.CACHES, settings.CATALOG_CACHE_ALIAS: local},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        seen = []
+
+        @cache_catalog_response
+        def view(request):
+            seen.append(self.router.db_for_read(Product))
+            return Response({"id": 1})
+
+        with routing_context():
+            view(RequestFactory().get("/api/products/1/"))
+            self.assertNotEqual(self.router.db_for_read(Product), "default")
+        with override_settings(CATALOG_CACHE_ENABLED=False), routing_context():
+            view(RequestFactory().get("/api/products/1/"))
+        self.assertEqual(seen[0], "default")
+        self.assertNotEqual(seen[1], "default")
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "api"))
+        self.assertIsNone(self.router.allow_migrate("default", "api"))
+
+
+class ImageResizeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        cache = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.addCleanup(cache.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media.name,
+            IMAGE_CACHE_DIR=cache.name,
+            IMAGE_WIDTHS=[320, 640],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(media.name, "products", "1", "sky blue"))
+        self.name = "products/1/sky blue/photo.jpg"
+        Image.new("RGB", (1000, 500), "red").save(os.path.join(media.name, self.name))
+
+    def get(self, width, accept="image/webp,*/*"):
+        return self.client.get(
+            images.resized_url(self.name, width), HTTP_ACCEPT=accept
+        )
+
+    def test_negotiated_and_resized(self):
+        response = self.get(320)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertIn("Accept", response["Vary"])
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 160)))
+
+        response = self.get(640, accept="image/jpeg")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+    def test_width_buckets_and_missing_images(self):
+        response = self.get(500)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], images.resized_url(self.name, 640))
+        self.assertEqual(self.client.get("/api/images/320/products/none.jpg").status_code, 404)
+        self.assertEqual(
+            self.client.get("/api/images/320/categories/photo.jpg").status_code, 404
+        )
+
+    def test_srcset(self):
+        self.assertEqual(
+            images.image_srcset(self.name),
+            "/api/images/320/products/1/sky%20blue/photo.jpg 320w, "
+            "/api/images/640/products/1/sky%20blue/photo.jpg 640w",
+        )
+        self.assertIsNone(images.image_srcset(""))
+
+    def test_least_recently_served_are_evicted(self):
+        small, _ = images.get_derivative(self.name, 320)
+        large, _ = images.get_derivative(self.name, 640)
+        os.utime(small, (1, 1))
+        images.get_derivative(self.name, 640)
+        self.assertEqual(images.evict(os.path.getsize(large)), 1)
+        self.assertFalse(os.path.exists(small))
+        self.assertTrue(os.path.exists(large))
+
+    def test_cache_scanned_only_past_estimated_size(self):
+        small, _ = images.get_derivative(self.name, 320)  # Premier parcours
+        # Fichier d'un autre worker : compté au prochain parcours seulement
+        foreign = os.path.join(settings.IMAGE_CACHE_DIR, "autre.jpeg")
+        with open(foreign, "wb") as file:
+            file.write(b"0" * 1024 * 1024)
+        os.utime(foreign, (1, 1))
+        with override_settings(IMAGE_CACHE_MAX_BYTES=512 * 1024):
+            large, _ = images.get_derivative(self.name, 640)
+            self.assertTrue(os.path.exists(foreign))
+        with override_settings(IMAGE_CACHE_MAX_BYTES=os.path.getsize(large)):
+            os.remove(small)
+            images.get_derivative(self.name, 320)
+            # Estimation dépassée : parcours, puis les moins récents partent
+            self.assertFalse(os.path.exists(foreign))
+            self.assertTrue(os.path.exists(small))
+
+
+class CartBatchTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("acheteuse", "a@example.com", "secret123")
+        self.headers = _auth_headers(self.user)
+        self.lines = [
+            (size.variant_id, size.pk)
+            for size in ProductVariantSize.objects.order_by("id")
+        ] + [(variant.pk, None) for variant in ProductVariant.objects.order_by("id")]
+
+    def batch(self, *operations):
+        return self.client.post(
+            "/api/cart/batch/",
+            {"operations": list(operations)},
+            content_type="application/json",
+            **self.headers,
+        )
+
+    def op(self, op, line, quantity=None):
+        variant_id, size_id = line
+        operation = {"op": op, "variant_id": variant_id, "size_id": size_id}
+        if quantity is not None:
+            operation["quantity"] = quantity
+        return operation
+
+    def cart(self):
+        return {
+            (item.variant_id, item.size_id): item.quantity
+            for item in Cart.objects.filter(user=self.user)
+        }
+
+    def test_add_set_remove(self):
+        first, second, third = self.lines[:3]
+        Cart.objects.create(user=self.user, variant_id=third[0], size_id=third[1])
+        response = self.batch(
+            self.op("add", first, 2),
+            self.op("add", first, 1),
+            self.op("add", second),
+            self.op("set", second, 5),
+            self.op("remove", third),
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.cart(), {first: 3, second: 5})
+        self.assertEqual(len(response.json()["cart"]), 2)
+
+        self.batch(self.op("remove", first), self.op("add", first, 4))
+        self.assertEqual(self.cart(), {first: 4, second: 5})
+
+    def test_invalid_batch_changes_nothing(self):
+        first, second = self.lines[:2]
+        Cart.objects.create(user=self.user, variant_id=first[0], size_id=first[1])
+        for operations in (
+            [self.op("add", first), self.op("set", second, 2)],  # Ligne absente
+            [self.op("add", first), self.op("add", (0, None))],
+            [self.op("add", first), self.op("add", (first[0], 999999))],
+            [self.op("add", first, 0)],
+            [{"op": "vider", "variant_id": first[0]}],
+        ):
+            with self.subTest(operations=operations):
+                self.assertEqual(self.batch(*operations).status_code, 400)
+        self.assertEqual(self.cart(), {first: 1})
+
+    @override_settings(CATALOG_CACHE_ENABLED=False)
+    def test_query_count_does_not_depend_on_batch_size(self):
+        counts = []
+        # Une ligne existante (bulk_update) et des lignes nouvelles (bulk_create)
+        for lines in (self.lines[:2], self.lines):
+            Cart.objects.filter(user=self.user).delete()
+            Cart.objects.create(user=self.user, variant_id=lines[0][0], size_id=lines[0][1])
+            operations = [self.op("add", line, 2) for line in lines]
+            operations += [self.op("set", line, 3) for line in lines]
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.batch(*operations).status_code, 200)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
+
+
+class CartSummaryTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("acheteuse", "a@example.com", "secret123")
+        self.headers = _auth_headers(self.user)
+
+    def summary(self):
+        response = self.client.get("/api/cart/summary/", **self.headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_totals_match_effective_prices(self):
+        variants = ProductVariant.objects.annotate(unit=effective_price()).order_by("id")
+        expected_subtotal = expected_total = Decimal(0)
+        for quantity, variant in enumerate(variants, start=1):
+            Cart.objects.create(user=self.user, variant=variant, quantity=quantity)
+            expected_subtotal += variant.price * quantity
+            expected_total += variant.unit * quantity
+        summary = self.summary()
+        self.assertEqual(len(summary["items"]), len(variants))
+        self.assertEqual(summary["count"], sum(range(1, len(variants) + 1)))
+        self.assertEqual(Decimal(summary["subtotal"]), expected_subtotal)
+        self.assertEqual(Decimal(summary["total"]), expected_total)
+        self.assertEqual(
+            Decimal(summary["discount_total"]), expected_subtotal - expected_total
+        )
+        line = summary["items"][1]
+        self.assertEqual(line["title"], variants[1].product.title)
+        self.assertEqual(line["unit_price"], "{:.2f}".format(variants[1].unit))
+        self.assertEqual(Decimal(line["total"]), variants[1].unit * 2)
+        self.assertTrue(line["image"].endswith("photo.jpg"))
+        self.assertIsNone(summary["items"][-1]["image"])
+
+    def test_empty_cart(self):
+        summary = self.summary()
+        self.assertEqual(summary["items"], [])
+        self.assertEqual((summary["count"], summary["total"]), (0, "0.00"))
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        counts = []
+        for variant in ProductVariant.objects.order_by("id")[:2]:
+            Cart.objects.create(user=self.user, variant=variant)
+            with CaptureQueriesContext(connection) as captured:
+                self.summary()
+            counts.append(len(captured))
+        for size in ProductVariantSize.objects.all():
+            Cart.objects.create(user=self.user, variant_id=size.variant_id, size=size)
+        with CaptureQueriesContext(connection) as captured:
+            self.summary()
+        self.assertEqual(counts + [len(captured)], [counts[0]] * 3)
+
+
+class WishlistIdsTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("acheteuse", "a@example.com", "secret123")
+        self.headers = _auth_headers(self.user)
+
+    def test_ids_and_revalidation(self):
+        first, second = ProductVariant.objects.order_by("id")[:2]
+        size = ProductVariantSize.objects.filter(variant=second).first()
+        Wishlist.objects.create(user=self.user, variant=second, size=size)
+        Wishlist.objects.create(user=self.user, variant=second)
+        Wishlist.objects.create(user=self.user, variant=first)
+        other = User.objects.create_user("autre", "b@example.com", "secret123")
+        Wishlist.objects.create(user=other, variant=ProductVariant.objects.last())
+
+        response = self.client.get("/api/wishlist/ids/", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["variant_ids"], [first.pk, second.pk])
+        self.assertEqual(response["ETag"], f'"{data["version"]}"')
+        self.assertIn("private", response["Cache-Control"])
+
+        with self.assertNumQueries(2):  # Utilisateur du jeton, puis les ids
+            unchanged = self.client.get(
+                "/api/wishlist/ids/", HTTP_IF_NONE_MATCH=response["ETag"], **self.headers
+            )
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b"")
+
+        Wishlist.objects.filter(user=self.user, variant=first).delete()
+        changed = self.client.get(
+            "/api/wishlist/ids/", HTTP_IF_NONE_MATCH=response["ETag"], **self.headers
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["variant_ids"], [second.pk])
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get("/api/wishlist/ids/").status_code, 401)
+
+
+class ConcurrentAddTests(TransactionTestCase):
+    """Ajouts simultanés depuis plusieurs threads (une connexion chacun)."""
+
+    THREADS = 8
+    REQUESTS_PER_THREAD = 5
+
+    def setUp(self):
+        self.user = User.objects.create_user("acheteuse", "a@example.com", "secret123")
+        category = Category.objects.create(title="Femme", slug="femme")
+        product = Product.objects.create(
+            title="Robe", short_desc="Court", category=category, gender="f"
+        )
+        self.variant = ProductVariant.objects.create(
+            product=product, color="rouge", price="19.9"
+        )
+        self.size = ProductVariantSize.objects.create(variant=self.variant, size="M")
+
+    def hammer(self, url, payload):
+        barrier = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def worker():
+            client = self.client_class()
+            barrier.wait()
+            try:
+                for _ in range(self.REQUESTS_PER_THREAD):
+                    response = client.post(url, payload, content_type="application/json")
+                    statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [200] * self.THREADS * self.REQUESTS_PER_THREAD)
+
+    def test_no_lost_cart_increments(self):
+        total = self.THREADS * self.REQUESTS_PER_THREAD
+        for size_id in (self.size.pk, None):
+            with self.subTest(size_id=size_id):
+                self.hammer(
+                    "/api/cart/add/",
+                    {
+                        "user_id": self.user.pk,
+                        "variant_id": self.variant.pk,
+                        "size_id": size_id,
+                        "quantity": 2,
+                    },
+                )
+                item = Cart.objects.get(user=self.user, size_id=size_id)
+                self.assertEqual(item.quantity, 2 * total)
+
+    def test_wishlist_has_one_row(self):
+        self.hammer(
+            "/api/wishlist/add/",
+            {"user_id": self.user.pk, "variant_id": self.variant.pk},
+        )
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 1)
+
+    def test_write_is_a_single_query(self):
+        payload = {"user_id": self.user.pk, "variant_id": self.variant.pk}
+        for url in ("/api/cart/add/", "/api/wishlist/add/"):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as captured:
+                    self.client.post(url, payload, content_type="application/json")
+                writes = [
+                    query["sql"]
+                    for query in captured
+                    if not query["sql"].lstrip().upper().startswith("SELECT")
+                ]
+                self.assertEqual(len(writes), 1, writes)
+                self.assertIn("ON CONFLICT", writes[0])
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP indisponible")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class JobQueueTests(TestCase):
+    def register(self):
+        response = self.client.post(
+            "/api/register/",
+            {"username": "nouvelle", "email": "nouvelle@example.com", "password": "secret123"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return User.objects.get(username="nouvelle")
+
+    def test_smtp_timeout_shorter_than_job_lock(self):
+        # Un envoi bloqué ne doit pas laisser reprendre (et renvoyer) la tâche ;
+        # le délai vaut par opération (connexion, TLS, envoi) : garder de la marge
+        self.assertIsNotNone(settings.EMAIL_TIMEOUT)
+        self.assertLess(settings.EMAIL_TIMEOUT * 5, settings.JOBS_LOCK_TIMEOUT)
+
+    def test_activation_email_is_sent_by_the_worker(self):
+        user = self.register()
+        self.assertEqual(mail.outbox, [])
+        [job] = run_pending()
+        self.assertEqual((job.name, job.status), ("send_activation_email", Job.DONE))
+        self.assertEqual(mail.outbox[0].to, ["nouvelle@example.com"])
+        self.assertIn(str(user.email_verification_token), mail.outbox[0].body)
+
+    @override_settings(
+        EMAIL_BACKEND="api.tests.FailingEmailBackend", JOBS_MAX_ATTEMPTS=3
+    )
+    def test_retries_then_dead_letter_deletes_inactive_user(self):
+        self.register()
+        previous_delay = None
+        for attempt in range(1, 4):
+            [job] = run_pending()
+            self.assertEqual(job.attempts, attempt)
+            if attempt < 3:
+                self.assertEqual(job.status, Job.PENDING)
+                delay = job.run_at - job.updated_at
+                if previous_delay is not None:
+                    self.assertGreater(delay, previous_delay)
+                previous_delay = delay
+                Job.objects.filter(pk=job.pk).update(run_at=job.updated_at)
+        self.assertEqual(job.status, Job.DEAD)
+        self.assertIn("SMTP indisponible", job.last_error)
+        self.assertFalse(User.objects.filter(username="nouvelle").exists())
+
+    def test_stale_running_job_is_reclaimed(self):
+        self.client.post(
+            "/api/user/send_verification_code/",
+            {"email": "client@example.com"},
+            content_type="application/json",
+        )
+        [job] = claim_jobs(10)
+        self.assertEqual(claim_jobs(10), [])
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=job.locked_at - timedelta(hours=1)
+        )
+        self.assertEqual([reclaimed.pk for reclaimed in claim_jobs(10)], [job.pk])
+
+
+@task(name="tests.delete_jobs")
+def delete_jobs():
+    # Fait échouer l'enregistrement du résultat par run_job (ligne disparue)
+    Job.objects.all().delete()
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class JobWorkerCommandTests(TransactionTestCase):
+    """Les threads du worker ont leur propre connexion : données validées nécessaires."""
+
+    def test_runs_jobs_in_thread_pool(self):
+        for index in range(3):
+            send_email.enqueue(
+                subject="Code", message="1234", recipients=[f"client{index}@example.com"]
+            )
+        call_command("run_jobs", once=True, threads=2, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(set(Job.objects.values_list("status", flat=True)), {Job.DONE})
+
+    def test_logs_results_that_could_not_be_saved(self):
+        delete_jobs.enqueue()
+        with self.assertLogs("api.jobs", "ERROR") as logs:
+            call_command("run_jobs", once=True, threads=2, stdout=io.StringIO())
+        self.assertIn("tests.delete_jobs", logs.output[0])
+        self.assertIn("résultat non enregistré", logs.output[0])
+
+
+def _record_in_child(status):
+    metrics.record_request("get_products", "GET", status, 0.02, 3)
+    metrics.get_registry().flush(force=True)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            METRICS_ENABLED=True, METRICS_DIR=directory.name, METRICS_TOKEN="s3cret"
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_aggregates_worker_processes(self):
+        context = multiprocessing.get_context("fork")
+        for status in (200, 200, 500):
+            worker = context.Process(target=_record_in_child, args=(status,))
+            worker.start()
+            worker.join()
+        text = metrics.metrics_text()
+        self.assertIn(
+            'shopsy_http_requests_total{method="GET",route="get_products",status="200"} 2',
+            text,
+        )
+        self.assertIn('shopsy_http_request_errors_total{route="get_products"} 1', text)
+        self.assertIn(
+            'shopsy_http_request_duration_seconds_bucket{route="get_products",le="0.025"} 3',
+            text,
+        )
+        self.assertIn(
+            'shopsy_db_queries_per_request_bucket{route="get_products",le="2"} 0', text
+        )
+        self.assertIn('shopsy_db_queries_per_request_count{route="get_products"} 3', text)
+
+    def test_endpoint_counts_requests_by_route(self):
+        self.client.get("/api/hello/")
+        self.client.get("/api/does-not-exist/")
+        response = self.client.get(
+            "/api/metrics", headers={"Authorization": "Bearer s3cret"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn(
+            'shopsy_http_requests_total{method="GET",route="hello_world",status="200"} 1',
+            text,
+        )
+        self.assertIn('route="unmatched",status="404"} 1', text)
+
+    def test_endpoint_requires_token(self):
+        for headers in (
+            {},
+            {"Authorization": "Bearer autre"},
+            {"Authorization": "s3cret"},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.get("/api/metrics", headers=headers)
+                self.assertEqual(response.status_code, 403)
+        with override_settings(METRICS_TOKEN=""):
+            response = self.client.get(
+                "/api/metrics", headers={"Authorization": "Bearer "}
+            )
+            self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_concurrent_flushes(self):
+        errors = []
+
+        def record():
+            try:
+                for _ in range(200):
+                    metrics.record_request("hello_world", "GET", 200, 0.001, 0)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIn(
+            'shopsy_http_requests_total{method="GET",route="hello_world",status="200"} 800',
+            metrics.metrics_text(),
+        )
+
+    def test_write_failure_does_not_fail_the_request(self):
+        with tempfile.NamedTemporaryFile() as not_a_directory:
+            with override_settings(
+                METRICS_DIR=not_a_directory.name, METRICS_FLUSH_INTERVAL=0
+            ), self.assertLogs("api.metrics", "ERROR"):
+                response = self.client.get("/api/hello/")
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,56 @@
+"""Ajouts au panier et à la liste de souhaits en une seule requête d'écriture.
+
+``INSERT ... ON CONFLICT DO UPDATE`` (PostgreSQL, et SQLite >= 3.35 pour
+``RETURNING``) : deux requêtes simultanées pour la même ligne ne perdent pas
+d'incrément et ne lèvent pas d'``IntegrityError``. La cible du conflit est la
+contrainte ``(user, variant, size)`` quand une taille est donnée, sinon
+l'index partiel ``..._unique_without_size`` (voir ``api.models``).
+"""
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Cart, Wishlist
+
+
+def _conflict_target(size_id):
+    if size_id is None:
+        return "(user_id, variant_id) WHERE size_id IS NULL"
+    return "(user_id, variant_id, size_id)"
+
+
+def _timestamp(model, now):
+    return model._meta.get_field("updated_at").get_db_prep_value(now, connection)
+
+
+def upsert_cart_item(user_id, variant_id, size_id, quantity):
+    """Ajoute ``quantity`` à la ligne du panier (créée au besoin) ; retourne ``(id, quantité)``."""
+    now = _timestamp(Cart, timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {Cart._meta.db_table} "
+            "(user_id, variant_id, size_id, quantity, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT {_conflict_target(size_id)} DO UPDATE SET "
+            f"quantity = {Cart._meta.db_table}.quantity + excluded.quantity, "
+            "updated_at = excluded.updated_at "
+            "RETURNING id, quantity",
+            [user_id, variant_id, size_id, quantity, now, now],
+        )
+        return cursor.fetchone()
+
+
+def upsert_wishlist_item(user_id, variant_id, size_id=None):
+    """Ajoute la variante à la liste de souhaits (ou rafraîchit ``updated_at``) ; retourne l'id."""
+    now = _timestamp(Wishlist, timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {Wishlist._meta.db_table} "
+            "(user_id, variant_id, size_id, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s) "
+            f"ON CONFLICT {_conflict_target(size_id)} DO UPDATE SET "
+            "updated_at = excluded.updated_at "
+            "RETURNING id",
+            [user_id, variant_id, size_id, now, now],
+        )
+        return cursor.fetchone()[0]
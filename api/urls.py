@@ -1,24 +1,31 @@
+from django.conf import settings
 from django.urls import path
+
+from . import async_views, views
 from .views import (
     ActivateAccountView,
     RegisterView,
     add_to_cart,
+    cart_batch,
     already_in_wishlist,
     email_exists,
     empty_cart,
     get_cart_user,
+    get_cart_summary,
     get_category,
-    get_comments,
     get_size_details,
+    get_variants_bulk,
     get_subcateregory_by_category,
     get_user,
-    get_variant_details,
     hello_world,
-    get_products,
-    get_product,
+    get_cache_stats,
+    get_db_stats,
+    get_metrics,
+    get_product_cards,
+    get_resized_image,
+    search_products,
     get_product_by_category,
     get_product_by_subcategory,
-    get_categories,
     login,
     logout,
     remove_from_cart,
@@ -29,16 +36,30 @@ from .views import (
     username_exists,
     add_to_wishlist,
     get_wishlist,
+    get_wishlist_ids,
     remove_from_wishlist,
     empty_wishlist,
     user_me,
 )
 
+# Lectures du catalogue : vues asynchrones sous ASGI (voir CATALOG_ASYNC_VIEWS)
+catalog = async_views if settings.CATALOG_ASYNC_VIEWS else views
+
 urlpatterns = [
-    path("hello/", hello_world),
-    path("products/", get_products, name="get_products"),
-    path("categories/", get_categories, name="get_categories"),
-    path("products/<int:pk>/", get_product, name="get_product"),
+    path("hello/", hello_world, name="hello_world"),
+    path("cache/stats/", get_cache_stats, name="get_cache_stats"),
+    path("db/stats/", get_db_stats, name="get_db_stats"),
+    path("metrics", get_metrics, name="get_metrics"),
+    path(
+        "images/<int:width>/<path:name>",
+        get_resized_image,
+        name="get_resized_image",
+    ),
+    path("products/", catalog.get_products, name="get_products"),
+    path("products/cards/", get_product_cards, name="get_product_cards"),
+    path("products/search/", search_products, name="search_products"),
+    path("categories/", catalog.get_categories, name="get_categories"),
+    path("products/<int:pk>/", catalog.get_product, name="get_product"),
     path(
         "products/category/<int:category_id>/",
         get_product_by_category,
@@ -56,9 +77,10 @@ urlpatterns = [
     ),
     path(
         "products/variant/<int:variant_id>/",
-        get_variant_details,
+        catalog.get_variant_details,
         name="get_variant_details",
     ),
+    path("products/variants/", get_variants_bulk, name="get_variants_bulk"),
     path("products/size/<int:size_id>/", get_size_details, name="get_size_details"),
     path("categories/<int:pk>/", get_category, name="get_category"),
     # Authentication endpoints
@@ -81,14 +103,17 @@ urlpatterns = [
     ),
     path("user/reset_password/", reset_password, name="reset_password"),
     path("comments/save/", save_comment, name="save_comment"),
-    path("comments/<int:product_id>/", get_comments, name="get_comments"),
+    path("comments/<int:product_id>/", catalog.get_comments, name="get_comments"),
     path("user/<int:user_id>/", get_user, name="get_user"),
     path("cart/", get_cart_user, name="get_cart_user"),
     path("cart/add/", add_to_cart, name="add_to_cart"),
     path("cart/update/", update_cart, name="update_cart"),
     path("cart/empty/", empty_cart, name="empty_cart"),
     path("cart/remove/", remove_from_cart, name="remove_from_cart"),
+    path("cart/batch/", cart_batch, name="cart_batch"),
+    path("cart/summary/", get_cart_summary, name="get_cart_summary"),
     path("wishlist/", get_wishlist, name="user_wishlist"),
+    path("wishlist/ids/", get_wishlist_ids, name="get_wishlist_ids"),
     path("wishlist/add/", add_to_wishlist, name="add_to_wishlist"),
     path("wishlist/remove/", remove_from_wishlist, name="remove_from_wishlist"),
     path("wishlist/empty/", empty_wishlist, name="empty_wishlist"),
@@ -3,9 +3,16 @@ from django.utils import timezone
 from django.shortcuts import render
 from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from django.views.decorators.http import require_safe
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from .models import Cart, Product, ProductVariant, ProductVariantSize, Rating, Wishlist
+from .models import ProductCard
 from .models import SubCategory
 from .models import Category
 from django.contrib.auth import authenticate
@@ -13,16 +20,39 @@ from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_200_OK
 from rest_framework import status
+import hashlib
 import random
 from .serializers import RegisterSerializer
-from django.core.mail import send_mail
+from . import fast_serializers
+from .cache import cache_catalog_response, cache_stats
+from .cart import CartConflict, apply_operations, cart_summary, parse_operations
+from .database import connection_stats
+from .images import bucket_width, get_derivative, resized_url
+from .responses import JSONResponse
+from .tasks import send_email
+from .upserts import upsert_cart_item, upsert_wishlist_item
+from .metrics import HasMetricsToken, metrics_text
+from .conditional import conditional_catalog_response, product_tree
+from .fieldsets import (
+    parse_fieldset,
+    relation_fieldset,
+    shape_queryset,
+    shape_serializer,
+)
+from .facets import filter_products, product_facets
+from .search import search_product_ids
+from .pagination import (
+    ProductCardCursorPagination,
+    ProductCursorPagination,
+    RatingCursorPagination,
+)
 from .serializers import (
+    ProductCardSerializer,
     ProductSerializer,
     ProductVariantSerializer,
     ProductVariantSizeSerializer,
     RatingSerializer,
     SubCategorySerializer,
-    CategorySerializer,
     CartSerializer,
     UserSerializer,
     WishlistSerializer,
@@ -32,10 +62,14 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 from rest_framework import generics, status
-from django.http import HttpResponseRedirect
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from PIL import UnidentifiedImageError
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
+from django.db import transaction
 
 
 def generate_verification_code():
@@ -49,49 +83,189 @@ def hello_world(request):
     return Response({"message": "Hello from Django API!"})
 
 
+@require_safe
+def get_resized_image(request, width, name):
+    """Sert une image produit redimensionnée, au format négocié (AVIF, WebP, JPEG)."""
+    if width != bucket_width(width):
+        return HttpResponseRedirect(resized_url(name, bucket_width(width)))
+    # Vue Django simple : DRF refuserait (406) un Accept sans type JSON
+    if not name.startswith("products/"):
+        return JSONResponse({"error": "Image not found"}, status=404)
+    try:
+        path, content_type = get_derivative(
+            name, width, request.headers.get("Accept", "")
+        )
+        file = open(path, "rb")
+    except (FileNotFoundError, SuspiciousFileOperation, UnidentifiedImageError):
+        return JSONResponse({"error": "Image not found"}, status=404)
+    response = FileResponse(file, content_type=content_type)
+    # L'URL ne change pas avec le format : les caches doivent tenir compte d'Accept
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    response["Vary"] = "Accept"
+    return response
+
+
+def paginate_products(request, products):
+    """Pagine une liste de produits par curseur en préchargeant l'arborescence demandée.
+
+    Les variantes, leurs tailles et leurs images sont chargées en un nombre fixe
+    de requêtes, quelle que soit la taille de la page ; ``?fields=`` et
+    ``?expand=`` réduisent les colonnes et préchargements (voir api.fieldsets).
+    """
+    fieldset = parse_fieldset(request)
+    paginator = ProductCursorPagination()
+    if fieldset is None:
+        # Réponse complète : sérialisation rapide à partir de lignes values()
+        page = paginator.paginate_queryset(
+            products.values(*fast_serializers.PRODUCT_COLUMNS), request
+        )
+        return paginator.get_paginated_response(
+            fast_serializers.serialize_product_rows(page)
+        )
+    products = shape_queryset(products, fieldset, ProductSerializer)
+    page = paginator.paginate_queryset(products, request)
+    serializer = shape_serializer(ProductSerializer(page, many=True), fieldset)
+    return paginator.get_paginated_response(serializer.data)
+
+
+def shaped_product_data(pk, fieldset):
+    """Produit ``pk`` limité aux champs de ``fieldset`` (lève Product.DoesNotExist)."""
+    # Précharger les images et tailles des variantes demandées
+    product = shape_queryset(Product.objects, fieldset, ProductSerializer).get(pk=pk)
+    return shape_serializer(ProductSerializer(product), fieldset).data
+
+
+def shaped_variant_data(variant_id, fieldset):
+    """Variante limitée aux champs de ``fieldset``, avec son produit s'il est
+    demandé (lève ProductVariant.DoesNotExist ou Product.DoesNotExist)."""
+    # Précharger les images et tailles de la variante demandées
+    variant = shape_queryset(
+        ProductVariant.objects,
+        fieldset,
+        ProductVariantSerializer,
+        required=["product"],
+    ).get(pk=variant_id)
+    data = shape_serializer(ProductVariantSerializer(variant), fieldset).data
+    # Inclure les détails du produit dans la réponse de la variante
+    product_fieldset = relation_fieldset(fieldset, "product")
+    if product_fieldset is not None:
+        data["product"] = shaped_product_data(variant.product_id, product_fieldset)
+    return data
+
+
 @api_view(["GET"])
+@conditional_catalog_response(lambda: product_tree())
+@cache_catalog_response
 def get_products(request):
-    """Retourne la liste des produits avec leurs variantes."""
-    products = Product.objects.prefetch_related(
-        "variants"
-    ).all()  # Précharger les variantes
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    """Retourne la liste paginée et filtrée des produits, avec les compteurs de facettes."""
+    products = filter_products(Product.objects.all(), request.query_params)
+    response = paginate_products(request, products)
+    response.data["facets"] = product_facets(products)
+    return response
+
+
+@api_view(["GET"])
+@conditional_catalog_response(lambda: [ProductCard.objects.all()])
+@cache_catalog_response
+def get_product_cards(request):
+    """Retourne les cartes produit (pages de liste), filtrables par catégorie."""
+    cards = ProductCard.objects.all()
+    category_id = request.query_params.get("category")
+    subcategory_id = request.query_params.get("subcategory")
+    if category_id:
+        cards = cards.filter(category_id=category_id)
+    if subcategory_id:
+        cards = cards.filter(subCategory_id=subcategory_id)
+    paginator = ProductCardCursorPagination()
+    page = paginator.paginate_queryset(cards, request)
+    serializer = ProductCardSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(["GET"])
+def search_products(request):
+    """Recherche plein texte des produits, triée par pertinence."""
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response(
+            {"error": "Query parameter 'q' is required."}, status=HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(int(request.query_params.get("limit", 20)), 50)
+    except ValueError:
+        return Response({"error": "Invalid limit."}, status=HTTP_400_BAD_REQUEST)
+    product_ids = search_product_ids(query, max(limit, 1))
+    cards = ProductCard.objects.in_bulk(product_ids)
+    serializer = ProductCardSerializer(
+        [cards[pk] for pk in product_ids if pk in cards], many=True
+    )
+    return Response({"query": query, "results": serializer.data})
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def get_cache_stats(request):
+    """Retourne les compteurs du cache du catalogue (succès, échecs, version)."""
+    return Response(cache_stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def get_db_stats(request):
+    """Retourne l'état des connexions et du pool du worker courant."""
+    return Response(connection_stats())
 
 
 @api_view(["GET"])
+# Jeton propre aux métriques, pas un JWT : pas d'authentification DRF
+@authentication_classes([])
+@permission_classes([HasMetricsToken])
+def get_metrics(request):
+    """Expose les métriques de tous les workers au format texte Prometheus."""
+    if not settings.METRICS_ENABLED:
+        return Response({"error": "Metrics are disabled."}, status=404)
+    return HttpResponse(
+        metrics_text(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@api_view(["GET"])
+@conditional_catalog_response(lambda pk: product_tree(pk=pk))
+@cache_catalog_response
 def get_product(request, pk):
     """Retourne un produit spécifique."""
+    fieldset = parse_fieldset(request)
+    if fieldset is None:
+        products = fast_serializers.serialize_products(Product.objects.filter(pk=pk))
+        if not products:
+            return Response({"error": "Product not found"}, status=404)
+        return Response(products[0])
     try:
-        product = Product.objects.prefetch_related(
-            "variants__images", "variants__sizes"
-        ).get(
-            pk=pk
-        )  # Précharger les images et tailles des variantes
-        serializer = ProductSerializer(product)
-        return Response(serializer.data)
+        return Response(shaped_product_data(pk, fieldset))
     except Product.DoesNotExist:
         return Response({"error": "Product not found"}, status=404)
 
 
 @api_view(["GET"])
+@conditional_catalog_response(
+    lambda category_id: product_tree(category_id=category_id)
+)
+@cache_catalog_response
 def get_product_by_category(request, category_id):
     """Retourne les produits d’une catégorie spécifique."""
-    products = Product.objects.filter(category_id=category_id).prefetch_related(
-        "variants"
-    )
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
+    return paginate_products(request, Product.objects.filter(category_id=category_id))
 
 
 @api_view(["GET"])
+@conditional_catalog_response(
+    lambda subcategory_id: product_tree(subCategory_id=subcategory_id)
+)
+@cache_catalog_response
 def get_product_by_subcategory(request, subcategory_id):
     """Retourne les produits d’une sous-catégorie spécifique."""
-    products = Product.objects.filter(subCategory_id=subcategory_id).prefetch_related(
-        "variants"
+    return paginate_products(
+        request, Product.objects.filter(subCategory_id=subcategory_id)
     )
-    serializer = ProductSerializer(products, many=True)
-    return Response(serializer.data)
 
 
 @api_view(["GET"])
@@ -108,19 +282,19 @@ def get_size_details(request, size_id):
 
 
 @api_view(["GET"])
+@conditional_catalog_response(
+    lambda variant_id: product_tree(variants=variant_id)
+)
 def get_variant_details(request, variant_id):
     """Retourne les détails d’une variante spécifique."""
+    fieldset = parse_fieldset(request)
+    if fieldset is None:
+        data = fast_serializers.serialize_variant_details(variant_id)
+        if data is None:
+            return Response({"error": "Variant not found"}, status=404)
+        return Response(data)
     try:
-        variant = ProductVariant.objects.prefetch_related("images", "sizes").get(
-            pk=variant_id
-        )  # Précharger les images et tailles de la variante
-        product = variant.product  # Obtenir le produit associé à la variante
-        product_serializer = ProductSerializer(product)
-        variant_serializer = ProductVariantSerializer(variant)
-        # Inclure les détails du produit dans la réponse de la variante
-        response_data = variant_serializer.data
-        response_data["product"] = product_serializer.data
-        return Response(response_data)
+        return Response(shaped_variant_data(variant_id, fieldset))
     except ProductVariant.DoesNotExist:
         return Response({"error": "Variant not found"}, status=404)
     except Product.DoesNotExist:
@@ -132,40 +306,74 @@ def get_variant_details(request, variant_id):
         return Response({"error": "Variant not found"}, status=404)
 
 
+# Nombre maximal d’ids acceptés par get_variants_bulk
+MAX_BULK_VARIANTS = 100
+
+
+# Pas de cache de réponse : chaque combinaison d'identifiants aurait sa propre
+# entrée et évincerait les pages du catalogue.
 @api_view(["GET"])
+def get_variants_bulk(request):
+    """Retourne plusieurs variantes (``?ids=1,2,3``) et le résumé de leurs produits."""
+    values = [
+        value.strip()
+        for value in request.query_params.get("ids", "").split(",")
+        if value.strip()
+    ]
+    # Chiffres ASCII seulement : isdigit() accepte « ² » ou « ٣ », int() « 1_0 »
+    ids = [int(value) for value in values if value.isascii() and value.isdigit()]
+    if not ids or len(ids) != len(values) or min(ids) < 1:
+        raise ValidationError({"ids": "Doit être une liste d'identifiants."})
+    if len(ids) > MAX_BULK_VARIANTS:
+        raise ValidationError(
+            {"ids": f"Au plus {MAX_BULK_VARIANTS} identifiants par requête."}
+        )
+    # Sans doublon, dans l'ordre de la requête
+    variant_ids = list(dict.fromkeys(ids))
+    return Response(fast_serializers.serialize_variants(variant_ids))
+
+
+@api_view(["GET"])
+@cache_catalog_response
 def get_subcateregory_by_category(request, category_id):
     """Retourne les sous-catégories d’une catégorie spécifique."""
-    subcategories = SubCategory.objects.filter(category_id=category_id)
+    subcategories = SubCategory.objects.filter(
+        category_id=category_id
+    ).select_related("category")
     serializer = SubCategorySerializer(subcategories, many=True)
     return Response(serializer.data)
 
 
 @api_view(["GET"])
+@conditional_catalog_response(lambda: [Category.objects.all()])
+@cache_catalog_response
 def get_categories(request):
     """Retourne la liste des catégories."""
     categories = Category.objects.all()
-    serializer = CategorySerializer(categories, many=True)
-    return Response(serializer.data)
+    return Response(fast_serializers.serialize_categories(categories))
 
 
 @api_view(["GET"])
+@cache_catalog_response
 def get_category(request, pk):
     """Retourne une catégorie spécifique."""
-    try:
-        category = Category.objects.get(pk=pk)
-        serializer = CategorySerializer(category)
-        return Response(serializer.data)
-    except Category.DoesNotExist:
+    categories = fast_serializers.serialize_categories(Category.objects.filter(pk=pk))
+    if not categories:
         return Response({"error": "Category not found"}, status=404)
+    return Response(categories[0])
 
 
 @api_view(["GET"])
 def get_comments(request, product_id):
-    """Retourne les évaluations d’un produit spécifique."""
-    product = Product.objects.get(pk=product_id)
-    ratings = Rating.objects.filter(product=product)
-    serializer = RatingSerializer(ratings, many=True)
-    return Response(serializer.data)
+    """Retourne les évaluations paginées d’un produit spécifique."""
+    ratings = Rating.objects.filter(product_id=product_id).select_related("user")
+    paginator = RatingCursorPagination()
+    page = paginator.paginate_queryset(ratings, request)
+    # Vérifier l'existence du produit seulement si la page est vide
+    if not page and not Product.objects.filter(pk=product_id).exists():
+        return Response({"error": "Product not found"}, status=404)
+    serializer = RatingSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(["POST"])
@@ -182,14 +390,14 @@ def send_verification_code(request):
         "Shopsy Online Shop"  # Assurez-vous que cela correspond à EMAIL_HOST_USER
     )
 
-    try:
-        send_mail(subject, message, from_email, [email])
-        return Response(
-            {"message": "Verification email sent!", "code": code, "to": email},
-            status=HTTP_200_OK,
-        )
-    except Exception as e:
-        return Response({"error": str(e)}, status=HTTP_400_BAD_REQUEST)
+    # Envoi en tâche de fond (api.tasks) : la réponse n'attend pas le serveur SMTP
+    send_email.enqueue(
+        subject=subject, message=message, recipients=[email], from_email=from_email
+    )
+    return Response(
+        {"message": "Verification email sent!", "code": code, "to": email},
+        status=HTTP_200_OK,
+    )
 
 
 @api_view(["POST"])
@@ -244,6 +452,15 @@ def save_comment(request):
             {"error": "Product ID, user ID, and stars are required."},
             status=HTTP_400_BAD_REQUEST,
         )
+    try:
+        stars = int(stars)
+    except (TypeError, ValueError):
+        stars = 0
+    if not 1 <= stars <= 5:
+        return Response(
+            {"error": "Stars must be an integer between 1 and 5."},
+            status=HTTP_400_BAD_REQUEST,
+        )
     # Vérifier que le produit existe
     try:
         product = Product.objects.get(pk=product_id)
@@ -254,17 +471,17 @@ def save_comment(request):
         user = User.objects.get(pk=user_id)
     except User.DoesNotExist:
         return Response({"error": "User not found."}, status=HTTP_400_BAD_REQUEST)
-    # Créer le commentaire
-    comment = Rating.objects.create(
-        product=product,
-        user=user,
-        comment=content,
-        stars=stars,
-        created_at=timezone.now(),
-        updated_at=timezone.now(),
-    )
-    # Enregistrer le commentaire
-    comment.save()
+    # Créer le commentaire ; les agrégats du produit sont mis à jour dans la
+    # même transaction (voir api.signals)
+    with transaction.atomic():
+        comment = Rating.objects.create(
+            product=product,
+            user=user,
+            comment=content,
+            stars=stars,
+            created_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
     return Response(
         {
             "message": "Comment added successfully!",
@@ -512,6 +729,36 @@ def get_cart_user(request):
     return Response(serializer.data, status=HTTP_200_OK)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_cart_summary(request):
+    """Panier de l’utilisateur avec produits, prix remisés et totaux."""
+    return Response(cart_summary(request.user), status=HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def cart_batch(request):
+    """Applique une liste d'opérations (add, set, remove) au panier, en une transaction."""
+    try:
+        operations = parse_operations(request.data)
+        cart_items = apply_operations(request.user, operations)
+    except ValidationError as error:
+        return Response(error.detail, status=HTTP_400_BAD_REQUEST)
+    except CartConflict:
+        return Response(
+            {"error": "Cart was modified concurrently, please retry."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return Response(
+        {
+            "message": "Cart updated successfully!",
+            "cart": CartSerializer(cart_items, many=True).data,
+        },
+        status=HTTP_200_OK,
+    )
+
+
 @api_view(["POST"])
 def already_in_wishlist(request):
     """Vérifie si un produit est déjà dans la liste de souhaits."""
@@ -564,24 +811,9 @@ def add_to_wishlist(request):
         variant = ProductVariant.objects.get(pk=variant_id)
     except ProductVariant.DoesNotExist:
         return Response({"error": "Variant not found."}, status=HTTP_400_BAD_REQUEST)
-    # Vérifier si l’élément est déjà dans la liste de souhaits
+    # Créer l’élément, ou rafraîchir celui qui existe, en une seule requête
     try:
-        wishlist_items = Wishlist.objects.filter(user=user, variant=variant)
-        if wishlist_items.exists():
-            # Si des éléments existent, mettez à jour le premier
-            wishlist_item = wishlist_items.first()
-            wishlist_item.updated_at = updated_at
-            wishlist_item.save()
-            id = wishlist_item.id
-        else:
-            # Sinon, créez un nouvel élément de liste de souhaits
-            wishlist_item = Wishlist.objects.create(
-                user=user,
-                variant=variant,
-                created_at=created_at,
-                updated_at=updated_at,
-            )
-            id = wishlist_item.id
+        id = upsert_wishlist_item(user.pk, variant.pk)
     except Exception as e:
         return Response({"error": str(e)}, status=HTTP_400_BAD_REQUEST)
     return Response(
@@ -615,6 +847,32 @@ def get_wishlist(request):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_wishlist_ids(request):
+    """Retourne les ids des variantes de la liste de souhaits et un jeton de version.
+
+    Le jeton sert d'ETag : avec ``If-None-Match``, la réponse est un 304 vide.
+    La requête ne lit que l'index ``(user, variant, size)`` de ``unique_together``.
+    """
+    variant_ids = list(
+        Wishlist.objects.filter(user=request.user, variant__isnull=False)
+        .order_by("variant_id")
+        .values_list("variant_id", flat=True)
+        .distinct()
+    )
+    version = hashlib.md5(",".join(map(str, variant_ids)).encode()).hexdigest()
+    etag = f'"{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response({"variant_ids": variant_ids, "version": version})
+    response["ETag"] = etag
+    # Propre à l'utilisateur : jamais dans un cache partagé, toujours revalidé
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Authorization"])
+    return response
+
+
 @api_view(["POST"])
 def remove_from_wishlist(request):
     """Supprime un produit de la liste de souhaits."""
@@ -703,27 +961,12 @@ def add_to_cart(request):
             size = ProductVariantSize.objects.get(pk=size_id)
         except ProductVariantSize.DoesNotExist:
             return Response({"error": "Size not found."}, status=HTTP_400_BAD_REQUEST)
-    # Vérifier si l’élément est déjà dans le panier
+    # Créer la ligne ou incrémenter sa quantité en une seule requête : deux
+    # ajouts simultanés ne perdent pas d’incrément
     try:
-        cart_items = Cart.objects.filter(user=user, variant=variant)
-        if size_id:
-            cart_items = cart_items.filter(size=size)
-        if cart_items.exists():
-            # Si des éléments existent, mettez à jour le premier
-            cart_item = cart_items.first()
-            cart_item.quantity += quantity
-            cart_item.updated_at = updated_at
-            cart_item.save()
-        else:
-            # Sinon, créez un nouvel élément de panier
-            cart_item = Cart.objects.create(
-                user=user,
-                variant=variant,
-                quantity=quantity,
-                size=size if size_id else None,
-                created_at=created_at,
-                updated_at=updated_at,
-            )
+        upsert_cart_item(
+            user.pk, variant.pk, size.pk if size_id else None, int(quantity)
+        )
     except Exception as e:
         return Response({"error": str(e)}, status=HTTP_400_BAD_REQUEST)
     return Response(
@@ -0,0 +1,71 @@
+"""Configuration gunicorn de production (chargée automatiquement depuis le répertoire courant).
+
+    gunicorn                    # WSGI (myshop.wsgi), workers gthread
+    GUNICORN_ASGI=1 gunicorn    # ASGI (myshop.asgi), workers uvicorn
+
+Variables d'environnement : GUNICORN_BIND, GUNICORN_WORKERS (défaut : 2 × CPU + 1),
+GUNICORN_THREADS (défaut : 4, WSGI seulement), GUNICORN_MAX_REQUESTS,
+GUNICORN_TIMEOUT, GUNICORN_PRELOAD.
+
+Rechargement sans coupure : ``kill -HUP <pid du maître>`` redémarre les workers
+un à un. Avec ``preload_app`` le code est chargé par le maître : pour déployer
+une nouvelle version, lancer un nouveau maître avec ``kill -USR2 <pid>`` puis
+arrêter l'ancien avec ``kill -QUIT <ancien pid>``.
+"""
+
+import multiprocessing
+import os
+
+ASGI = os.getenv("GUNICORN_ASGI", "0") == "1"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+if ASGI:
+    # Boucle d'événements : un worker par cœur suffit, la concurrence vient des vues async
+    wsgi_app = "myshop.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+else:
+    # Threads : les requêtes attendent surtout PostgreSQL, le GIL est libéré
+    wsgi_app = "myshop.wsgi:application"
+    worker_class = "gthread"
+    workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Recycler les workers évite l'accumulation de mémoire ; le décalage aléatoire
+# évite qu'ils redémarrent tous en même temps
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+# Charger Django une fois dans le maître : démarrage des workers plus rapide et
+# pages mémoire partagées
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+forwarded_allow_ips = "*"
+
+
+def on_starting(server):
+    """Repart de métriques vides (api.metrics) à chaque démarrage du serveur et
+    refuse un cache du catalogue propre à chaque worker (api.cache)."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myshop.settings")
+    import django
+
+    django.setup()
+    from api.cache import check_shared_cache
+    from api.metrics import clear_metrics
+
+    check_shared_cache(server.num_workers)
+    clear_metrics()
+
+
+def post_fork(server, worker):
+    """Ne pas partager entre workers une connexion ouverte par le maître."""
+    from django.db import connections
+
+    connections.close_all()
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Sous ASGI (``GUNICORN_ASGI=1``), WhiteNoise n'est pas dans ``MIDDLEWARE`` : il
+est seulement synchrone et forcerait toute la pile Django dans un thread. Les
+requêtes sous ``STATIC_URL`` sont donc servies ici par WhiteNoise (application
+WSGI, exécutée dans un thread pour ces seules requêtes), les autres par Django
+avec une pile entièrement asynchrone.
 """
 
 import os
@@ -13,4 +19,37 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myshop.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from asgiref.wsgi import WsgiToAsgi  # noqa: E402
+from django.conf import settings  # noqa: E402
+from whitenoise import WhiteNoise  # noqa: E402
+
+WHITENOISE_MIDDLEWARE = "whitenoise.middleware.WhiteNoiseMiddleware"
+
+# Fichiers de collectstatic dont le nom contient l'empreinte du contenu
+HASHED_STATIC_FILE = r"^.+\.[0-9a-f]{12}\..+$"
+
+
+def not_found(environ, start_response):
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"Not Found"]
+
+
+if WHITENOISE_MIDDLEWARE in settings.MIDDLEWARE:
+    application = django_application
+else:
+    static_prefix = "/" + settings.STATIC_URL.lstrip("/")
+    static_application = WsgiToAsgi(
+        WhiteNoise(
+            not_found,
+            root=settings.STATIC_ROOT,
+            prefix=settings.STATIC_URL,
+            immutable_file_test=HASHED_STATIC_FILE,
+        )
+    )
+
+    async def application(scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(static_prefix):
+            return await static_application(scope, receive, send)
+        return await django_application(scope, receive, send)
@@ -16,6 +16,15 @@ MEDIA_ROOT = os.path.join(
     BASE_DIR, "media"
 )  # Chemin absolu vers le dossier des fichiers médias
 
+# Images produit redimensionnées (api.images) : largeurs servies, URL de base
+# et cache disque des déclinaisons, borné en taille (éviction LRU)
+IMAGE_WIDTHS = [
+    int(width) for width in os.getenv("IMAGE_WIDTHS", "320,640,960,1280").split(",")
+]
+RESIZED_IMAGES_URL = "/api/images/"
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(BASE_DIR, "cache", "images"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -46,7 +55,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête de pile pour mesurer toute la requête (voir PROFILING_* plus bas)
+    "api.middleware.ProfilingMiddleware",
+    "api.middleware.MetricsMiddleware",
+    # Lectures du catalogue sur les réplicas (voir DATABASE_REPLICAS plus bas)
+    "api.middleware.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Fichiers statiques servis par l'application (compressés, noms versionnés)
+    "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -56,6 +72,12 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# WhiteNoise est seulement synchrone : sous ASGI, il ferait exécuter toute la
+# pile dans un thread par requête. Les fichiers statiques sont alors servis par
+# myshop.asgi, avant la pile Django (voir ce module).
+if os.getenv("GUNICORN_ASGI", "0") == "1":
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -155,6 +177,24 @@ WSGI_APPLICATION = "myshop.wsgi.application"
 #         }
 #     }
 
+# Connexions PostgreSQL (psycopg 3) :
+# - par défaut, connexions persistantes (DB_CONN_MAX_AGE secondes, vérifiées
+#   avant réutilisation) ;
+# - DB_POOL=1 : pool de connexions par processus (psycopg_pool), incompatible
+#   avec les connexions persistantes, CONN_MAX_AGE est alors forcé à 0 ;
+# - DB_SERVER_SIDE_BINDING=1 : paramètres liés côté serveur, les requêtes
+#   répétées deviennent des requêtes préparées (après DB_PREPARE_THRESHOLD
+#   exécutions sur une même connexion) ;
+# - DB_PGBOUNCER=1 : compatible avec PgBouncer en mode "transaction" (pas de
+#   curseurs nommés ni de requêtes préparées, qui ne survivent pas à un
+#   changement de connexion serveur).
+# Statistiques du pool : /api/db/stats/ (voir api.database).
+DB_POOL = os.getenv("DB_POOL", "0") == "1"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+DB_SERVER_SIDE_BINDING = (
+    os.getenv("DB_SERVER_SIDE_BINDING", "0") == "1" and not DB_PGBOUNCER
+)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -163,9 +203,112 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", "francelKazakh*2022"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "1") == "1",
+        "DISABLE_SERVER_SIDE_CURSORS": DB_PGBOUNCER,
+        "OPTIONS": {
+            "pool": (
+                {
+                    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                    "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "600")),
+                }
+                if DB_POOL
+                else False
+            ),
+            "server_side_binding": DB_SERVER_SIDE_BINDING,
+            "prepare_threshold": (
+                None
+                if DB_PGBOUNCER
+                else int(os.getenv("DB_PREPARE_THRESHOLD", "5"))
+            ),
+        },
     }
 }
 
+# Réplicas en lecture seule (api.db_routers) : DB_REPLICA_HOSTS="hôte1,hôte2"
+# crée les alias replica1, replica2… (mêmes réglages que default, autre hôte).
+# Les lectures du catalogue y sont envoyées, le reste reste sur default.
+DB_REPLICA_HOSTS = [
+    host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()
+]
+DATABASE_REPLICAS = [f"replica{index}" for index in range(1, len(DB_REPLICA_HOSTS) + 1)]
+for alias, host in zip(DATABASE_REPLICAS, DB_REPLICA_HOSTS):
+    DATABASES[alias] = {**DATABASES["default"], "HOST": host, "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["api.db_routers.CatalogReplicaRouter"]
+
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Backend du cache des réponses du catalogue : "file" (défaut, partagé par les
+# workers d'une même machine), "locmem" (un seul processus : gunicorn refuse de
+# démarrer avec plusieurs workers) ou le chemin complet de n'importe quel
+# backend Django (ex. Redis, Memcached, pour plusieurs machines)
+CATALOG_CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+}
+CATALOG_CACHE_BACKEND = os.getenv("CATALOG_CACHE_BACKEND", "file")
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "1") == "1"
+CATALOG_CACHE_ALIAS = "catalog"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    CATALOG_CACHE_ALIAS: {
+        "BACKEND": CATALOG_CACHE_BACKENDS.get(
+            CATALOG_CACHE_BACKEND, CATALOG_CACHE_BACKEND
+        ),
+        "LOCATION": os.getenv(
+            "CATALOG_CACHE_LOCATION",
+            (
+                os.path.join(BASE_DIR, "cache", "catalog")
+                if CATALOG_CACHE_BACKEND == "file"
+                else "catalog"
+            ),
+        ),
+        "TIMEOUT": int(os.getenv("CATALOG_CACHE_TIMEOUT", "3600")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "5000"))},
+    },
+}
+
+# Vues asynchrones du catalogue (api.async_views) : utiles seulement sous ASGI,
+# activées par défaut avec GUNICORN_ASGI=1
+CATALOG_ASYNC_VIEWS = (
+    os.getenv("CATALOG_ASYNC_VIEWS", os.getenv("GUNICORN_ASGI", "0")) == "1"
+)
+
+
+# Profilage des requêtes (en-tête Server-Timing, voir api.middleware)
+# Désactivé, le middleware est retiré de la pile au démarrage.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "1.0"))
+PROFILING_SLOW_REQUEST_MS = float(os.getenv("PROFILING_SLOW_REQUEST_MS", "0"))
+
+
+# Métriques Prometheus (/api/metrics, voir api.metrics) : chaque worker écrit ses
+# valeurs dans son fichier de METRICS_DIR, commun aux workers d'une instance
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(BASE_DIR, "metrics"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+# Jeton Bearer exigé par /api/metrics ; vide, l'endpoint refuse toute requête
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+# Tâches de fond (api.jobs, commande run_jobs) : essais, attente entre deux
+# essais (doublée à chaque fois) et délai de reprise d'une tâche dont le worker
+# a disparu
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_RETRY_BASE_SECONDS = float(os.getenv("JOBS_RETRY_BASE_SECONDS", "30"))
+JOBS_RETRY_MAX_SECONDS = float(os.getenv("JOBS_RETRY_MAX_SECONDS", "3600"))
+JOBS_LOCK_TIMEOUT = int(os.getenv("JOBS_LOCK_TIMEOUT", "600"))
+JOBS_WORKER_THREADS = int(os.getenv("JOBS_WORKER_THREADS", "4"))
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", "1.0"))
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -202,6 +345,15 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")  # Rempli par collectstatic
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # Noms de fichiers avec empreinte (cache navigateur illimité) et variantes gzip/brotli
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -209,7 +361,9 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # Configuration de l'envoi d'e-mails
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Envoi par les tâches de fond (commande run_jobs) ; en local :
+# EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
 EMAIL_HOST = "smtp.gmail.com"  # Utilisez le serveur SMTP de votre fournisseur d'e-mails
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -217,3 +371,8 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")  # Remplacez par votre adresse e-
 EMAIL_HOST_PASSWORD = os.getenv(
     "EMAIL_HOST_PASSWORD"
 )  # Remplacez par votre mot de passe ou un mot de passe d'application
+# Délai (secondes) des opérations SMTP : sans lui, un serveur muet bloque un
+# thread de run_jobs indéfiniment, et la tâche, reprise après
+# JOBS_LOCK_TIMEOUT, enverrait l'e-mail une seconde fois. Doit rester bien
+# inférieur à JOBS_LOCK_TIMEOUT.
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "30"))
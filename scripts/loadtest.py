@@ -0,0 +1,220 @@
+"""Test de charge HTTP : débit et latences d'un serveur, ou comparaison de profils.
+
+N'utilise que la bibliothèque standard. Chaque client (thread) garde sa connexion
+ouverte (keep-alive) et enchaîne les requêtes sur les chemins donnés, à tour de
+rôle, pendant la durée demandée.
+
+Mesurer un serveur déjà lancé :
+
+    python scripts/loadtest.py --url http://127.0.0.1:8000 --concurrency 32 --duration 20
+
+Comparer runserver et gunicorn (WSGI et ASGI) sur la même base, chaque serveur
+étant lancé puis arrêté par le script :
+
+    python manage.py seed_catalog --products 2000
+    python scripts/loadtest.py --compare runserver gunicorn gunicorn-asgi
+
+Les serveurs héritent de l'environnement (DJANGO_SETTINGS_MODULE, DB_HOST,
+GUNICORN_WORKERS…). Lancer le script depuis la racine du dépôt. Pour mesurer les
+vues plutôt que le cache, exporter CATALOG_CACHE_ENABLED=0. Le résultat (JSON)
+indique pour chaque serveur le débit, les latences p50/p95/p99 et les erreurs ;
+runserver traite une requête à la fois par thread et sans recyclage, il sert de
+référence.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Chemins par défaut ; {product} et {variant} sont remplacés par des ids réels
+DEFAULT_PATHS = [
+    "/api/products/",
+    "/api/products/cards/",
+    "/api/categories/",
+    "/api/products/{product}/",
+    "/api/products/variant/{variant}/",
+    "/api/comments/{product}/",
+]
+
+SERVERS = {
+    "runserver": [sys.executable, "manage.py", "runserver", "{bind}", "--noreload"],
+    "gunicorn": ["gunicorn", "--bind", "{bind}"],
+    "gunicorn-asgi": ["gunicorn", "--bind", "{bind}"],
+}
+SERVER_ENV = {"gunicorn-asgi": {"GUNICORN_ASGI": "1"}}
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(int(round(percent / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _client(url, paths, deadline, results, lock):
+    parts = urlsplit(url)
+    latencies, statuses, errors = [], {}, 0
+    connection = None
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(
+                    parts.hostname, parts.port or 80, timeout=30
+                )
+            start = time.perf_counter()
+            connection.request("GET", path, headers={"Accept": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+            if response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            if connection is not None:
+                connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+    with lock:
+        results["latencies"].extend(latencies)
+        results["errors"] += errors
+        for status, count in statuses.items():
+            results["statuses"][status] = results["statuses"].get(status, 0) + count
+
+
+def resolve_paths(url, paths):
+    """Remplace {product} et {variant} par les ids du premier produit du catalogue."""
+    if not any("{" in path for path in paths):
+        return paths
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    connection.request("GET", "/api/products/?page_size=1")
+    products = json.loads(connection.getresponse().read())["results"]
+    connection.close()
+    if not products or not products[0]["variants"]:
+        raise RuntimeError("Catalogue vide : lancez d'abord manage.py seed_catalog.")
+    ids = {"product": products[0]["id"], "variant": products[0]["variants"][0]["id"]}
+    return [path.format(**ids) for path in paths]
+
+
+def run_load(url, paths, concurrency, duration):
+    """Lance ``concurrency`` clients pendant ``duration`` secondes et résume les mesures."""
+    results = {"latencies": [], "statuses": {}, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_client, args=(url, paths, deadline, results, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies = results["latencies"]
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "statuses": {str(k): v for k, v in sorted(results["statuses"].items())},
+        "errors": results["errors"],
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url, process, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté (code {process.returncode}).")
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            connection.request("GET", "/api/hello/")
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Le serveur n'a pas répondu à temps.")
+
+
+def compare(servers, paths, concurrency, duration, warmup):
+    report = {}
+    for name in servers:
+        bind = f"127.0.0.1:{_free_port()}"
+        url = f"http://{bind}"
+        command = [part.format(bind=bind) for part in SERVERS[name]]
+        env = {**os.environ, **SERVER_ENV.get(name, {})}
+        process = subprocess.Popen(
+            command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_until_ready(url, process)
+            paths = resolve_paths(url, paths)
+            if warmup:
+                run_load(url, paths, concurrency, warmup)
+            report[name] = run_load(url, paths, concurrency, duration)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        print(f"{name}: {json.dumps(report[name])}", file=sys.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15, help="Secondes.")
+    parser.add_argument(
+        "--warmup", type=float, default=3, help="Secondes non mesurées (--compare)."
+    )
+    parser.add_argument(
+        "--compare",
+        nargs="+",
+        choices=sorted(SERVERS),
+        help="Lance et compare ces serveurs au lieu d'utiliser --url.",
+    )
+    args = parser.parse_args()
+    if args.compare:
+        report = compare(
+            args.compare, args.paths, args.concurrency, args.duration, args.warmup
+        )
+    else:
+        paths = resolve_paths(args.url, args.paths)
+        report = run_load(args.url, paths, args.concurrency, args.duration)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()